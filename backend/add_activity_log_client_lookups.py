@@ -0,0 +1,62 @@
+"""
+Скрипт миграции: IP адреса и User-Agent журнала активности в справочники
+
+Создает таблицы activity_log_ip_addresses и activity_log_user_agents, переносит в них
+уникальные значения, заменяет в activity_logs колонки ip_address/user_agent на
+ip_address_id/user_agent_id и удаляет старые колонки.
+"""
+from sqlalchemy import inspect, text
+from app.database import Base, engine, SessionLocal
+from app.models import LogIpAddress, LogUserAgent
+
+# Колонка activity_logs -> таблица справочника
+LOOKUP_TABLES = {
+    "ip_address": LogIpAddress.__tablename__,
+    "user_agent": LogUserAgent.__tablename__,
+}
+
+def add_activity_log_client_lookups():
+    """Переносит IP адреса и User-Agent журнала в справочники"""
+    Base.metadata.create_all(bind=engine, tables=[LogIpAddress.__table__, LogUserAgent.__table__])
+    columns = {column["name"] for column in inspect(engine).get_columns("activity_logs")}
+    if not any(column in columns for column in LOOKUP_TABLES):
+        print("✓ Activity log IP addresses and user agents are already in lookup tables")
+        return
+
+    db = SessionLocal()
+    try:
+        for column, table in LOOKUP_TABLES.items():
+            if column not in columns:
+                continue
+            print(f"Moving activity_logs.{column} to {table}...")
+            if f"{column}_id" not in columns:
+                db.execute(text(
+                    f"ALTER TABLE activity_logs ADD COLUMN {column}_id INTEGER REFERENCES {table}(id)"
+                ))
+            db.execute(text(f"""
+                INSERT INTO {table} (value)
+                SELECT DISTINCT {column} FROM activity_logs WHERE {column} IS NOT NULL
+                ON CONFLICT (value) DO NOTHING
+            """))
+            db.execute(text(f"""
+                UPDATE activity_logs SET {column}_id = lookup.id
+                FROM {table} AS lookup
+                WHERE lookup.value = activity_logs.{column}
+            """))
+            db.execute(text(f"ALTER TABLE activity_logs DROP COLUMN {column}"))
+        db.commit()
+        print("✓ Activity log IP addresses and user agents moved to lookup tables")
+        # Место старых колонок освобождается только после перезаписи таблицы
+        if engine.dialect.name == 'sqlite':
+            print("  Run VACUUM to reclaim space")
+        else:
+            print("  Run VACUUM FULL activity_logs (or pg_repack) to reclaim space")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_log_client_lookups()
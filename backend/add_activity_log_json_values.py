@@ -0,0 +1,48 @@
+"""
+Скрипт миграции: old_values/new_values журнала активности как нативный JSON
+
+PostgreSQL - колонки переводятся из text в jsonb (на секционированной таблице тип
+меняется и во всех секциях). SQLite - значения уже хранятся как JSON текст, тип
+колонки не меняется. В обеих БД создаются частичные индексы для фильтра changed_field.
+"""
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.models import changed_value_index_ddl
+
+def add_activity_log_json_values():
+    """Переводит значения журнала в JSON и создает индексы изменившихся полей"""
+    db = SessionLocal()
+    try:
+        dialect = engine.dialect.name
+        if dialect == 'postgresql':
+            values_type = db.scalar(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'activity_logs' AND column_name = 'old_values'"
+            ))
+            if values_type == 'jsonb':
+                print("✓ Columns old_values/new_values are already jsonb")
+            else:
+                print("Converting old_values/new_values to jsonb...")
+                db.execute(text("""
+                    ALTER TABLE activity_logs
+                        ALTER COLUMN old_values TYPE jsonb USING old_values::jsonb,
+                        ALTER COLUMN new_values TYPE jsonb USING new_values::jsonb
+                """))
+                print("✓ Columns old_values/new_values converted to jsonb")
+        elif dialect != 'sqlite':
+            print(f"✓ {dialect}: changed field indexes are not supported")
+            return
+
+        for statement in changed_value_index_ddl(dialect):
+            db.execute(text(statement))
+        db.commit()
+        print("✓ Activity log changed field indexes created")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_log_json_values()
@@ -0,0 +1,80 @@
+"""
+Скрипт миграции: перевод таблицы activity_logs на месячные секции (только PostgreSQL)
+
+SQLite секционирование не поддерживает - там срок хранения обеспечивает
+archive_activity_logs.py (архив и удаление старых записей).
+"""
+from datetime import datetime
+from sqlalchemy import text
+from app.config import LOG_PARTITIONS_AHEAD
+from app.database import engine, SessionLocal
+from app.log_retention import add_months, create_partition, is_partitioned, month_start
+from app.models import ACTIVITY_LOG_SEARCH_DDL, changed_value_index_ddl
+
+# Индексы секционированной таблицы (создаются на каждой секции автоматически)
+LOG_INDEX_COLUMNS = ("user_id", "username", "action", "entity_type", "entity_id", "created_at")
+
+def add_activity_log_partitions():
+    """Пересоздает activity_logs как таблицу, секционированную по created_at, и переносит данные"""
+    if engine.url.get_backend_name() != 'postgresql':
+        print("✓ SQLite: partitioning is not used, old logs are archived by archive_activity_logs.py")
+        return
+
+    db = SessionLocal()
+    try:
+        if is_partitioned(db):
+            print("✓ Table 'activity_logs' is already partitioned")
+            return
+
+        print("Converting activity_logs to a partitioned table...")
+        sequence = db.scalar(text("SELECT pg_get_serial_sequence('activity_logs', 'id')"))
+        oldest = db.scalar(text("SELECT min(created_at) FROM activity_logs"))
+
+        db.execute(text("ALTER TABLE activity_logs RENAME TO activity_logs_old"))
+        db.execute(text("UPDATE activity_logs_old SET created_at = now() WHERE created_at IS NULL"))
+        db.execute(text("""
+            CREATE TABLE activity_logs (LIKE activity_logs_old INCLUDING DEFAULTS)
+            PARTITION BY RANGE (created_at)
+        """))
+        # Ключ секционирования должен входить в первичный ключ
+        db.execute(text("ALTER TABLE activity_logs ADD PRIMARY KEY (id, created_at)"))
+        db.execute(text("CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT"))
+
+        month = month_start(oldest) if oldest else month_start(datetime.utcnow())
+        last = add_months(month_start(datetime.utcnow()), LOG_PARTITIONS_AHEAD)
+        while month <= last:
+            create_partition(db, month)
+            month = add_months(month, 1)
+
+        db.execute(text("INSERT INTO activity_logs SELECT * FROM activity_logs_old"))
+        if sequence:
+            # Последовательность id принадлежала старой таблице - переносим ее
+            db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY activity_logs.id"))
+        db.execute(text("DROP TABLE activity_logs_old"))
+
+        for column in LOG_INDEX_COLUMNS:
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_activity_logs_{column} ON activity_logs ({column})"))
+        db.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_activity_logs_created_at_id ON activity_logs (created_at, id)"
+        ))
+        for statement in ACTIVITY_LOG_SEARCH_DDL["postgresql"]:
+            db.execute(text(statement))
+        values_type = db.scalar(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'activity_logs' AND column_name = 'old_values'"
+        ))
+        if values_type == "jsonb":
+            # Иначе индексы создаст add_activity_log_json_values.py
+            for statement in changed_value_index_ddl("postgresql"):
+                db.execute(text(statement))
+        db.commit()
+        print("✓ Table 'activity_logs' partitioned by month")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_log_partitions()
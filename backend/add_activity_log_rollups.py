@@ -0,0 +1,27 @@
+"""
+Скрипт миграции: таблица дневных сводок логов активности и ее заполнение из activity_logs
+
+Повторный запуск пересчитывает сводки (например, после ручного изменения журнала).
+"""
+from app.database import engine, SessionLocal
+from app.models import ActivityLogDailyStat
+from app.log_rollups import rebuild_log_rollups
+
+def add_activity_log_rollups():
+    """Создает таблицу activity_log_daily_stats и пересчитывает сводки по журналу"""
+    ActivityLogDailyStat.__table__.create(bind=engine, checkfirst=True)
+    print("✓ Table 'activity_log_daily_stats' is ready")
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_log_rollups(db)
+        print(f"✓ Rollups rebuilt: {rows} rows")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_log_rollups()
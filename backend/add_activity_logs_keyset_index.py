@@ -0,0 +1,33 @@
+"""
+Скрипт миграции: составной индекс (created_at, id) для курсорной пагинации журнала активности
+"""
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+
+def add_activity_logs_keyset_index():
+    """Создает индекс ix_activity_logs_created_at_id и приводит created_at в SQLite к единому формату"""
+    db = SessionLocal()
+    try:
+        if engine.url.drivername == 'sqlite':
+            # Записи со значением по умолчанию CURRENT_TIMESTAMP хранятся без микросекунд,
+            # а строки в SQLite сравниваются как текст - дополняем до формата SQLAlchemy
+            result = db.execute(text(
+                "UPDATE activity_logs SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+            ))
+            db.commit()
+            print(f"✓ created_at normalized for {result.rowcount} log entries")
+
+        db.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_activity_logs_created_at_id ON activity_logs (created_at, id)"
+        ))
+        db.commit()
+        print("✓ Index 'ix_activity_logs_created_at_id' created")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_logs_keyset_index()
@@ -0,0 +1,36 @@
+"""
+Скрипт миграции: индексы поиска по журналу активности
+
+SQLite - таблица FTS5 activity_logs_fts с триггерами синхронизации и индекс lower(username).
+PostgreSQL - GIN индекс по tsvector(description) и индекс lower(username) text_pattern_ops.
+"""
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.models import ACTIVITY_LOG_SEARCH_DDL
+
+def add_activity_logs_search_index():
+    """Создает индексы поиска и заполняет полнотекстовый индекс существующими записями"""
+    db = SessionLocal()
+    try:
+        dialect = engine.dialect.name
+        statements = ACTIVITY_LOG_SEARCH_DDL.get(dialect)
+        if not statements:
+            print(f"✓ {dialect}: search indexes are not supported, ILIKE is used")
+            return
+
+        for statement in statements:
+            db.execute(text(statement))
+        if dialect == 'sqlite':
+            # Полнотекстовый индекс external content заполняется из activity_logs
+            db.execute(text("INSERT INTO activity_logs_fts(activity_logs_fts) VALUES ('rebuild')"))
+        db.commit()
+        print("✓ Activity log search indexes created")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_activity_logs_search_index()
@@ -0,0 +1,40 @@
+"""
+Скрипт миграции для добавления колонки token_version в таблицу users
+"""
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+
+def add_token_version_column():
+    """Добавляет колонку token_version (версия токенов пользователя для их отзыва)"""
+    db = SessionLocal()
+    try:
+        if engine.url.drivername == 'sqlite':
+            # Для SQLite проверяем структуру таблицы
+            result = db.execute(text("PRAGMA table_info(users)"))
+            columns = [row[1] for row in result]
+            has_column = 'token_version' in columns
+        else:
+            # Для PostgreSQL и других БД
+            result = db.execute(text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name='users' AND column_name='token_version'
+            """))
+            has_column = result.fetchone() is not None
+
+        if not has_column:
+            print("Adding token_version column to users table...")
+            db.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+            db.commit()
+            print("✓ Column 'token_version' added successfully")
+        else:
+            print("✓ Column 'token_version' already exists")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_token_version_column()
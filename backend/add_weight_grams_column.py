@@ -0,0 +1,58 @@
+"""
+Скрипт миграции для добавления колонки weight_grams и индексов фильтров каталога в таблицу desserts
+"""
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.models import Dessert, DESSERT_NUMERIC_COLUMNS, parse_weight_grams
+
+def add_weight_grams_column():
+    """Добавляет колонку weight_grams, заполняет её из weight и создает индексы (is_active, колонка)"""
+    db = SessionLocal()
+    try:
+        if engine.url.drivername == 'sqlite':
+            # Для SQLite проверяем структуру таблицы
+            result = db.execute(text("PRAGMA table_info(desserts)"))
+            columns = [row[1] for row in result]
+            has_column = 'weight_grams' in columns
+        else:
+            # Для PostgreSQL и других БД
+            result = db.execute(text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name='desserts' AND column_name='weight_grams'
+            """))
+            has_column = result.fetchone() is not None
+
+        if not has_column:
+            print("Adding weight_grams column to desserts table...")
+            db.execute(text("ALTER TABLE desserts ADD COLUMN weight_grams REAL"))
+            db.commit()
+            print("✓ Column 'weight_grams' added successfully")
+        else:
+            print("✓ Column 'weight_grams' already exists")
+
+        # Заполняем вес в граммах из текстового поля
+        rows = db.query(Dessert.id, Dessert.weight).filter(Dessert.weight.isnot(None)).all()
+        for dessert_id, weight in rows:
+            db.execute(
+                text("UPDATE desserts SET weight_grams = :grams WHERE id = :id"),
+                {"grams": parse_weight_grams(weight), "id": dessert_id}
+            )
+        db.commit()
+        print(f"✓ weight_grams filled for {len(rows)} desserts")
+
+        for column in DESSERT_NUMERIC_COLUMNS:
+            db.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_desserts_active_{column} ON desserts (is_active, {column})"
+            ))
+        db.commit()
+        print("✓ Catalog filter indexes created")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    add_weight_grams_column()
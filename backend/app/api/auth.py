@@ -1,16 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import User
+from app.principals import TokenPrincipal
 from app.auth import (
-    authenticate_user,
-    create_access_token,
-    get_password_hash,
-    get_user_by_username,
-    get_user_by_email,
+    authenticate_user_async,
+    create_user_access_token,
+    get_password_hash_async,
+    get_user_by_username_async,
+    get_user_by_email_async,
+    verify_password_async,
     get_current_user,
-    get_current_admin_user,
+    get_current_db_user,
+    require_admin,
 )
 from app.schemas import (
     UserCreate, 
@@ -22,31 +25,34 @@ from app.schemas import (
     ProfileUpdateResponse,
     UpdateCompanyProfileRequest
 )
-from app.auth import verify_password
-from app.logger import log_activity, get_client_ip, get_user_agent
+from app.logger import log_activity_async, get_client_ip, get_user_agent
+from app.passwords import password_hasher
+from app.principals import bump_token_version, principal_cache, token_versions
+from app.ratelimit import check_login_rate
+from app.config import BCRYPT_ROUNDS
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=201)
-def register(user_data: UserCreate, request: Request, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Регистрация нового пользователя"""
     # Проверка существования username
-    if get_user_by_username(db, user_data.username):
+    if await get_user_by_username_async(db, user_data.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this username already exists"
         )
     
     # Проверка существования email
-    if get_user_by_email(db, user_data.email):
+    if await get_user_by_email_async(db, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this email already exists"
         )
     
     # Создание нового пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -54,11 +60,11 @@ def register(user_data: UserCreate, request: Request, db: Session = Depends(get_
         is_admin=False  # Первый пользователь может быть админом, но лучше сделать отдельную логику
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Логируем регистрацию
-    log_activity(
+    await log_activity_async(
         db=db,
         action="user_register",
         user=db_user,
@@ -74,12 +80,14 @@ def register(user_data: UserCreate, request: Request, db: Session = Depends(get_
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Вход пользователя"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    await check_login_rate(request, form_data.username)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,33 +95,22 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_user_access_token(user)
     return Token(
         access_token=access_token,
         token_type="bearer",
-        user=UserResponse(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            is_active=user.is_active,
-            is_admin=user.is_admin,
-            is_moderator=user.is_moderator,
-            logo_url=user.logo_url,
-            company_name=user.company_name,
-            manager_contact=user.manager_contact,
-            catalog_description=user.catalog_description,
-            created_at=user.created_at
-        )
+        user=UserResponse.model_validate(user)
     )
 
 
 @router.post("/login-json", response_model=Token)
-def login_json(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
+async def login_json(credentials: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Вход пользователя через JSON (альтернатива OAuth2)"""
-    user = authenticate_user(db, credentials.username, credentials.password)
+    await check_login_rate(request, credentials.username)
+    user = await authenticate_user_async(db, credentials.username, credentials.password)
     if not user:
         # Логируем неудачную попытку входа
-        log_activity(
+        await log_activity_async(
             db=db,
             action="login_failed",
             user=None,
@@ -127,10 +124,10 @@ def login_json(credentials: UserLogin, request: Request, db: Session = Depends(g
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_user_access_token(user)
     
     # Логируем успешный вход
-    log_activity(
+    await log_activity_async(
         db=db,
         action="login",
         user=user,
@@ -142,44 +139,44 @@ def login_json(credentials: UserLogin, request: Request, db: Session = Depends(g
     return Token(
         access_token=access_token,
         token_type="bearer",
-        user=UserResponse(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            is_active=user.is_active,
-            is_admin=user.is_admin,
-            is_moderator=user.is_moderator,
-            logo_url=user.logo_url,
-            company_name=user.company_name,
-            manager_contact=user.manager_contact,
-            catalog_description=user.catalog_description,
-            created_at=user.created_at
-        )
+        user=UserResponse.model_validate(user)
     )
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Получить информацию о текущем пользователе"""
     return current_user
 
 
 @router.get("/admin/check")
-def check_admin_access(current_user: User = Depends(get_current_admin_user)):
-    """Проверка доступа администратора"""
+async def check_admin_access(current_user: TokenPrincipal = Depends(require_admin)):
+    """Проверка доступа администратора (по claims токена, без загрузки пользователя)"""
     return {"is_admin": True, "username": current_user.username}
 
 
+@router.get("/admin/password-hashing")
+async def get_password_hashing_stats(current_user: TokenPrincipal = Depends(require_admin)):
+    """Метрики пула хеширования паролей: время, очередь, отказы (только для администраторов)"""
+    return {
+        "rounds": BCRYPT_ROUNDS,
+        "workers": password_hasher.workers,
+        "queue_size": password_hasher.queue_size,
+        "pending": password_hasher.pending,
+        **password_hasher.metrics.snapshot(),
+    }
+
+
 @router.put("/profile/email", response_model=ProfileUpdateResponse)
-def update_email(
+async def update_email(
     email_data: UpdateEmailRequest,
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновить email пользователя"""
     # Проверка, что новый email не занят другим пользователем
-    existing_user = get_user_by_email(db, email_data.email)
+    existing_user = await get_user_by_email_async(db, email_data.email)
     if existing_user and existing_user.id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -190,11 +187,12 @@ def update_email(
     
     # Обновление email
     current_user.email = email_data.email
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.username)
+    await db.refresh(current_user)
     
     # Логируем изменение
-    log_activity(
+    await log_activity_async(
         db=db,
         action="profile_update",
         user=current_user,
@@ -209,51 +207,42 @@ def update_email(
     
     return ProfileUpdateResponse(
         message="Email updated successfully",
-        user=UserResponse(
-            id=current_user.id,
-            username=current_user.username,
-            email=current_user.email,
-            is_active=current_user.is_active,
-            is_admin=current_user.is_admin,
-            is_moderator=current_user.is_moderator,
-            logo_url=current_user.logo_url,
-            company_name=current_user.company_name,
-            manager_contact=current_user.manager_contact,
-            catalog_description=current_user.catalog_description,
-            created_at=current_user.created_at
-        )
+        user=UserResponse.model_validate(current_user)
     )
 
 
 @router.put("/profile/password", response_model=ProfileUpdateResponse)
-def update_password(
+async def update_password(
     password_data: UpdatePasswordRequest,
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Изменить пароль пользователя"""
     # Проверка текущего пароля
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
-    # Проверка, что новый пароль отличается от текущего
-    if verify_password(password_data.new_password, current_user.hashed_password):
+    # Проверка, что новый пароль отличается от текущего (текущий уже проверен по хешу)
+    if password_data.new_password == password_data.current_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="New password must be different from current password"
         )
     
-    # Обновление пароля
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
-    db.refresh(current_user)
+    # Обновление пароля; токены, выданные до смены (в том числе украденные), отзываются
+    current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    bump_token_version(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.username)
+    token_versions.set(current_user.id, current_user.token_version, current_user.is_active)
+    await db.refresh(current_user)
     
     # Логируем изменение пароля
-    log_activity(
+    await log_activity_async(
         db=db,
         action="password_change",
         user=current_user,
@@ -266,28 +255,18 @@ def update_password(
     
     return ProfileUpdateResponse(
         message="Password updated successfully",
-        user=UserResponse(
-            id=current_user.id,
-            username=current_user.username,
-            email=current_user.email,
-            is_active=current_user.is_active,
-            is_admin=current_user.is_admin,
-            is_moderator=current_user.is_moderator,
-            logo_url=current_user.logo_url,
-            company_name=current_user.company_name,
-            manager_contact=current_user.manager_contact,
-            catalog_description=current_user.catalog_description,
-            created_at=current_user.created_at
-        )
+        user=UserResponse.model_validate(current_user),
+        # Текущий токен отозван вместе с остальными - выдаем новый
+        access_token=create_user_access_token(current_user),
     )
 
 
 @router.put("/profile/company", response_model=ProfileUpdateResponse)
-def update_company_profile(
+async def update_company_profile(
     profile_data: UpdateCompanyProfileRequest,
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновить профиль компании (логотип, название, контакты, описание)"""
     # Сохраняем старые значения для лога
@@ -308,8 +287,9 @@ def update_company_profile(
     if profile_data.catalog_description is not None:
         current_user.catalog_description = profile_data.catalog_description
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.username)
+    await db.refresh(current_user)
     
     # Логируем изменение
     new_values = {
@@ -319,7 +299,7 @@ def update_company_profile(
         "catalog_description": current_user.catalog_description,
     }
     
-    log_activity(
+    await log_activity_async(
         db=db,
         action="profile_update",
         user=current_user,
@@ -334,17 +314,5 @@ def update_company_profile(
     
     return ProfileUpdateResponse(
         message="Company profile updated successfully",
-        user=UserResponse(
-            id=current_user.id,
-            username=current_user.username,
-            email=current_user.email,
-            is_active=current_user.is_active,
-            is_admin=current_user.is_admin,
-            is_moderator=current_user.is_moderator,
-            logo_url=current_user.logo_url,
-            company_name=current_user.company_name,
-            manager_contact=current_user.manager_contact,
-            catalog_description=current_user.catalog_description,
-            created_at=current_user.created_at
-        )
+        user=UserResponse.model_validate(current_user)
     )
@@ -1,30 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
-from app.database import get_db
-from app.models import Dessert, User
-from app.schemas import DessertCreate, DessertUpdate, DessertResponse
-from app.auth import get_current_admin_user, get_current_moderator_user
-from app.logger import log_activity, get_client_ip, get_user_agent
+from sqlalchemy import or_, insert, select, update, delete
+from typing import Any, Dict, List, Optional
+from app.database import get_db, get_async_db, AsyncSessionLocal
+from app.models import Dessert, DESSERT_NUMERIC_COLUMNS, parse_weight_grams
+from app.schemas import (
+    DessertCreate,
+    DessertUpdate,
+    DessertResponse,
+    DessertBulkSelection,
+    DessertBulkUpdate,
+    DessertBulkResult,
+)
+from app.auth import require_moderator
+from app.principals import TokenPrincipal
+from app.logger import build_log_values, log_activity, log_activity_async, log_activities_async, get_client_ip, get_user_agent
+from app.config import IMPORT_BATCH_SIZE, EXPORT_BATCH_SIZE, MAX_IMPORT_ERRORS, FUZZY_MAX_CANDIDATES, BULK_LOG_MAX_IDS
+from app.dessert_io import FORMAT_MEDIA_TYPES, detect_format, iter_import_records, iter_export_chunks
+from app.search import dessert_index, index_dessert
+from app.serialization import ORJSONResponse, serialize_rows
 
 router = APIRouter(prefix="/api/desserts", tags=["desserts"])
 
+# Поля, которые можно запросить через параметр fields
+DESSERT_FIELDS = tuple(DessertResponse.model_fields.keys())
+
+# Допустимые ключи сортировки (с префиксом "-" для сортировки по убыванию)
+SORT_KEYS = ("title",) + DESSERT_NUMERIC_COLUMNS
+SORT_PATTERN = f"^-?({'|'.join(SORT_KEYS)})$"
+
+# Поля, изменение которых требует переиндексации для нечеткого поиска
+INDEXED_FIELDS = {"title", "category", "ingredients", "is_active"}
+
+# Колонки строки индекса нечеткого поиска (порядок аргументов dessert_index.upsert)
+INDEX_COLUMNS = (Dessert.id, Dessert.title, Dessert.category, Dessert.ingredients, Dessert.is_active)
+
+
+def parse_dessert_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Разобрать параметр fields (через запятую) в список колонок, id всегда включается"""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in DESSERT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(DESSERT_FIELDS)}"
+        )
+    selected = ["id"]
+    for f in requested:
+        if f not in selected:
+            selected.append(f)
+    return selected
+
 
 @router.get("/", response_model=List[DessertResponse])
-def get_desserts(
+async def get_desserts(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     category: Optional[str] = None,
     search: Optional[str] = None,
+    fuzzy: bool = Query(False, description="Typo-tolerant search ranked by similarity (title, category, ingredients)"),
     is_active: Optional[bool] = True,
-    db: Session = Depends(get_db)
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_calories: Optional[float] = Query(None, ge=0),
+    max_calories: Optional[float] = Query(None, ge=0),
+    min_proteins: Optional[float] = Query(None, ge=0),
+    max_proteins: Optional[float] = Query(None, ge=0),
+    min_fats: Optional[float] = Query(None, ge=0),
+    max_fats: Optional[float] = Query(None, ge=0),
+    min_carbs: Optional[float] = Query(None, ge=0),
+    max_carbs: Optional[float] = Query(None, ge=0),
+    min_weight: Optional[float] = Query(None, ge=0, description="Minimum weight in grams"),
+    max_weight: Optional[float] = Query(None, ge=0, description="Maximum weight in grams"),
+    sort: str = Query(
+        "title",
+        pattern=SORT_PATTERN,
+        description="Sort key: title, price, calories, proteins, fats, carbs, weight_grams; prefix with '-' for descending"
+    ),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return, e.g. id,title,category,image_url,price"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получить список десертов с фильтрацией"""
-    query = db.query(Dessert)
+    selected = parse_dessert_fields(fields)
+    # Выбираем колонки, а не ORM объекты; при fields= без тяжелых Text полей
+    columns = selected or list(DESSERT_FIELDS)
+    query = select(*[getattr(Dessert, f) for f in columns])
 
     if is_active is not None:
-        query = query.filter(Dessert.is_active == is_active)
+        query = query.where(Dessert.is_active == is_active)
 
     if category:
         # Поддержка нескольких категорий через запятую
@@ -33,7 +101,7 @@ def get_desserts(
         category_list = [cat.strip() for cat in category.split(',')]
         if len(category_list) == 1:
             # Одна категория - ищем точное совпадение или категорию в списке через запятую
-            query = query.filter(
+            query = query.where(
                 or_(
                     Dessert.category == category_list[0],
                     Dessert.category.like(f"%{category_list[0]}%")
@@ -49,25 +117,60 @@ def get_desserts(
                         Dessert.category.like(f"%{cat}%")
                     )
                 )
-            query = query.filter(or_(*conditions))
+            query = query.where(or_(*conditions))
 
-    if search:
+    ranking = None
+    if search and fuzzy:
+        # Кандидаты из in-memory индекса, остальные фильтры применяются в БД
+        ranking = {
+            doc_id: position
+            for position, (doc_id, _) in enumerate(
+                dessert_index.search(search, limit=FUZZY_MAX_CANDIDATES, is_active=is_active)
+            )
+        }
+        if not ranking:
+            return ORJSONResponse([])
+        query = query.where(Dessert.id.in_(ranking))
+    elif search:
         search_term = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             or_(
                 Dessert.title.ilike(search_term),
                 Dessert.description.ilike(search_term)
             )
         )
 
-    desserts = query.order_by(Dessert.title).offset(skip).limit(limit).all()
-    return desserts
+    # Фильтры по диапазонам числовых значений (используют индексы is_active + колонка)
+    ranges = {
+        "price": (min_price, max_price),
+        "calories": (min_calories, max_calories),
+        "proteins": (min_proteins, max_proteins),
+        "fats": (min_fats, max_fats),
+        "carbs": (min_carbs, max_carbs),
+        "weight_grams": (min_weight, max_weight),
+    }
+    for column_name, (low, high) in ranges.items():
+        column = getattr(Dessert, column_name)
+        if low is not None:
+            query = query.where(column >= low)
+        if high is not None:
+            query = query.where(column <= high)
+
+    sort_column = getattr(Dessert, sort.lstrip("-"))
+    order = sort_column.desc() if sort.startswith("-") else sort_column.asc()
+
+    if ranking is not None:
+        # Результаты нечеткого поиска упорядочены по сходству
+        rows = sorted((await db.execute(query)).all(), key=lambda row: ranking[row.id])[skip:skip + limit]
+    else:
+        rows = (await db.execute(query.order_by(order, Dessert.id).offset(skip).limit(limit))).all()
+    return ORJSONResponse(serialize_rows(rows, columns, None if selected else DessertResponse))
 
 
 @router.get("/categories", response_model=List[str])
-def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_async_db)):
     """Получить список всех категорий (уникальные, разделенные по запятой)"""
-    categories_raw = db.query(Dessert.category).distinct().all()
+    categories_raw = (await db.execute(select(Dessert.category).distinct())).all()
     # Собираем все уникальные категории, разделяя по запятой
     all_categories = set()
     for cat_tuple in categories_raw:
@@ -78,30 +181,167 @@ def get_categories(db: Session = Depends(get_db)):
     return sorted(list(all_categories))
 
 
+@router.get("/export")
+async def export_desserts(
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    is_active: Optional[bool] = None,
+    current_user: TokenPrincipal = Depends(require_moderator)
+):
+    """Потоковый экспорт десертов в CSV/NDJSON (для модераторов и администраторов)"""
+    columns = ["id"] + [f for f in DESSERT_FIELDS if f != "id"]
+
+    async def generate():
+        # Отдельная сессия живет столько же, сколько поток ответа
+        async with AsyncSessionLocal() as db:
+            query = select(*[getattr(Dessert, f) for f in columns])
+            if is_active is not None:
+                query = query.where(Dessert.is_active == is_active)
+            result = await db.stream(
+                query.order_by(Dessert.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            include_header = True
+            async for partition in result.partitions():
+                for chunk in iter_export_chunks(partition, columns, file_format, include_header):
+                    yield chunk
+                include_header = False
+            if include_header:
+                # Пустая выборка: в CSV все равно отдаем заголовок
+                for chunk in iter_export_chunks([], columns, file_format):
+                    yield chunk
+
+    return StreamingResponse(
+        generate(),
+        media_type=FORMAT_MEDIA_TYPES[file_format],
+        headers={
+            "Content-Disposition": f"attachment; filename=desserts.{file_format}"
+        }
+    )
+
+
+@router.post("/import")
+def import_desserts(
+    request: Request,
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
+):
+    """Потоковый импорт десертов из CSV/NDJSON пачками (для модераторов и администраторов)"""
+    file_format = detect_format(file_format, file.filename)
+    if not file_format:
+        raise HTTPException(
+            status_code=400,
+            detail="Unknown import format. Use format=csv or format=ndjson"
+        )
+
+    imported = 0
+    batches = 0
+    error_count = 0
+    errors: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+
+    for line_no, record, error in iter_import_records(file.file, file_format):
+        if error is None:
+            try:
+                batch.append(DessertCreate.model_validate(record).model_dump())
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+        if error is not None:
+            error_count += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": line_no, "error": error})
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            batches += 1
+            imported += insert_dessert_batch(db, batch, batches, request, current_user)
+            batch = []
+
+    if batch:
+        batches += 1
+        imported += insert_dessert_batch(db, batch, batches, request, current_user)
+
+    return {
+        "imported": imported,
+        "batches": batches,
+        "error_count": error_count,
+        "errors": errors,
+    }
+
+
+def insert_dessert_batch(
+    db: Session,
+    batch: List[Dict[str, Any]],
+    batch_number: int,
+    request: Request,
+    current_user: TokenPrincipal
+) -> int:
+    """Вставить пачку десертов и сводную запись лога одной транзакцией"""
+    # Core insert минует ORM валидаторы, поэтому вес в граммах считаем здесь
+    for item in batch:
+        item["weight_grams"] = parse_weight_grams(item.get("weight"))
+    ids = db.scalars(
+        insert(Dessert).returning(Dessert.id, sort_by_parameter_order=True), batch
+    ).all()
+    log_activity(
+        db=db,
+        action="dessert_import",
+        user=current_user,
+        entity_type="dessert",
+        description=f"{'Admin' if current_user.is_admin else 'Moderator'} {current_user.username} imported {len(batch)} desserts (batch {batch_number})",
+        new_values={"count": len(batch), "titles": [item["title"] for item in batch[:10]]},
+        ip_address=get_client_ip(request),
+        user_agent=get_user_agent(request),
+        commit=False,
+    )
+    db.commit()
+
+    for dessert_id, item in zip(ids, batch):
+        dessert_index.upsert(
+            dessert_id, item["title"], item["category"], item.get("ingredients"), item.get("is_active")
+        )
+    return len(batch)
+
+
 @router.get("/{dessert_id}", response_model=DessertResponse)
-def get_dessert(dessert_id: int, db: Session = Depends(get_db)):
+async def get_dessert(
+    dessert_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Получить десерт по ID"""
-    dessert = db.query(Dessert).filter(Dessert.id == dessert_id).first()
+    selected = parse_dessert_fields(fields)
+    if selected:
+        row = (await db.execute(
+            select(*[getattr(Dessert, f) for f in selected]).where(Dessert.id == dessert_id)
+        )).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Десерт не найден")
+        return ORJSONResponse(dict(row._mapping))
+
+    dessert = await db.get(Dessert, dessert_id)
     if not dessert:
         raise HTTPException(status_code=404, detail="Десерт не найден")
     return dessert
 
 
 @router.post("/", response_model=DessertResponse, status_code=201)
-def create_dessert(
+async def create_dessert(
     dessert: DessertCreate,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_moderator_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
 ):
     """Создать новый десерт (для модераторов и администраторов)"""
     db_dessert = Dessert(**dessert.model_dump())
     db.add(db_dessert)
-    db.commit()
-    db.refresh(db_dessert)
+    await db.commit()
+    await db.refresh(db_dessert)
+    index_dessert(db_dessert)
     
     # Логируем создание
-    log_activity(
+    await log_activity_async(
         db=db,
         action="dessert_create",
         user=current_user,
@@ -116,16 +356,137 @@ def create_dessert(
     return db_dessert
 
 
+def bulk_selection_conditions(selection: DessertBulkSelection) -> list:
+    """Условия выборки для массовой операции (пустой выбор запрещен)"""
+    conditions = []
+    if selection.ids is not None:
+        conditions.append(Dessert.id.in_(selection.ids))
+    if selection.category is not None:
+        conditions.append(Dessert.category == selection.category)
+    if selection.is_active is not None:
+        conditions.append(Dessert.is_active == selection.is_active)
+    if not conditions:
+        raise HTTPException(
+            status_code=400,
+            detail="Specify ids and/or a filter (category, is_active) for bulk operation"
+        )
+    return conditions
+
+
+@router.put("/bulk", response_model=DessertBulkResult)
+async def bulk_update_desserts(
+    bulk: DessertBulkUpdate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
+):
+    """Массово обновить десерты одним UPDATE (для модераторов и администраторов)"""
+    conditions = bulk_selection_conditions(bulk)
+    update_data = bulk.changes.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No changes specified")
+
+    # Старые значения только изменяемых полей для записей лога
+    changed_columns = [getattr(Dessert, field) for field in update_data]
+    old_rows = (await db.execute(
+        select(Dessert.id, *changed_columns).where(*conditions).order_by(Dessert.id)
+    )).all()
+    if not old_rows:
+        return DessertBulkResult(matched=0, affected=0)
+
+    values = dict(update_data)
+    if "weight" in values:
+        values["weight_grams"] = parse_weight_grams(values["weight"])
+    statement = (
+        update(Dessert).where(*conditions).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        rows = (await db.execute(statement.returning(*INDEX_COLUMNS))).all()
+    else:
+        # Без RETURNING строки выбираются до UPDATE (после него фильтр может уже не совпадать)
+        before = (await db.execute(select(*INDEX_COLUMNS).where(*conditions))).all()
+        await db.execute(statement)
+        rows = [
+            tuple(values.get(column.key, value) for column, value in zip(INDEX_COLUMNS, row))
+            for row in before
+        ]
+    ids = sorted(row[0] for row in rows)
+
+    # Запись на каждый десерт (entity_id, значения полей как у обычного обновления):
+    # изменение находится фильтрами entity_id и changed_field
+    description = f"{'Admin' if current_user.is_admin else 'Moderator'} {current_user.username} bulk updated {len(ids)} desserts: {', '.join(update_data)}"
+    ip_address, user_agent = get_client_ip(request), get_user_agent(request)
+    await log_activities_async(db, [
+        build_log_values(
+            "dessert_bulk_update", current_user, "dessert", row.id, description,
+            old_values={field: row._mapping[field] for field in update_data},
+            new_values=update_data,
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        for row in old_rows
+    ])
+    await db.commit()
+
+    if INDEXED_FIELDS.intersection(update_data):
+        for row in rows:
+            dessert_index.upsert(*row)
+
+    return DessertBulkResult(matched=len(ids), affected=len(ids))
+
+
+@router.post("/bulk/delete", response_model=DessertBulkResult)
+async def bulk_delete_desserts(
+    selection: DessertBulkSelection,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
+):
+    """Массово удалить десерты одним DELETE (для модераторов и администраторов)"""
+    conditions = bulk_selection_conditions(selection)
+
+    statement = delete(Dessert).where(*conditions).execution_options(synchronize_session=False)
+    columns = (Dessert.id, Dessert.title, Dessert.category)
+    if db.get_bind().dialect.delete_returning:
+        old_rows = (await db.execute(statement.returning(*columns))).all()
+    else:
+        old_rows = (await db.execute(select(*columns).where(*conditions))).all()
+        await db.execute(statement)
+    if not old_rows:
+        return DessertBulkResult(matched=0, affected=0)
+    old_rows.sort(key=lambda row: row.id)
+
+    await log_activity_async(
+        db=db,
+        action="dessert_bulk_delete",
+        user=current_user,
+        entity_type="dessert",
+        description=f"{'Admin' if current_user.is_admin else 'Moderator'} {current_user.username} bulk deleted {len(old_rows)} desserts",
+        old_values={str(row.id): {"title": row.title, "category": row.category} for row in old_rows[:BULK_LOG_MAX_IDS]},
+        new_values={"count": len(old_rows)},
+        ip_address=get_client_ip(request),
+        user_agent=get_user_agent(request),
+        commit=False,
+    )
+    await db.commit()
+
+    for row in old_rows:
+        dessert_index.remove(row.id)
+
+    return DessertBulkResult(matched=len(old_rows), affected=len(old_rows))
+
+
 @router.put("/{dessert_id}", response_model=DessertResponse)
-def update_dessert(
+async def update_dessert(
     dessert_id: int,
     dessert: DessertUpdate,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_moderator_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
 ):
     """Обновить десерт (для модераторов и администраторов)"""
-    db_dessert = db.query(Dessert).filter(Dessert.id == dessert_id).first()
+    db_dessert = await db.get(Dessert, dessert_id)
     if not db_dessert:
         raise HTTPException(status_code=404, detail="Десерт не найден")
 
@@ -141,8 +502,9 @@ def update_dessert(
     for field, value in update_data.items():
         setattr(db_dessert, field, value)
 
-    db.commit()
-    db.refresh(db_dessert)
+    await db.commit()
+    await db.refresh(db_dessert)
+    index_dessert(db_dessert)
     
     # Логируем обновление
     new_values = {
@@ -152,7 +514,7 @@ def update_dessert(
         "price": db_dessert.price,
     }
     
-    log_activity(
+    await log_activity_async(
         db=db,
         action="dessert_update",
         user=current_user,
@@ -169,14 +531,14 @@ def update_dessert(
 
 
 @router.delete("/{dessert_id}", status_code=204)
-def delete_dessert(
+async def delete_dessert(
     dessert_id: int,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_moderator_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenPrincipal = Depends(require_moderator)
 ):
     """Удалить десерт (для модераторов и администраторов)"""
-    db_dessert = db.query(Dessert).filter(Dessert.id == dessert_id).first()
+    db_dessert = await db.get(Dessert, dessert_id)
     if not db_dessert:
         raise HTTPException(status_code=404, detail="Десерт не найден")
 
@@ -187,11 +549,12 @@ def delete_dessert(
         "category": db_dessert.category,
     }
 
-    db.delete(db_dessert)
-    db.commit()
+    await db.delete(db_dessert)
+    await db.commit()
+    dessert_index.remove(dessert_id)
     
     # Логируем удаление
-    log_activity(
+    await log_activity_async(
         db=db,
         action="dessert_delete",
         user=current_user,
@@ -2,159 +2,258 @@
 API endpoints для просмотра логов активности (только для администраторов)
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc
-from app.database import get_db
-from app.models import ActivityLog, User
-from app.auth import get_current_admin_user
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select, tuple_
+from app.database import get_async_db, AsyncSessionLocal, count_rows, count_rows_capped, estimate_rows
+from app.models import ActivityLog, ActivityLogDailyStat, User
+from app.log_rollups import ROLLUP_DIMENSIONS
+from app.log_search import FIELD_NAME_PATTERN, DescriptionMatch, UsernamePrefix, ValueChanged
+from app.auth import get_current_admin_user, require_admin
+from app.principals import TokenPrincipal
 from app.schemas import ActivityLogResponse, ActivityLogListResponse
-from typing import Optional
+from app.config import LOG_COUNT_CAP, EXPORT_BATCH_SIZE
+from app.dessert_io import FORMAT_MEDIA_TYPES, iter_export_chunks
+from app.log_writer import activity_log_writer
+from app.pagination import created_at_key, decode_cursor, encode_cursor
+from app.ratelimit import login_rate_limiter
+from app.serialization import ORJSONResponse, model_columns, serialize_rows
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
 
 
-@router.get("/", response_model=ActivityLogListResponse)
-def get_logs(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=500),
+def filter_logs(
+    query,
     action: Optional[str] = None,
     entity_type: Optional[str] = None,
     user_id: Optional[int] = None,
     username: Optional[str] = None,
     search: Optional[str] = None,
-    days: Optional[int] = Query(None, ge=1, le=365, description="Filter logs for last N days"),
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    days: Optional[int] = None,
+    entity_id: Optional[int] = None,
+    changed_field: Optional[str] = None,
 ):
-    """Получить список логов активности (только для администраторов)"""
-    query = db.query(ActivityLog)
-    
+    """Применить фильтры журнала (общие для списка и экспорта)"""
     # Фильтр по типу действия
     if action:
-        query = query.filter(ActivityLog.action == action)
+        query = query.where(ActivityLog.action == action)
     
     # Фильтр по типу сущности
     if entity_type:
-        query = query.filter(ActivityLog.entity_type == entity_type)
+        query = query.where(ActivityLog.entity_type == entity_type)
+    
+    # Фильтр по ID сущности
+    if entity_id:
+        query = query.where(ActivityLog.entity_id == entity_id)
+    
+    # Записи, в которых изменилось поле (например, price)
+    if changed_field:
+        query = query.where(ValueChanged(changed_field))
     
     # Фильтр по ID пользователя
     if user_id:
-        query = query.filter(ActivityLog.user_id == user_id)
+        query = query.where(ActivityLog.user_id == user_id)
     
-    # Фильтр по имени пользователя
+    # Фильтр по началу имени пользователя (без учета регистра, по индексу)
     if username:
-        query = query.filter(ActivityLog.username.ilike(f"%{username}%"))
+        query = query.where(UsernamePrefix(username))
     
-    # Поиск по описанию
+    # Полнотекстовый поиск по описанию (слова запроса - префиксы слов описания)
     if search:
-        query = query.filter(ActivityLog.description.ilike(f"%{search}%"))
+        query = query.where(DescriptionMatch(search))
     
-    # Фильтр по дате (последние N дней)
+    # Фильтр по дате (последние N дней). Условие на created_at без выражений над колонкой:
+    # на секционированной таблице PostgreSQL читаются только секции, пересекающие окно
     if days:
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(ActivityLog.created_at >= cutoff_date)
+        query = query.where(ActivityLog.created_at >= cutoff_date)
+    return query
+
+
+@router.get("/", response_model=ActivityLogListResponse)
+async def get_logs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    username: Optional[str] = None,
+    search: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1, le=365, description="Filter logs for last N days"),
+    entity_id: Optional[int] = None,
+    changed_field: Optional[str] = Query(None, pattern=FIELD_NAME_PATTERN, description="Only entries where this field changed"),
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor of the previous page (skip is ignored)"),
+    total_mode: str = Query("exact", alias="total", pattern="^(exact|capped|estimate)$", description="How to compute total"),
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Получить список логов активности (только для администраторов)
+
+    Страницы можно листать по skip (OFFSET) или по курсору next_cursor: курсор
+    продолжает выборку по индексу (created_at, id) без пропуска строк через OFFSET.
+    total=capped считает не больше LOG_COUNT_CAP строк, total=estimate берет оценку
+    из плана запроса (PostgreSQL, иначе как capped).
+    """
+    query = filter_logs(select(ActivityLog), action, entity_type, user_id, username, search, days, entity_id, changed_field)
     
-    total = query.count()
+    total, total_is_estimate = await count_logs(db, query, total_mode)
     
-    # Сортировка по дате (новые сначала)
-    logs = query.order_by(desc(ActivityLog.created_at)).offset(skip).limit(limit).all()
+    # Сортировка по дате (новые сначала, при равенстве - по id), выбираем только колонки схемы ответа
+    # и ключ курсора (в SQLite - дата в том виде, в каком она записана)
+    columns = model_columns(ActivityLogResponse)
+    dialect_name = db.get_bind().dialect.name
+    sort_key = created_at_key(ActivityLog.created_at, dialect_name)
+    page_query = query.with_only_columns(
+        *[getattr(ActivityLog, c) for c in columns], sort_key.label("cursor_key")
+    ).order_by(desc(sort_key), desc(ActivityLog.id))
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, as_text=dialect_name == "sqlite")
+        page_query = page_query.where(
+            tuple_(sort_key, ActivityLog.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    else:
+        page_query = page_query.offset(skip)
+    # Лишняя строка показывает, есть ли следующая страница
+    rows = (await db.execute(page_query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor(last["cursor_key"], last["id"])
     
-    return ActivityLogListResponse(
-        logs=[ActivityLogResponse(
-            id=log.id,
-            user_id=log.user_id,
-            username=log.username,
-            action=log.action,
-            entity_type=log.entity_type,
-            entity_id=log.entity_id,
-            description=log.description,
-            old_values=log.old_values,
-            new_values=log.new_values,
-            ip_address=log.ip_address,
-            user_agent=log.user_agent,
-            created_at=log.created_at
-        ) for log in logs],
-        total=total,
-        page=skip // limit + 1 if limit > 0 else 1,
-        page_size=limit
+    return ORJSONResponse({
+        "logs": serialize_rows(rows, columns, ActivityLogResponse),
+        "total": total,
+        "page": skip // limit + 1 if limit > 0 else 1,
+        "page_size": limit,
+        "next_cursor": next_cursor,
+        "total_is_estimate": total_is_estimate,
+    })
+
+
+async def count_logs(db: AsyncSession, query, mode: str) -> Tuple[int, bool]:
+    """Количество логов по фильтру: (total, приблизительное ли значение)"""
+    if mode == "estimate":
+        estimate = await estimate_rows(db, query)
+        if estimate is not None:
+            return estimate, True
+    if mode in ("estimate", "capped"):
+        total = await count_rows_capped(db, query, LOG_COUNT_CAP)
+        return total, total >= LOG_COUNT_CAP
+    return await count_rows(db, query), False
+
+
+@router.get("/export")
+async def export_logs(
+    file_format: str = Query("ndjson", alias="format", pattern="^(csv|ndjson)$"),
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    username: Optional[str] = None,
+    search: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1, le=365, description="Filter logs for last N days"),
+    entity_id: Optional[int] = None,
+    changed_field: Optional[str] = Query(None, pattern=FIELD_NAME_PATTERN, description="Only entries where this field changed"),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """Потоковый экспорт журнала в NDJSON/CSV с фильтрами как у списка (только для администраторов)"""
+    columns = model_columns(ActivityLogResponse)
+    query = filter_logs(
+        select(*[getattr(ActivityLog, c) for c in columns]),
+        action, entity_type, user_id, username, search, days, entity_id, changed_field,
+    ).order_by(ActivityLog.created_at, ActivityLog.id)
+
+    async def generate():
+        # Отдельная сессия живет столько же, сколько поток ответа; строки читаются
+        # серверным курсором пачками по EXPORT_BATCH_SIZE
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            include_header = True
+            async for partition in result.partitions():
+                for chunk in iter_export_chunks(partition, columns, file_format, include_header):
+                    yield chunk
+                include_header = False
+            if include_header:
+                # Пустая выборка: в CSV все равно отдаем заголовок
+                for chunk in iter_export_chunks([], columns, file_format):
+                    yield chunk
+
+    return StreamingResponse(
+        generate(),
+        media_type=FORMAT_MEDIA_TYPES[file_format],
+        headers={
+            "Content-Disposition": f"attachment; filename=activity_logs.{file_format}"
+        }
     )
 
 
 @router.get("/{log_id}", response_model=ActivityLogResponse)
-def get_log(
+async def get_log(
     log_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Получить конкретную запись лога по ID (только для администраторов)"""
-    log = db.query(ActivityLog).filter(ActivityLog.id == log_id).first()
+    log = await db.get(ActivityLog, log_id)
     if not log:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Log not found"
         )
     
-    return ActivityLogResponse(
-        id=log.id,
-        user_id=log.user_id,
-        username=log.username,
-        action=log.action,
-        entity_type=log.entity_type,
-        entity_id=log.entity_id,
-        description=log.description,
-        old_values=log.old_values,
-        new_values=log.new_values,
-        ip_address=log.ip_address,
-        user_agent=log.user_agent,
-        created_at=log.created_at
-    )
+    return ActivityLogResponse.model_validate(log)
+
+
+@router.get("/stats/writer")
+async def get_log_writer_stats(current_user: TokenPrincipal = Depends(require_admin)):
+    """Метрики фоновой записи логов: очередь, записанные и отброшенные записи (только для администраторов)"""
+    return activity_log_writer.snapshot()
 
 
 @router.get("/stats/summary")
-def get_logs_summary(
+async def get_logs_summary(
     days: int = Query(7, ge=1, le=365, description="Statistics for last N days"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Получить статистику по логам (только для администраторов)"""
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Общее количество логов
-    total_logs = db.query(ActivityLog).filter(ActivityLog.created_at >= cutoff_date).count()
-    
-    # Количество логов по действиям
-    from sqlalchemy import func
-    action_stats = db.query(
-        ActivityLog.action,
-        func.count(ActivityLog.id).label('count')
-    ).filter(
-        ActivityLog.created_at >= cutoff_date
-    ).group_by(ActivityLog.action).all()
+    """
+    Получить статистику по логам (только для администраторов)
+
+    Читаются только дневные сводки activity_log_daily_stats за дни начиная с
+    (сегодня - days), сам журнал не сканируется.
+    """
+    first_day = datetime.utcnow().date() - timedelta(days=days)
+    rows = (await db.execute(
+        select(
+            ActivityLogDailyStat.dimension,
+            ActivityLogDailyStat.key,
+            func.sum(ActivityLogDailyStat.count).label('count')
+        ).where(
+            ActivityLogDailyStat.day >= first_day
+        ).group_by(ActivityLogDailyStat.dimension, ActivityLogDailyStat.key)
+    )).all()
     
-    # Количество логов по типам сущностей
-    entity_stats = db.query(
-        ActivityLog.entity_type,
-        func.count(ActivityLog.id).label('count')
-    ).filter(
-        ActivityLog.created_at >= cutoff_date,
-        ActivityLog.entity_type.isnot(None)
-    ).group_by(ActivityLog.entity_type).all()
+    stats: Dict[str, Dict[str, int]] = {dimension: {} for dimension in ROLLUP_DIMENSIONS}
+    for dimension, key, count in rows:
+        stats[dimension][key] = int(count)
     
+    # Каждая запись лога имеет action, поэтому сумма по действиям - общее количество
+    total_logs = sum(stats["action"].values())
+    action_stats = stats["action"].items()
+    entity_stats = stats["entity_type"].items()
     # Топ пользователей по активности
-    user_stats = db.query(
-        ActivityLog.username,
-        func.count(ActivityLog.id).label('count')
-    ).filter(
-        ActivityLog.created_at >= cutoff_date,
-        ActivityLog.username.isnot(None)
-    ).group_by(ActivityLog.username).order_by(desc('count')).limit(10).all()
+    user_stats = sorted(stats["username"].items(), key=lambda item: (-item[1], item[0]))[:10]
     
     return {
         "period_days": days,
         "total_logs": total_logs,
         "actions": {action: count for action, count in action_stats},
         "entities": {entity_type: count for entity_type, count in entity_stats},
-        "top_users": [{"username": username, "count": count} for username, count in user_stats]
+        "top_users": [{"username": username, "count": count} for username, count in user_stats],
+        # Отклоненные ограничителем попытки входа (в лог построчно не пишутся)
+        "throttled_logins": await login_rate_limiter.throttled_count(days),
     }
 
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth import get_token_principal, oauth2_scheme, require_admin
+from app.config import METRICS_TOKEN
+from app.database import get_async_db
+from app.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+import secrets
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Метрики в формате Prometheus: Bearer METRICS_TOKEN (для сборщика) или токен администратора"""
+    if not (METRICS_TOKEN and secrets.compare_digest(token.encode(), METRICS_TOKEN.encode())):
+        await require_admin(await get_token_principal(token, db))
+    return Response(await render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
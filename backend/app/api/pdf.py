@@ -7,6 +7,7 @@ from app.models import Dessert, User
 from app.schemas import PDFExportSettings
 from app.pdf.generator import generate_pdf
 from app.auth import get_current_user
+from app.metrics import pdf_jobs
 
 router = APIRouter(prefix="/api/pdf", tags=["pdf"])
 
@@ -45,7 +46,8 @@ def export_pdf(
         settings.catalog_description = current_user.catalog_description
     
     # Generate PDF
-    pdf_buffer = generate_pdf(desserts, settings)
+    with pdf_jobs:
+        pdf_buffer = generate_pdf(desserts, settings)
     
     # Return file for download
     return StreamingResponse(
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from typing import Any, Dict, List
+from app.auth import require_admin
+from app.principals import TokenPrincipal
+from app.profiling import profile_store
+import json
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+def profile_path(profile_id: str, suffix: str):
+    """Файл профиля или 404"""
+    path = profile_store.path(profile_id, suffix)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return path
+
+
+@router.get("/")
+def list_profiles(current_user: TokenPrincipal = Depends(require_admin)) -> List[Dict[str, Any]]:
+    """Сводки сохраненных профилей запросов, новые первыми (только для администраторов)"""
+    return profile_store.summaries()
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, current_user: TokenPrincipal = Depends(require_admin)) -> Dict[str, Any]:
+    """Сводка профиля: самые горячие функции (только для администраторов)"""
+    return json.loads(profile_path(profile_id, ".json").read_text(encoding="utf-8"))
+
+
+@router.get("/{profile_id}/collapsed")
+def download_profile(profile_id: str, current_user: TokenPrincipal = Depends(require_admin)):
+    """Профиль в формате collapsed stacks (speedscope, flamegraph.pl)"""
+    return FileResponse(
+        profile_path(profile_id, ".collapsed"),
+        media_type="text/plain; charset=utf-8",
+        filename=f"{profile_id}.collapsed",
+    )
@@ -1,7 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
 from app.config import UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, IMAGES_URL_PREFIX
 from app.auth import get_current_user
 from app.models import User
@@ -27,7 +25,6 @@ def validate_image_file(file: UploadFile) -> None:
 @router.post("/image")
 async def upload_image(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Upload image to server (requires authentication)"""
@@ -2,28 +2,30 @@
 API endpoints для управления пользователями (только для администраторов)
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
+from app.database import get_async_db, count_rows
 from app.models import User
 from app.auth import get_current_admin_user
 from app.schemas import UserResponse, UserUpdateRequest, UserListResponse
-from app.logger import log_activity, get_client_ip, get_user_agent
+from app.logger import log_activity_async, get_client_ip, get_user_agent
+from app.principals import bump_token_version, principal_cache, token_versions
+from app.serialization import ORJSONResponse, model_columns, serialize_rows
 from typing import Optional
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/", response_model=UserListResponse)
-def get_users(
+async def get_users(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Получить список всех пользователей (только для администраторов)"""
-    query = db.query(User)
+    query = select(User)
     
     # Поиск по username или email
     if search:
@@ -32,68 +34,48 @@ def get_users(
             User.email.ilike(f"%{search}%"),
             User.company_name.ilike(f"%{search}%")
         )
-        query = query.filter(search_filter)
-    
-    total = query.count()
-    users = query.order_by(User.created_at.desc()).offset(skip).limit(limit).all()
-    
-    return UserListResponse(
-        users=[UserResponse(
-            id=u.id,
-            username=u.username,
-            email=u.email,
-            is_active=u.is_active,
-            is_admin=u.is_admin,
-            is_moderator=u.is_moderator,
-            logo_url=u.logo_url,
-            company_name=u.company_name,
-            manager_contact=u.manager_contact,
-            catalog_description=u.catalog_description,
-            created_at=u.created_at
-        ) for u in users],
-        total=total
-    )
+        query = query.where(search_filter)
+    
+    total = await count_rows(db, query)
+    columns = model_columns(UserResponse)
+    rows = (await db.execute(
+        query.with_only_columns(*[getattr(User, c) for c in columns])
+        .order_by(User.created_at.desc()).offset(skip).limit(limit)
+    )).all()
+
+    return ORJSONResponse({
+        "users": serialize_rows(rows, columns, UserResponse),
+        "total": total,
+    })
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Получить информацию о пользователе по ID (только для администраторов)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_active=user.is_active,
-        is_admin=user.is_admin,
-        is_moderator=user.is_moderator,
-        logo_url=user.logo_url,
-        company_name=user.company_name,
-        manager_contact=user.manager_contact,
-        catalog_description=user.catalog_description,
-        created_at=user.created_at
-    )
+    return UserResponse.model_validate(user)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_data: UserUpdateRequest,
     request: Request,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Обновить пользователя (только для администраторов)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -114,10 +96,10 @@ def update_user(
     # Обновляем поля
     if user_data.email is not None:
         # Проверяем, что email не занят другим пользователем
-        existing_user = db.query(User).filter(
+        existing_user = await db.scalar(select(User).where(
             User.email == user_data.email,
             User.id != user_id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -149,8 +131,17 @@ def update_user(
     if user_data.catalog_description is not None:
         user.catalog_description = user_data.catalog_description
     
-    db.commit()
-    db.refresh(user)
+    if (user.is_active, user.is_admin, user.is_moderator) != (
+        old_values["is_active"], old_values["is_admin"], old_values["is_moderator"]
+    ):
+        # Роли в выданных токенах устарели - отзываем их
+        bump_token_version(user)
+    
+    await db.commit()
+    # Роль и статус читаются из кеша при аутентификации - сбрасываем его
+    principal_cache.invalidate(user.username)
+    token_versions.set(user.id, user.token_version, user.is_active)
+    await db.refresh(user)
     
     # Логируем изменение
     new_values = {
@@ -163,7 +154,7 @@ def update_user(
         "catalog_description": user.catalog_description,
     }
     
-    log_activity(
+    await log_activity_async(
         db=db,
         action="user_update",
         user=current_user,
@@ -176,30 +167,18 @@ def update_user(
         user_agent=get_user_agent(request),
     )
     
-    return UserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_active=user.is_active,
-        is_admin=user.is_admin,
-        is_moderator=user.is_moderator,
-        logo_url=user.logo_url,
-        company_name=user.company_name,
-        manager_contact=user.manager_contact,
-        catalog_description=user.catalog_description,
-        created_at=user.created_at
-    )
+    return UserResponse.model_validate(user)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     user_id: int,
     request: Request,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Удалить пользователя (только для администраторов)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -220,11 +199,13 @@ def delete_user(
         "email": user.email,
     }
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    principal_cache.invalidate(user_info["username"])
+    token_versions.remove(user_id)
     
     # Логируем удаление
-    log_activity(
+    await log_activity_async(
         db=db,
         action="user_delete",
         user=current_user,
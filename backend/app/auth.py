@@ -1,13 +1,23 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from jose import JWTError, jwt
-import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
+from app.passwords import check_password, hash_password, needs_rehash, password_hasher
+from app.principals import (
+    TokenPrincipal,
+    fetch_token_version,
+    principal_cache,
+    refresh_token_versions,
+    token_versions,
+)
 import os
+import secrets
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production-min-32-chars")
@@ -33,24 +43,17 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(3
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+_dummy_password_hash: Optional[str] = None
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка пароля"""
-    try:
-        return bcrypt.checkpw(
-            plain_password.encode('utf-8'),
-            hashed_password.encode('utf-8')
-        )
-    except Exception:
-        return False
+    return check_password(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Хеширование пароля"""
-    # Генерируем соль и хешируем пароль
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Хеширование пароля (стоимость задается BCRYPT_ROUNDS)"""
+    return hash_password(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -65,6 +68,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def user_token_claims(user: User) -> Dict[str, Any]:
+    """Claims токена пользователя: username, id, роли и версия токена"""
+    roles = []
+    if user.is_admin:
+        roles.append("admin")
+    if user.is_moderator:
+        roles.append("moderator")
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "roles": roles,
+        "ver": user.token_version or 0,
+    }
+
+
+def create_user_access_token(user: User) -> str:
+    """Создание JWT токена с ролями пользователя"""
+    return create_access_token(data=user_token_claims(user))
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Получить пользователя по username"""
     return db.query(User).filter(User.username == username).first()
@@ -87,11 +110,55 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Получить текущего пользователя из токена"""
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    """Получить пользователя по username (асинхронная сессия)"""
+    return await db.scalar(select(User).where(User.username == username))
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    """Получить пользователя по email (асинхронная сессия)"""
+    return await db.scalar(select(User).where(User.email == email))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля в пуле процессов хеширования (bcrypt нагружает CPU)"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширование пароля в пуле процессов хеширования"""
+    return await password_hasher.hash(password)
+
+
+async def get_dummy_password_hash() -> str:
+    """Хеш для холостой проверки пароля (с текущей стоимостью, вычисляется один раз)"""
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = await get_password_hash_async(secrets.token_urlsafe(16))
+    return _dummy_password_hash
+
+
+async def authenticate_user_async(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """Аутентификация пользователя (асинхронная сессия)"""
+    user = await get_user_by_username_async(db, username)
+    if not user:
+        # Холостая проверка: ответ для несуществующего username занимает столько же времени
+        await verify_password_async(password, await get_dummy_password_hash())
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    if not user.is_active:
+        return None
+    if needs_rehash(user.hashed_password):
+        # Стоимость BCRYPT_ROUNDS изменилась - пересчитываем хеш, пока известен пароль
+        user.hashed_password = await get_password_hash_async(password)
+        await db.commit()
+        password_hasher.metrics.rehashed += 1
+    return user
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Декодировать JWT токен или выбросить 401"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -99,15 +166,53 @@ async def get_current_user(
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = get_user_by_username(db, username)
+    return payload
+
+
+def get_token_subject(token: str) -> str:
+    """Получить username (sub) из JWT токена или выбросить 401"""
+    return decode_token(token)["sub"]
+
+
+def has_role_claims(payload: Dict[str, Any]) -> bool:
+    """Токен выпущен с ролями и версией (старые токены содержат только sub)"""
+    return "uid" in payload and "ver" in payload and "roles" in payload
+
+
+async def check_token_version(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Проверить, что токен не отозван и пользователь активен (по таблице версий)"""
+    if not has_role_claims(payload):
+        return
+    if token_versions.is_stale:
+        await refresh_token_versions(db)
+    entry = token_versions.get(payload["uid"])
+    if entry is None:
+        entry = await fetch_token_version(db, payload["uid"])
+    if entry is None or entry[0] != payload["ver"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not entry[1]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
+
+
+def ensure_active_user(user: Optional[User]) -> User:
+    """Проверить, что пользователь существует и активен"""
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -116,6 +221,86 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Получить текущего пользователя из токена
+
+    Пользователь берется из кеша principal_cache (отсоединенная копия) и только при
+    промахе загружается из БД. Для изменения пользователя используйте get_current_db_user.
+    """
+    payload = decode_token(token)
+    await check_token_version(db, payload)
+    return await load_principal_user(db, payload["sub"])
+
+
+async def load_principal_user(db: AsyncSession, username: str) -> User:
+    """Пользователь из кеша principal_cache или из БД"""
+    user = principal_cache.get(username)
+    if user is None:
+        version = principal_cache.version(username)
+        user = await get_user_by_username_async(db, username)
+        if user is not None:
+            principal_cache.put(username, version, user)
+    return ensure_active_user(user)
+
+
+async def get_current_db_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Получить текущего пользователя из БД в сессии запроса (для изменения профиля)"""
+    payload = decode_token(token)
+    await check_token_version(db, payload)
+    return ensure_active_user(await get_user_by_username_async(db, payload["sub"]))
+
+
+async def get_token_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> TokenPrincipal:
+    """
+    Получить текущего пользователя из claims токена без загрузки строки User
+
+    Актуальность ролей гарантирует таблица версий: смена роли или статуса увеличивает
+    token_version и отзывает выданные токены. Для старых токенов без ролей
+    пользователь загружается как в get_current_user.
+    """
+    payload = decode_token(token)
+    if has_role_claims(payload):
+        await check_token_version(db, payload)
+        roles = payload["roles"]
+        return TokenPrincipal(payload["uid"], payload["sub"], "admin" in roles, "moderator" in roles)
+    user = await load_principal_user(db, payload["sub"])
+    return TokenPrincipal(user.id, user.username, bool(user.is_admin), bool(user.is_moderator))
+
+
+async def require_admin(
+    principal: TokenPrincipal = Depends(get_token_principal)
+) -> TokenPrincipal:
+    """Проверить права администратора по токену (без загрузки пользователя)"""
+    if not principal.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return principal
+
+
+async def require_moderator(
+    principal: TokenPrincipal = Depends(get_token_principal)
+) -> TokenPrincipal:
+    """Проверить права модератора или администратора по токену (без загрузки пользователя)"""
+    if not (principal.is_admin or principal.is_moderator):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions. Moderator or admin access required."
+        )
+    return principal
+
+
 async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -26,3 +26,95 @@ ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 # URL для доступа к изображениям
 IMAGES_URL_PREFIX = "/static/images/"
 
+# Размер пачки для потокового импорта/экспорта десертов
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+# Максимальное количество ошибок валидации, возвращаемых при импорте
+MAX_IMPORT_ERRORS = 100
+
+# Сколько десертов массового удаления перечисляется в записи лога (остальные - только количество);
+# массовое обновление пишет запись на каждый десерт
+BULK_LOG_MAX_IDS = 100
+
+# Нечеткий поиск: минимальное сходство слов (0..1) и максимум кандидатов из индекса
+FUZZY_SIMILARITY_THRESHOLD = float(os.getenv("FUZZY_SIMILARITY_THRESHOLD", "0.3"))
+FUZZY_MAX_CANDIDATES = int(os.getenv("FUZZY_MAX_CANDIDATES", "1000"))
+
+# Проверять ответы быстрого пути сериализации схемой ответа (отладка расхождений, дорого)
+VALIDATE_FAST_PATH = os.getenv("VALIDATE_FAST_PATH", "0") == "1"
+
+# Кеш аутентифицированных пользователей: время жизни записи (секунды, 0 - отключен) и размер
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+# Хеширование паролей: стоимость bcrypt, число процессов пула и максимум задач в очереди
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+
+# Ограничение попыток входа: окно (секунды) и максимум попыток с одного IP, для одного username
+# с одного IP и для одного username со всех IP (выше, чтобы чужой IP не заблокировал вход).
+# RATE_LIMIT_REDIS_URL задает общее хранилище для нескольких воркеров (иначе - память процесса)
+LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", "60"))
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "30"))
+LOGIN_RATE_LIMIT_PER_USERNAME = int(os.getenv("LOGIN_RATE_LIMIT_PER_USERNAME", "10"))
+LOGIN_RATE_LIMIT_PER_USERNAME_TOTAL = int(os.getenv("LOGIN_RATE_LIMIT_PER_USERNAME_TOTAL", "100"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+
+# Таблица версий токенов: как часто перечитывать ее из БД (для нескольких воркеров), секунды.
+# Отзыв токенов в других воркерах вступает в силу только после перечитывания
+TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "60"))
+
+# Фоновая запись логов активности: размер пачки, интервал сброса (секунды) и максимум записей в очереди
+LOG_WRITER_BATCH_SIZE = int(os.getenv("LOG_WRITER_BATCH_SIZE", "200"))
+LOG_WRITER_FLUSH_INTERVAL = float(os.getenv("LOG_WRITER_FLUSH_INTERVAL", "1.0"))
+LOG_WRITER_QUEUE_SIZE = int(os.getenv("LOG_WRITER_QUEUE_SIZE", "10000"))
+
+# LRU кеш справочников IP / User-Agent журнала (значение -> id)
+LOG_LOOKUP_CACHE_SIZE = int(os.getenv("LOG_LOOKUP_CACHE_SIZE", "4096"))
+
+# Число SQL запросов и их время в заголовках ответа (по умолчанию только в разработке)
+QUERY_STATS_HEADERS = os.getenv(
+    "QUERY_STATS_HEADERS", "1" if os.getenv("ENVIRONMENT", "development") == "development" else "0"
+) == "1"
+
+# Одинаковый SQL запрос чаще этого числа раз за запрос к API - предупреждение о N+1 (0 - выключено)
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+# Журнал медленных SQL запросов: порог (мс, 0 - выключен), параметры (full | redact | none),
+# план запроса при первом появлении
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_PARAMS = os.getenv("SLOW_QUERY_PARAMS", "redact")
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+
+# Профилирование запросов администратором (X-Profile: 1): интервал сэмплирования (мс),
+# предел времени, не больше PROFILE_RATE_LIMIT профилей за PROFILE_RATE_WINDOW секунд
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "1") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_RATE_LIMIT = int(os.getenv("PROFILE_RATE_LIMIT", "10"))
+PROFILE_RATE_WINDOW = int(os.getenv("PROFILE_RATE_WINDOW", "3600"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# Пороги /ready: при превышении любого экземпляр отвечает 503
+# (READY_DB_TIMEOUT - таймаут проверок БД и записи в каталог загрузок)
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "2"))
+READY_DB_LATENCY_MS = float(os.getenv("READY_DB_LATENCY_MS", "500"))
+READY_MAX_POOL_USAGE = float(os.getenv("READY_MAX_POOL_USAGE", "0.9"))
+READY_MAX_PDF_JOBS = int(os.getenv("READY_MAX_PDF_JOBS", "8"))
+READY_MAX_THREADPOOL_WAITING = int(os.getenv("READY_MAX_THREADPOOL_WAITING", "20"))
+READY_MAX_LOG_BACKLOG = int(os.getenv("READY_MAX_LOG_BACKLOG", "8000"))
+
+# Токен сборщика метрик для /metrics (без него доступ только с токеном администратора)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Хранение логов активности: сколько дней держать в БД (0 - без ограничения) и куда складывать архивы
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "180"))
+LOG_ARCHIVE_DIR = Path(os.getenv("LOG_ARCHIVE_DIR", str(BASE_DIR / "archives" / "activity_logs")))
+# Сколько месячных секций PostgreSQL создавать заранее
+LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "2"))
+
+# Журнал активности: предел подсчета total в режиме total=capped
+LOG_COUNT_CAP = int(os.getenv("LOG_COUNT_CAP", "10000"))
@@ -1,11 +1,34 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.slow_queries import slow_query_log
+from typing import Optional
+import json
 import os
 
 # Используем SQLite для разработки, можно легко переключиться на PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./catalog.db")
 
+# Асинхронные драйверы для тех же баз данных
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def make_async_url(url: str) -> str:
+    """Получить URL асинхронного драйвера (aiosqlite / asyncpg) из синхронного URL"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Async driver is not configured for database backend: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_async_url(DATABASE_URL)
+
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         DATABASE_URL, connect_args={"check_same_thread": False}
@@ -13,8 +36,20 @@ if DATABASE_URL.startswith("sqlite"):
 else:
     engine = create_engine(DATABASE_URL)
 
+# Асинхронный движок для API роутеров: запросы не занимают потоки threadpool
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+
+# Медленные запросы обоих движков пишутся в лог app.slow_queries
+slow_query_log.install(engine)
+slow_query_log.install(async_engine.sync_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False: после commit атрибуты доступны без неявных запросов
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -26,3 +61,34 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Dependency для получения асинхронной сессии БД"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def count_rows(db: AsyncSession, query) -> int:
+    """Количество строк в выборке (аналог Query.count() для select)"""
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+async def count_rows_capped(db: AsyncSession, query, cap: int) -> int:
+    """Количество строк, но не больше cap (читается не более cap строк)"""
+    return await db.scalar(
+        select(func.count()).select_from(query.order_by(None).limit(cap).subquery())
+    )
+
+
+async def estimate_rows(db: AsyncSession, query) -> Optional[int]:
+    """Оценка количества строк по плану запроса (PostgreSQL), None - оценка недоступна"""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    compiled = query.order_by(None).compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+    # Текст запроса выполняется как есть: в литералах фильтров могут быть ":" и "%"
+    connection = await db.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,129 @@
+"""
+Потоковый импорт и экспорт десертов (и экспорт журнала активности) в форматах CSV и NDJSON
+"""
+from datetime import date, datetime
+import csv
+import io
+import json
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+# Поддерживаемые форматы и их MIME типы
+FORMAT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Расширения файлов для автоопределения формата
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+# Количество строк в одном отправляемом клиенту фрагменте экспорта
+EXPORT_CHUNK_ROWS = 100
+
+
+def detect_format(file_format: Optional[str], filename: Optional[str]) -> Optional[str]:
+    """Определить формат по явному параметру или расширению файла"""
+    if file_format:
+        return file_format if file_format in FORMAT_MEDIA_TYPES else None
+    if filename:
+        for ext, fmt in FORMAT_EXTENSIONS.items():
+            if filename.lower().endswith(ext):
+                return fmt
+    return None
+
+
+def iter_import_records(
+    binary_file: BinaryIO, file_format: str
+) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Построчно читать записи из загруженного файла, не загружая его целиком в память
+
+    Yields:
+        (номер строки, запись или None, текст ошибки разбора или None)
+
+    Файл не в UTF-8 или неразбираемый CSV (например, незакрытая кавычка растягивает поле
+    до предела размера) - последняя запись с ошибкой: дальше чтение невозможно.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    line_no = 0
+    try:
+        if file_format == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                line_no = reader.line_num
+                # Пустые ячейки CSV означают отсутствие значения (берется значение по умолчанию)
+                record = {
+                    key.strip(): value
+                    for key, value in row.items()
+                    if key and value not in (None, "")
+                }
+                yield line_no, record, None
+        else:
+            for line_no, line in enumerate(text, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line), None
+                except json.JSONDecodeError as e:
+                    yield line_no, None, f"Invalid JSON: {e.msg}"
+    except UnicodeDecodeError:
+        # Текст декодируется блоками, поэтому номер строки приблизительный
+        yield line_no + 1, None, "File is not valid UTF-8, import stopped"
+    except csv.Error as e:
+        yield line_no + 1, None, f"Invalid CSV: {e}, import stopped"
+    finally:
+        # Не закрываем исходный файл вместе с оберткой
+        text.detach()
+
+
+def json_default(value: Any) -> Any:
+    """Сериализация значений, которые json не умеет (даты - в ISO 8601)"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_value(value: Any) -> Any:
+    """Значение ячейки CSV: пустая строка для None, даты в ISO 8601"""
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=json_default)
+    return value
+
+
+def iter_export_chunks(
+    rows: Iterable[Sequence[Any]],
+    columns: Sequence[str],
+    file_format: str,
+    include_header: bool = True,
+) -> Iterator[str]:
+    """Сериализовать строки выборки в CSV/NDJSON фрагментами по EXPORT_CHUNK_ROWS строк"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == "csv" else None
+    if writer and include_header:
+        writer.writerow(columns)
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow([export_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=json_default))
+            buffer.write("\n")
+        pending += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
@@ -0,0 +1,119 @@
+"""
+Справочники IP адресов и User-Agent для журнала активности
+
+Запись лога хранит только id строки справочника, поэтому длинный User-Agent не
+повторяется в каждой строке activity_logs и ее индексах. Значение -> id разрешается
+через LRU кеш процесса; при промахе - SELECT, при отсутствии строки
+INSERT ... ON CONFLICT DO NOTHING (параллельная вставка того же значения безопасна).
+
+Новые id попадают в кеш только после commit транзакции, в которой созданы строки:
+при откате в кеше не остается id несуществующей строки.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import LOG_LOOKUP_CACHE_SIZE
+from app.models import LogIpAddress, LogUserAgent
+
+# Значение записи лога -> справочник (id пишется в колонку <поле>_id)
+LOOKUP_MODELS = {
+    "ip_address": LogIpAddress,
+    "user_agent": LogUserAgent,
+}
+
+# Ключ session.info со строками справочников, созданными в текущей транзакции
+PENDING_KEY = "pending_log_lookups"
+
+
+class LookupCache:
+    """Потокобезопасный LRU кеш значение -> id"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, value: str) -> Optional[int]:
+        """id значения или None (значение становится самым свежим)"""
+        with self._lock:
+            lookup_id = self._entries.get(value)
+            if lookup_id is not None:
+                self._entries.move_to_end(value)
+            return lookup_id
+
+    def put(self, value: str, lookup_id: int) -> None:
+        """Запомнить id значения, вытесняя самые давние записи"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[value] = lookup_id
+            self._entries.move_to_end(value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очистить кеш"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Кеши процесса по справочникам
+lookup_caches: Dict[str, LookupCache] = {
+    field: LookupCache(LOG_LOOKUP_CACHE_SIZE) for field in LOOKUP_MODELS
+}
+
+
+def resolve_lookup(db: Session, field: str, value: str) -> int:
+    """id строки справочника для значения (строка создается при отсутствии)"""
+    model = LOOKUP_MODELS[field]
+    value = value[:model.value.type.length]
+    cached = lookup_caches[field].get(value)
+    if cached is not None:
+        return cached
+
+    pending: Dict[Tuple[str, str], int] = db.info.setdefault(PENDING_KEY, {})
+    if (field, value) in pending:
+        return pending[(field, value)]
+
+    lookup_id = db.scalar(select(model.id).where(model.value == value))
+    if lookup_id is not None:
+        lookup_caches[field].put(value, lookup_id)
+        return lookup_id
+
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(insert(model).values(value=value).on_conflict_do_nothing(index_elements=[model.value]))
+    lookup_id = db.scalar(select(model.id).where(model.value == value))
+    pending[(field, value)] = lookup_id
+    return lookup_id
+
+
+def intern_log_clients(db: Session, entries: Iterable[Dict[str, Any]]) -> None:
+    """Заменить в значениях записей лога ip_address/user_agent на id справочников"""
+    for values in entries:
+        for field in LOOKUP_MODELS:
+            value = values.pop(field, None)
+            values[f"{field}_id"] = resolve_lookup(db, field, value) if value else None
+
+
+@event.listens_for(Session, "after_commit")
+def publish_pending_lookups(session: Session) -> None:
+    """Строки справочников зафиксированы - их id можно кешировать"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        for (field, value), lookup_id in pending.items():
+            lookup_caches[field].put(value, lookup_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_pending_lookups(session: Session, transaction) -> None:
+    """Транзакция завершилась без commit (откат, закрытие сессии) - строк справочников нет"""
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
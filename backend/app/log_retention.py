@@ -0,0 +1,180 @@
+"""
+Секционирование логов активности по месяцам, архивирование и срок хранения
+
+PostgreSQL: activity_logs - секционированная по created_at таблица (миграция
+add_activity_log_partitions.py) с месячными секциями activity_logs_pYYYYMM и секцией
+по умолчанию. Запросы с условием на created_at (параметр days) читают только
+пересекающиеся секции - планировщик отсекает остальные.
+
+SQLite: секционирования нет, старые записи выгружаются в архив и удаляются.
+
+Архив - NDJSON, сжатый gzip, по файлу на месяц. Повторный запуск дописывает
+новый gzip-блок в конец файла, такой файл читается как одно целое (zcat, gzip.open).
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import gzip
+import re
+
+import orjson
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.models import ActivityLog
+from app.serialization import ORJSON_OPTIONS
+
+PARTITION_PREFIX = "activity_logs_p"
+PARTITION_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+# Поля записи лога в архиве (IP и User-Agent - значения из справочников, а не id)
+LOG_FIELDS = (
+    "id", "user_id", "username", "action", "entity_type", "entity_id", "description",
+    "old_values", "new_values", "ip_address", "user_agent", "created_at",
+)
+
+# Строк за одно чтение при выгрузке в архив
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца (без часового пояса)"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Сдвинуть начало месяца на months месяцев"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Имя месячной секции"""
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def is_partitioned(db: Session) -> bool:
+    """Таблица activity_logs секционирована (только PostgreSQL)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('activity_logs')"
+    )).first() is not None
+
+
+def list_partitions(db: Session) -> List[Tuple[str, datetime]]:
+    """Месячные секции: (имя, начало месяца), по возрастанию"""
+    names = db.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass('activity_logs')
+    """)).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def create_partition(db: Session, month: datetime) -> str:
+    """Создать секцию за месяц, если ее нет"""
+    name = partition_name(month)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF activity_logs "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    ))
+    return name
+
+
+def ensure_log_partitions(db: Session, months_ahead: int = 2, now: Optional[datetime] = None) -> List[str]:
+    """Создать секции текущего и следующих months_ahead месяцев, возвращает созданные"""
+    if not is_partitioned(db):
+        return []
+    existing = {name for name, _ in list_partitions(db)}
+    current = month_start(now or datetime.utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) not in existing:
+            created.append(create_partition(db, month))
+    db.commit()
+    return created
+
+
+def archive_path(archive_dir: Path, month: datetime) -> Path:
+    """Файл архива за месяц"""
+    return archive_dir / f"activity_logs-{month:%Y-%m}.ndjson.gz"
+
+
+def write_archive(rows: Iterable, path: Path) -> int:
+    """Дописать строки выборки в сжатый NDJSON архив, возвращает количество строк"""
+    keys = LOG_FIELDS
+    count = 0
+    archive = None
+    try:
+        for row in rows:
+            if archive is None:
+                # Файл открывается только при наличии записей: пустые месяцы без архивов
+                path.parent.mkdir(parents=True, exist_ok=True)
+                archive = gzip.open(path, "ab")
+            archive.write(orjson.dumps(dict(zip(keys, row)), option=ORJSON_OPTIONS) + b"\n")
+            count += 1
+    finally:
+        if archive is not None:
+            archive.close()
+    return count
+
+
+def archive_range(db: Session, start: datetime, end: datetime, archive_dir: Path) -> int:
+    """Выгрузить в архив записи за [start, end) одного месяца, возвращает количество"""
+    rows = db.execute(
+        select(*[getattr(ActivityLog, field) for field in LOG_FIELDS])
+        .where(ActivityLog.created_at >= start, ActivityLog.created_at < end)
+        .order_by(ActivityLog.id)
+        .execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    )
+    return write_archive(rows, archive_path(archive_dir, month_start(start)))
+
+
+def archive_logs(db: Session, retention_days: int, archive_dir: Path, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Перенести записи старше retention_days в архивы и удалить их из БД
+
+    На PostgreSQL полностью устаревшие секции выгружаются и удаляются целиком (DETACH + DROP),
+    оставшиеся старые записи (секция по умолчанию, граница месяца) удаляются построчно.
+    """
+    result = {"archived": 0, "deleted": 0, "dropped_partitions": 0}
+    if retention_days <= 0:
+        return result
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+    if is_partitioned(db):
+        for name, month in list_partitions(db):
+            end = add_months(month, 1)
+            if end > cutoff:
+                break
+            result["archived"] += archive_range(db, month, end, archive_dir)
+            db.execute(text(f"ALTER TABLE activity_logs DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            result["dropped_partitions"] += 1
+
+    oldest = db.scalar(select(func.min(ActivityLog.created_at)).where(ActivityLog.created_at < cutoff))
+    if oldest is None:
+        return result
+    month = month_start(oldest)
+    while month < cutoff:
+        end = min(add_months(month, 1), cutoff)
+        archived = archive_range(db, month, end, archive_dir)
+        if archived:
+            # Удаляем только после записи архива: при сбое строки останутся в БД
+            deleted = db.execute(
+                delete(ActivityLog).where(ActivityLog.created_at >= month, ActivityLog.created_at < end)
+            ).rowcount
+            db.commit()
+            result["archived"] += archived
+            result["deleted"] += deleted
+        month = add_months(month, 1)
+    return result
@@ -0,0 +1,103 @@
+"""
+Дневные сводки логов активности (rollup) для статистики без сканирования activity_logs
+
+Счетчики обновляются в той же транзакции, что и вставка логов (INSERT ... ON CONFLICT
+DO UPDATE), поэтому сводка всегда согласована с журналом. rebuild_log_rollups
+пересчитывает их из activity_logs (первичное заполнение и проверка расхождений).
+"""
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import ActivityLog, ActivityLogDailyStat
+
+# Измерения сводки: колонка лога, по которой считаются записи
+ROLLUP_DIMENSIONS = ("action", "entity_type", "username")
+
+# Строк сводки в одном INSERT
+ROLLUP_BATCH_SIZE = 500
+
+
+def log_day(created_at: Any) -> date:
+    """День записи лога"""
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    if isinstance(created_at, date):
+        return created_at
+    if isinstance(created_at, str):
+        return date.fromisoformat(created_at[:10])
+    return datetime.utcnow().date()
+
+
+def count_log_values(entries: Iterable[Dict[str, Any]]) -> Counter:
+    """Счетчики (день, измерение, значение) для записей лога"""
+    counts: Counter = Counter()
+    for values in entries:
+        day = log_day(values.get("created_at"))
+        for dimension in ROLLUP_DIMENSIONS:
+            key = values.get(dimension)
+            if key is not None:
+                counts[(day, dimension, key)] += 1
+    return counts
+
+
+def upsert_statement(dialect_name: str, rows: List[Dict[str, Any]]):
+    """INSERT ... ON CONFLICT, прибавляющий count к существующей строке"""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(ActivityLogDailyStat).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[
+            ActivityLogDailyStat.day, ActivityLogDailyStat.dimension, ActivityLogDailyStat.key
+        ],
+        set_={"count": ActivityLogDailyStat.count + statement.excluded["count"]},
+    )
+
+
+def add_log_rollups(db: Session, entries: Iterable[Dict[str, Any]]) -> None:
+    """Увеличить дневные счетчики для вставляемых записей лога (в транзакции вызывающего кода)"""
+    counts = count_log_values(entries)
+    if not counts:
+        return
+    rows = [
+        {"day": day, "dimension": dimension, "key": key, "count": count}
+        for (day, dimension, key), count in counts.items()
+    ]
+    dialect_name = db.get_bind().dialect.name
+    for start in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        db.execute(upsert_statement(dialect_name, rows[start:start + ROLLUP_BATCH_SIZE]))
+
+
+def rebuild_log_rollups(db: Session, since: Optional[date] = None) -> int:
+    """
+    Пересчитать сводки из activity_logs (начиная с дня since или полностью)
+
+    Сводки за дни, логи которых уже архивированы, при полном пересчете не удаляются.
+    Возвращает количество строк сводки.
+    """
+    day_column = func.date(ActivityLog.created_at)
+    counts: Counter = Counter()
+    for dimension in ROLLUP_DIMENSIONS:
+        column = getattr(ActivityLog, dimension)
+        query = select(day_column, column, func.count()).where(column.isnot(None))
+        if since is not None:
+            query = query.where(ActivityLog.created_at >= datetime.combine(since, datetime.min.time()))
+        for day, key, count in db.execute(query.group_by(day_column, column)):
+            counts[(log_day(day), dimension, key)] += count
+
+    days = {day for day, _, _ in counts}
+    if since is not None:
+        db.execute(delete(ActivityLogDailyStat).where(ActivityLogDailyStat.day >= since))
+    elif days:
+        db.execute(delete(ActivityLogDailyStat).where(ActivityLogDailyStat.day.in_(days)))
+    rows = [
+        {"day": day, "dimension": dimension, "key": key, "count": count}
+        for (day, dimension, key), count in counts.items()
+    ]
+    for start in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        db.execute(ActivityLogDailyStat.__table__.insert(), rows[start:start + ROLLUP_BATCH_SIZE])
+    db.commit()
+    return len(rows)
@@ -0,0 +1,124 @@
+"""
+Индексируемый поиск по журналу активности
+
+- description: полнотекстовый поиск (FTS5 в SQLite, GIN по tsvector в PostgreSQL).
+  Каждое слово запроса ищется как префикс слова описания, все слова обязательны.
+- username: поиск по началу имени без учета регистра (индекс по lower(username)).
+  Префикс приводится к нижнему регистру той же функцией lower() БД, что и колонка:
+  в SQLite lower() меняет только ASCII, поэтому кириллица там сравнивается с учетом
+  регистра ("Ив" находит "Иван", "ив" - нет), в PostgreSQL - без учета.
+- changed_field: значение поля в old_values и new_values различается (JSON функции,
+  для CHANGE_INDEXED_FIELDS - частичные индексы с тем же условием).
+
+Условия - SQL-конструкции, которые компилируются по-разному для каждой БД, поэтому
+фильтры журнала строятся без знания диалекта. Для прочих БД используется ILIKE.
+"""
+import re
+from typing import List
+
+from sqlalchemy import String, and_, func, literal, literal_column, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
+from app.models import ActivityLog, changed_value_sql
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Допустимое имя поля для changed_field (подставляется в SQL как литерал)
+FIELD_NAME_PATTERN = "^[A-Za-z_][A-Za-z0-9_]{0,49}$"
+
+# Верхняя граница для диапазона префикса (больше любого символа Unicode)
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+def search_words(term: str) -> List[str]:
+    """Слова поискового запроса в нижнем регистре"""
+    return WORD_PATTERN.findall(term.lower())
+
+
+class DescriptionMatch(ColumnElement):
+    """Полнотекстовое условие по ActivityLog.description"""
+    inherit_cache = False
+
+    def __init__(self, term: str):
+        self.term = term
+        self.words = search_words(term)
+
+
+class UsernamePrefix(ColumnElement):
+    """Условие "username начинается с prefix" без учета регистра"""
+    inherit_cache = False
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+
+@compiles(DescriptionMatch)
+def compile_description_match(element, compiler, **kw):
+    # Запрос без слов ("!!!") ищется как подстрока
+    return compiler.process(ActivityLog.description.ilike(f"%{element.term}%"), **kw)
+
+
+@compiles(DescriptionMatch, "sqlite")
+def compile_description_match_sqlite(element, compiler, **kw):
+    if not element.words:
+        return compile_description_match(element, compiler, **kw)
+    fts_query = " ".join(f'"{word}"*' for word in element.words)
+    matches = select(literal_column("rowid")).select_from(text("activity_logs_fts")).where(
+        literal_column("activity_logs_fts").op("MATCH")(fts_query)
+    )
+    return compiler.process(ActivityLog.id.in_(matches), **kw)
+
+
+@compiles(DescriptionMatch, "postgresql")
+def compile_description_match_postgresql(element, compiler, **kw):
+    if not element.words:
+        return compile_description_match(element, compiler, **kw)
+    # Выражение совпадает с индексом ix_activity_logs_description_fts
+    document = func.to_tsvector(literal_column("'simple'"), func.coalesce(ActivityLog.description, literal_column("''")))
+    query = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{word}:*" for word in element.words))
+    return compiler.process(document.op("@@")(query), **kw)
+
+
+@compiles(UsernamePrefix)
+def compile_username_prefix(element, compiler, **kw):
+    return compiler.process(ActivityLog.username.ilike(f"{escape_like(element.prefix)}%", escape="!"), **kw)
+
+
+@compiles(UsernamePrefix, "sqlite")
+def compile_username_prefix_sqlite(element, compiler, **kw):
+    # SQLite не использует индекс для LIKE по выражению, а диапазон - использует.
+    # Граница диапазона - lower() самой SQLite (только ASCII), как и у колонки
+    username = func.lower(ActivityLog.username)
+    prefix = func.lower(literal(element.prefix, String))
+    condition = and_(username >= prefix, username < prefix.concat(PREFIX_UPPER_BOUND))
+    return f"({compiler.process(condition, **kw)})"
+
+
+@compiles(UsernamePrefix, "postgresql")
+def compile_username_prefix_postgresql(element, compiler, **kw):
+    # LIKE 'prefix%' по индексу lower(username) text_pattern_ops
+    pattern = func.lower(literal(f"{escape_like(element.prefix)}%", String))
+    condition = func.lower(ActivityLog.username).like(pattern, escape="!")
+    return compiler.process(condition, **kw)
+
+
+def escape_like(value: str) -> str:
+    """Экранировать спецсимволы LIKE (символ экранирования "!")"""
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+class ValueChanged(ColumnElement):
+    """Условие "поле field изменилось" по old_values/new_values (включая создание и удаление)"""
+    inherit_cache = False
+
+    def __init__(self, field: str):
+        if not re.match(FIELD_NAME_PATTERN, field):
+            raise ValueError(f"Invalid field name: {field}")
+        self.field = field
+
+
+@compiles(ValueChanged)
+def compile_value_changed(element, compiler, **kw):
+    # Путь - литерал, а не параметр: иначе условие не совпадет с предикатом частичного индекса
+    return f"({changed_value_sql(compiler.dialect.name, element.field, 'activity_logs.')})"
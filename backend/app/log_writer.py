@@ -0,0 +1,185 @@
+"""
+Фоновая запись логов активности пачками
+
+Вызывающий код кладет запись в очередь и сразу продолжает работу, а отдельный поток
+вставляет накопленные записи одной транзакцией (bulk insert) вместе с дневными
+сводками при достижении размера пачки или по истечении интервала. Очередь ограничена: при переполнении запись
+отбрасывается и учитывается в метриках, запрос при этом не блокируется.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import LOG_WRITER_BATCH_SIZE, LOG_WRITER_FLUSH_INTERVAL, LOG_WRITER_QUEUE_SIZE
+from app.database import SessionLocal
+from app.log_clients import intern_log_clients
+from app.log_rollups import add_log_rollups
+from app.models import ActivityLog
+from app.query_stats import background_queries
+
+logger = logging.getLogger(__name__)
+
+# Признак остановки потока записи
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """Очередь логов активности с потоком пакетной записи"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def backlog(self) -> int:
+        """Записей в очереди, еще не записанных в БД"""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Запустить поток записи"""
+        with self._lock:
+            if not self.running:
+                self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Записать оставшиеся логи и остановить поток"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # Признак остановки кладется с ожиданием: он не должен потеряться при полной очереди
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Activity log writer queue is full, %d entries are lost on shutdown", self.backlog)
+            return
+        thread.join(timeout)
+
+    def submit(self, values: Dict[str, Any]) -> bool:
+        """Поставить запись в очередь (False - очередь переполнена, запись отброшена)"""
+        try:
+            self._queue.put_nowait(values)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self) -> None:
+        """Дождаться записи всех логов из очереди"""
+        self._queue.join()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Метрики очереди и записи"""
+        with self._lock:
+            return {
+                "running": self.running,
+                "backlog": self.backlog,
+                "max_queue": self.max_queue,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def _run(self) -> None:
+        background_queries.set(True)
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Добираем пачку до размера или до конца интервала
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+        # Остановка: дописываем то, что успели положить в очередь
+        rest = self._drain()
+        if rest:
+            self._write(rest)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            self._queue.task_done()
+            if item is not _STOP:
+                items.append(item)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            db = self.session_factory()
+            try:
+                intern_log_clients(db, chunk)
+                db.execute(insert(ActivityLog), chunk)
+                add_log_rollups(db, chunk)
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Failed to write %d activity log entries", len(chunk))
+                with self._lock:
+                    self.failed += len(chunk)
+                continue
+            finally:
+                db.close()
+            with self._lock:
+                self.written += len(chunk)
+                self.batches += 1
+
+
+# Писатель логов процесса: запускается при старте приложения и останавливается при завершении
+activity_log_writer = ActivityLogWriter(
+    SessionLocal,
+    batch_size=LOG_WRITER_BATCH_SIZE,
+    flush_interval=LOG_WRITER_FLUSH_INTERVAL,
+    max_queue=LOG_WRITER_QUEUE_SIZE,
+)
@@ -1,11 +1,42 @@
 """
 Модуль логирования действий пользователей
 """
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.log_clients import intern_log_clients
+from app.log_rollups import add_log_rollups
+from app.log_writer import activity_log_writer
 from app.models import ActivityLog, User
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-import json
+
+
+def build_log_values(
+    action: str,
+    user: Optional[User] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    description: Optional[str] = None,
+    old_values: Optional[Dict[str, Any]] = None,
+    new_values: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Значения колонок записи лога (время фиксируется в момент действия)"""
+    return {
+        "user_id": user.id if user else None,
+        "username": user.username if user else None,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "description": description,
+        "old_values": old_values or None,
+        "new_values": new_values or None,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": datetime.utcnow(),
+    }
 
 
 def log_activity(
@@ -19,7 +50,8 @@ def log_activity(
     new_values: Optional[Dict[str, Any]] = None,
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None,
-) -> ActivityLog:
+    commit: bool = True,
+) -> Optional[ActivityLog]:
     """
     Записать действие в лог
     
@@ -34,30 +66,69 @@ def log_activity(
         new_values: Новые значения (словарь)
         ip_address: IP адрес
         user_agent: User agent браузера
+        commit: True - запись уходит в фоновую очередь activity_log_writer и
+            пишется в БД пачкой (без ожидания). False - запись попадет в БД
+            вместе с текущей транзакцией вызывающего кода
     
     Returns:
-        ActivityLog: Созданная запись лога
+        ActivityLog: Запись лога, добавленная в сессию (commit=False), иначе None
     """
-    log_entry = ActivityLog(
-        user_id=user.id if user else None,
-        username=user.username if user else None,
-        action=action,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        description=description,
-        old_values=json.dumps(old_values, ensure_ascii=False) if old_values else None,
-        new_values=json.dumps(new_values, ensure_ascii=False) if new_values else None,
-        ip_address=ip_address,
-        user_agent=user_agent,
+    values = build_log_values(
+        action, user, entity_type, entity_id, description,
+        old_values, new_values, ip_address, user_agent,
     )
-    
+    if commit and activity_log_writer.running:
+        activity_log_writer.submit(values)
+        return None
+    intern_log_clients(db, [values])
+    log_entry = ActivityLog(**values)
     db.add(log_entry)
-    db.commit()
-    db.refresh(log_entry)
-    
+    add_log_rollups(db, [values])
+    if commit:
+        # Писатель не запущен (скрипты вне приложения) - пишем сразу
+        db.commit()
     return log_entry
 
 
+async def log_activity_async(
+    db: AsyncSession,
+    action: str,
+    user: Optional[User] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    description: Optional[str] = None,
+    old_values: Optional[Dict[str, Any]] = None,
+    new_values: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    commit: bool = True,
+) -> Optional[ActivityLog]:
+    """Записать действие в лог через асинхронную сессию (аргументы как у log_activity)"""
+    values = build_log_values(
+        action, user, entity_type, entity_id, description,
+        old_values, new_values, ip_address, user_agent,
+    )
+    if commit and activity_log_writer.running:
+        activity_log_writer.submit(values)
+        return None
+    await db.run_sync(intern_log_clients, [values])
+    log_entry = ActivityLog(**values)
+    db.add(log_entry)
+    await db.run_sync(add_log_rollups, [values])
+    if commit:
+        await db.commit()
+    return log_entry
+
+
+async def log_activities_async(db: AsyncSession, entries: List[Dict[str, Any]]) -> None:
+    """Записать несколько действий (значения из build_log_values) одним INSERT в транзакции вызывающего кода"""
+    if not entries:
+        return
+    await db.run_sync(intern_log_clients, entries)
+    await db.execute(insert(ActivityLog), entries)
+    await db.run_sync(add_log_rollups, entries)
+
+
 def get_client_ip(request) -> Optional[str]:
     """Получить IP адрес клиента из запроса"""
     if hasattr(request, 'client') and request.client:
@@ -0,0 +1,356 @@
+"""
+Метрики приложения в текстовом формате Prometheus
+
+MetricsMiddleware (чистый ASGI, без BaseHTTPMiddleware) считает время и статусы
+запросов по шаблону маршрута (/api/desserts/{dessert_id}, а не фактическому пути),
+чтобы число рядов не росло с количеством id. На пути запроса - два замера времени
+и одна короткая блокировка; метрики пула потоков, пулов соединений, хеширования
+паролей и записи логов собираются только при чтении /metrics.
+"""
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+import anyio.to_thread
+from sqlalchemy.pool import Pool
+
+from app.log_writer import activity_log_writer
+from app.passwords import LATENCY_BUCKETS as HASH_LATENCY_BUCKETS, password_hasher
+from app.ratelimit import login_rate_limiter
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы гистограммы времени ответа (секунды)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Границы гистограммы ожидания соединения из пула (секунды)
+POOL_CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Метка маршрута для запросов, не попавших ни в один маршрут (404, сканеры)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """Гистограмма Prometheus (без собственной блокировки - защищается владельцем)"""
+
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.buckets = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[int]:
+        """Накопленные значения корзин (le), как требует формат Prometheus"""
+        total = 0
+        result = []
+        for value in self.buckets:
+            total += value
+            result.append(total)
+        return result
+
+
+class RequestMetrics:
+    """Время ответа, статусы и текущие запросы по методу и маршруту"""
+
+    def __init__(self, bounds: Sequence[float] = REQUEST_BUCKETS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def started(self, method: str) -> None:
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def finished(self, method: str, route: str, status_code: int, seconds: float) -> None:
+        with self._lock:
+            self._in_flight[method] -= 1
+            histogram = self._latency.get((method, route))
+            if histogram is None:
+                histogram = self._latency[(method, route)] = Histogram(self.bounds)
+            histogram.observe(seconds)
+            key = (method, route, status_code)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Копия значений для вывода"""
+        with self._lock:
+            return {
+                "latency": {
+                    key: (h.cumulative(), h.count, h.sum) for key, h in self._latency.items()
+                },
+                "statuses": dict(self._statuses),
+                "in_flight": dict(self._in_flight),
+            }
+
+
+class PoolMetrics:
+    """Время ожидания соединения из пулов SQLAlchemy"""
+
+    def __init__(self, bounds: Sequence[float] = POOL_CHECKOUT_BUCKETS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._checkout: Dict[str, Histogram] = {}
+        self._pools: Dict[str, Pool] = {}
+
+    def instrument(self, name: str, pool: Pool) -> None:
+        """Замерять pool.connect() (выдача соединения, включая ожидание свободного)"""
+        self._pools[name] = pool
+        self._checkout.setdefault(name, Histogram(self.bounds))
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self.observe(name, time.perf_counter() - started)
+
+        pool.connect = timed_connect
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._checkout[name].observe(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Гистограммы ожидания и текущее состояние пулов"""
+        with self._lock:
+            result = {
+                name: {"checkout": (h.cumulative(), h.count, h.sum)}
+                for name, h in self._checkout.items()
+            }
+        for name, pool in self._pools.items():
+            # Размер и переполнение есть только у QueuePool
+            for attribute in ("checkedout", "size", "overflow"):
+                method = getattr(pool, attribute, None)
+                if method is not None:
+                    result[name][attribute] = method()
+            # Предел QueuePool: size + max_overflow (отрицательный max_overflow - без предела)
+            max_overflow = getattr(pool, "_max_overflow", None)
+            if "size" in result[name] and max_overflow is not None and max_overflow >= 0:
+                result[name]["capacity"] = result[name]["size"] + max_overflow
+        return result
+
+
+class JobCounter:
+    """Число выполняющихся задач (with counter: ...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.value += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.value -= 1
+
+
+request_metrics = RequestMetrics()
+pool_metrics = PoolMetrics()
+
+# Генерации PDF в процессе (выполняются в threadpool; ожидающие поток видны в threadpool_usage)
+pdf_jobs = JobCounter()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время ответа и статус по шаблону маршрута"""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self._routes: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.started(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Роутер Starlette дописывает в scope найденный endpoint
+            self.metrics.finished(
+                method, self.route_label(scope), status_code, time.perf_counter() - started
+            )
+
+    def route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        label = self._routes.get(endpoint)
+        if label is None:
+            label = self._routes[endpoint] = find_route_path(scope.get("router"), endpoint)
+        return label
+
+
+def find_route_path(router, endpoint) -> str:
+    """Шаблон пути маршрута (для смонтированных приложений - префикс монтирования)"""
+    for route in getattr(router, "routes", ()):
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+        if getattr(route, "app", None) is endpoint:
+            return f"{route.path}/{{path}}"
+    return UNMATCHED_ROUTE
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+class Exposition:
+    """Построитель текста в формате Prometheus"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def header(self, name: str, metric_type: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def sample(self, name: str, value: Any, labels: Optional[Dict[str, Any]] = None) -> None:
+        if isinstance(value, bool):
+            value = int(value)
+        self.lines.append(f"{name}{format_labels(labels or {})} {value}")
+
+    def metric(self, name: str, metric_type: str, help_text: str, value: Any) -> None:
+        self.header(name, metric_type, help_text)
+        self.sample(name, value)
+
+    def histogram(
+        self,
+        name: str,
+        bounds: Sequence[float],
+        series: Iterable[Tuple[Dict[str, Any], List[int], int, float]],
+    ) -> None:
+        for labels, cumulative, count, total in series:
+            for bound, value in zip(bounds, cumulative):
+                self.sample(f"{name}_bucket", value, {**labels, "le": bound})
+            self.sample(f"{name}_bucket", count, {**labels, "le": "+Inf"})
+            self.sample(f"{name}_count", count, labels)
+            self.sample(f"{name}_sum", round(total, 6), labels)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def add_request_metrics(out: Exposition) -> None:
+    snapshot = request_metrics.snapshot()
+    out.header("http_requests_in_progress", "gauge", "Requests currently being processed")
+    for method, value in sorted(snapshot["in_flight"].items()):
+        out.sample("http_requests_in_progress", value, {"method": method})
+
+    out.header("http_requests_total", "counter", "Finished requests by route and status")
+    for (method, route, status_code), value in sorted(snapshot["statuses"].items()):
+        out.sample("http_requests_total", value, {"method": method, "route": route, "status": status_code})
+
+    out.header("http_request_duration_seconds", "histogram", "Request latency by route")
+    out.histogram("http_request_duration_seconds", request_metrics.bounds, (
+        ({"method": method, "route": route}, cumulative, count, total)
+        for (method, route), (cumulative, count, total) in sorted(snapshot["latency"].items())
+    ))
+
+
+def threadpool_usage() -> Dict[str, int]:
+    """Загрузка threadpool, в котором выполняются синхронные endpoints и зависимости"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "limit": int(limiter.total_tokens),
+        "busy": limiter.borrowed_tokens,
+        "waiting": limiter.statistics().tasks_waiting,
+    }
+
+
+def add_threadpool_metrics(out: Exposition) -> None:
+    usage = threadpool_usage()
+    out.metric("threadpool_threads_limit", "gauge", "Threadpool size", usage["limit"])
+    out.metric("threadpool_threads_busy", "gauge", "Threads running sync endpoints", usage["busy"])
+    out.metric("threadpool_tasks_waiting", "gauge", "Calls waiting for a free thread", usage["waiting"])
+    out.metric("pdf_jobs_in_progress", "gauge", "PDF catalogs being generated", pdf_jobs.value)
+
+
+def add_pool_metrics(out: Exposition) -> None:
+    snapshot = pool_metrics.snapshot()
+    out.header("db_pool_checkout_seconds", "histogram", "Time to get a connection from the pool")
+    out.histogram("db_pool_checkout_seconds", pool_metrics.bounds, (
+        ({"pool": name}, *values["checkout"]) for name, values in sorted(snapshot.items())
+    ))
+    for attribute, name, help_text in (
+        ("checkedout", "db_pool_connections_in_use", "Connections checked out of the pool"),
+        ("size", "db_pool_size", "Configured pool size"),
+        ("overflow", "db_pool_overflow", "Connections above the pool size"),
+    ):
+        out.header(name, "gauge", help_text)
+        for pool, values in sorted(snapshot.items()):
+            if attribute in values:
+                out.sample(name, values[attribute], {"pool": pool})
+
+
+def add_password_hashing_metrics(out: Exposition) -> None:
+    metrics = password_hasher.metrics.snapshot()
+    out.metric("password_hash_pending", "gauge", "Password hashing tasks in the process pool", password_hasher.pending)
+    out.header("password_hash_duration_seconds", "histogram", "bcrypt hash/verify time")
+    out.histogram("password_hash_duration_seconds", HASH_LATENCY_BUCKETS, (
+        ({"operation": name}, list(op["buckets"].values()), op["count"], op["sum_seconds"])
+        for name, op in sorted(metrics["operations"].items())
+    ))
+    out.metric("password_hash_rejected_total", "counter", "Hashing requests rejected with 503", metrics["rejected"])
+    out.metric("password_rehashed_total", "counter", "Hashes upgraded to the current cost on login", metrics["rehashed"])
+
+
+def add_log_writer_metrics(out: Exposition) -> None:
+    snapshot = activity_log_writer.snapshot()
+    out.metric("activity_log_writer_running", "gauge", "Background log writer is running", snapshot["running"])
+    out.metric("activity_log_writer_backlog", "gauge", "Log entries waiting to be written", snapshot["backlog"])
+    for key in ("enqueued", "dropped", "written", "failed", "batches"):
+        out.metric(f"activity_log_writer_{key}_total", "counter", f"Log writer {key} counter", snapshot[key])
+
+
+async def add_rate_limit_metrics(out: Exposition) -> None:
+    out.metric(
+        "login_throttled_today", "gauge", "Login attempts rejected by the rate limiter today",
+        await login_rate_limiter.throttled_count(0),
+    )
+
+
+async def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus"""
+    out = Exposition()
+    add_request_metrics(out)
+    add_threadpool_metrics(out)
+    add_pool_metrics(out)
+    add_password_hashing_metrics(out)
+    add_log_writer_metrics(out)
+    await add_rate_limit_metrics(out)
+    return out.render()
@@ -1,11 +1,54 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, Date, DateTime, Index, JSON, ForeignKey, event, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import column_property, validates
 from sqlalchemy.sql import func
 from app.database import Base
+from typing import Optional
+import re
+
+# Число и следующее за ним слово (единица измерения): "120 г", "1,5 кг", "250g", "100 мл"
+WEIGHT_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*([^\W\d_]+)?")
+
+# Единицы массы и множитель перевода в граммы; другие единицы (мл, шт, см) - не вес
+WEIGHT_UNITS = {
+    **dict.fromkeys(("г", "гр", "грамм", "грамма", "граммов", "g", "gr", "gram", "grams"), 1),
+    **dict.fromkeys(("кг", "kg"), 1000),
+}
+
+# Колонки каталога с числовыми фильтрами и сортировкой
+DESSERT_NUMERIC_COLUMNS = ("price", "calories", "proteins", "fats", "carbs", "weight_grams")
+
+
+def parse_weight_grams(weight: Optional[str]) -> Optional[float]:
+    """
+    Извлечь вес в граммах из текстового поля weight (кг переводятся в граммы)
+
+    Число без единицы считается граммами. Если у чисел есть только другие единицы
+    ("100 мл", "2 шт"), вес неизвестен - None.
+    """
+    if not weight:
+        return None
+    matches = list(WEIGHT_PATTERN.finditer(weight))
+    if not matches:
+        return None
+    # Предпочитаем число с единицей массы ("2 x 100 г" -> 100)
+    match = next((m for m in matches if m.group(2) and m.group(2).lower() in WEIGHT_UNITS), None)
+    if match is None:
+        if any(m.group(2) for m in matches):
+            return None
+        match = matches[0]
+    value = float(match.group(1).replace(",", "."))
+    return value * WEIGHT_UNITS.get((match.group(2) or "").lower(), 1)
 
 
 class Dessert(Base):
     """Модель десерта"""
     __tablename__ = "desserts"
+    # Составные индексы под фильтры диапазонов и сортировку активного каталога
+    __table_args__ = tuple(
+        Index(f"ix_desserts_active_{column}", "is_active", column)
+        for column in DESSERT_NUMERIC_COLUMNS
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False, index=True)
@@ -18,9 +61,15 @@ class Dessert(Base):
     fats = Column(Float)
     carbs = Column(Float)
     weight = Column(String(50))  # Вес/фасовка
+    weight_grams = Column(Float)  # Вес в граммах, вычисляется из weight
     price = Column(Float)  # Стоимость
     is_active = Column(Boolean, default=True, index=True)
 
+    @validates("weight")
+    def _sync_weight_grams(self, key, value):
+        self.weight_grams = parse_weight_grams(value)
+        return value
+
     def __repr__(self):
         return f"<Dessert {self.title}>"
 
@@ -36,6 +85,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     is_moderator = Column(Boolean, default=False)  # Модератор может редактировать только каталог
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # Увеличивается при смене роли/статуса - старые токены отзываются
     logo_url = Column(String(500))  # URL логотипа компании
     company_name = Column(String(200))  # Название компании
     manager_contact = Column(String(500))  # Контакты менеджера
@@ -47,9 +97,29 @@ class User(Base):
         return f"<User {self.username}>"
 
 
+class LogIpAddress(Base):
+    """Справочник IP адресов журнала активности"""
+    __tablename__ = "activity_log_ip_addresses"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(String(45), nullable=False, unique=True)
+
+
+class LogUserAgent(Base):
+    """Справочник User-Agent журнала активности"""
+    __tablename__ = "activity_log_user_agents"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(String(500), nullable=False, unique=True)
+
+
 class ActivityLog(Base):
     """Модель лога активности пользователей"""
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Курсорная пагинация журнала: ORDER BY created_at DESC, id DESC
+        Index("ix_activity_logs_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True, index=True)  # ID пользователя, который выполнил действие
@@ -58,12 +128,87 @@ class ActivityLog(Base):
     entity_type = Column(String(50), nullable=True, index=True)  # Тип сущности (user, dessert, etc.)
     entity_id = Column(Integer, nullable=True, index=True)  # ID измененной сущности
     description = Column(Text, nullable=True)  # Описание действия
-    old_values = Column(Text, nullable=True)  # Старые значения (JSON строка)
-    new_values = Column(Text, nullable=True)  # Новые значения (JSON строка)
-    ip_address = Column(String(45), nullable=True)  # IP адрес
-    user_agent = Column(String(500), nullable=True)  # User agent браузера
+    old_values = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # Старые значения (JSONB в PostgreSQL)
+    new_values = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # Новые значения
+    ip_address_id = Column(Integer, ForeignKey("activity_log_ip_addresses.id"), nullable=True)  # IP адрес (справочник)
+    user_agent_id = Column(Integer, ForeignKey("activity_log_user_agents.id"), nullable=True)  # User agent (справочник)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
+    # Значения из справочников (только чтение; при записи id разрешает app/log_clients.py)
+    ip_address = column_property(
+        select(LogIpAddress.value).where(LogIpAddress.id == ip_address_id).scalar_subquery()
+    )
+    user_agent = column_property(
+        select(LogUserAgent.value).where(LogUserAgent.id == user_agent_id).scalar_subquery()
+    )
+
     def __repr__(self):
         return f"<ActivityLog {self.action} by {self.username}>"
 
+
+# Индексы поиска по журналу (запросы к ним строит app/log_search.py):
+# полнотекстовый по description и префиксный по lower(username)
+ACTIVITY_LOG_SEARCH_DDL = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS activity_logs_fts USING fts5("
+        "description, content='activity_logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS activity_logs_fts_insert AFTER INSERT ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(rowid, description) VALUES (new.id, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS activity_logs_fts_delete AFTER DELETE ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(activity_logs_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS activity_logs_fts_update AFTER UPDATE OF description ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(activity_logs_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+        "INSERT INTO activity_logs_fts(rowid, description) VALUES (new.id, new.description); END",
+        "CREATE INDEX IF NOT EXISTS ix_activity_logs_username_lower ON activity_logs (lower(username))",
+    ),
+    "postgresql": (
+        "CREATE INDEX IF NOT EXISTS ix_activity_logs_description_fts ON activity_logs "
+        "USING gin (to_tsvector('simple', coalesce(description, '')))",
+        "CREATE INDEX IF NOT EXISTS ix_activity_logs_username_lower ON activity_logs "
+        "(lower(username) text_pattern_ops)",
+    ),
+}
+
+
+# Поля old_values/new_values с частичными индексами "значение изменилось" (фильтр changed_field)
+CHANGE_INDEXED_FIELDS = ("price", "is_active")
+
+
+def changed_value_sql(dialect_name: str, field: str, prefix: str = "") -> str:
+    """SQL условие "значение поля в old_values и new_values различается" (field - проверенное имя)"""
+    if dialect_name == "postgresql":
+        return f"({prefix}old_values -> '{field}') IS DISTINCT FROM ({prefix}new_values -> '{field}')"
+    return f"json_extract({prefix}old_values, '$.{field}') IS NOT json_extract({prefix}new_values, '$.{field}')"
+
+
+def changed_value_index_ddl(dialect_name: str) -> list:
+    """Частичные индексы (created_at, id) по записям, где поле изменилось"""
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_activity_logs_changed_{field} ON activity_logs (created_at, id) "
+        f"WHERE {changed_value_sql(dialect_name, field)}"
+        for field in CHANGE_INDEXED_FIELDS
+    ]
+
+
+@event.listens_for(ActivityLog.__table__, "after_create")
+def create_activity_log_search_indexes(target, connection, **kw):
+    """Создать индексы поиска по журналу вместе с таблицей"""
+    for statement in ACTIVITY_LOG_SEARCH_DDL.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+    if connection.dialect.name in ("sqlite", "postgresql"):
+        for statement in changed_value_index_ddl(connection.dialect.name):
+            connection.exec_driver_sql(statement)
+
+
+class ActivityLogDailyStat(Base):
+    """Дневные счетчики логов активности по действиям, типам сущностей и пользователям"""
+    __tablename__ = "activity_log_daily_stats"
+
+    day = Column(Date, primary_key=True)  # День (UTC)
+    dimension = Column(String(20), primary_key=True)  # action, entity_type или username
+    key = Column(String(100), primary_key=True)  # Значение измерения
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ActivityLogDailyStat {self.day} {self.dimension}={self.key}: {self.count}>"
+
@@ -0,0 +1,46 @@
+"""
+Курсорная (keyset) пагинация: непрозрачный курсор из значений ключа сортировки последней строки
+"""
+from datetime import datetime
+from typing import Tuple, Union
+import base64
+
+from fastapi import HTTPException, status
+from sqlalchemy import String, type_coerce
+
+
+def created_at_key(column, dialect_name: str):
+    """
+    Выражение даты для сортировки и сравнения с курсором
+
+    SQLite хранит даты текстом и сравнивает их как строки. Строки со значением по
+    умолчанию CURRENT_TIMESTAMP записаны без микросекунд ('2024-01-01 10:00:00'),
+    а дата из курсора привязывается с ними ('2024-01-01 10:00:00.000000'), поэтому
+    для SQLite курсор хранит дату так, как она записана в БД, и сравнивается с
+    колонкой как текст (ORDER BY сравнивает так же, индекс используется).
+    """
+    if dialect_name == "sqlite":
+        return type_coerce(column, String)
+    return column
+
+
+def encode_cursor(created_at: Union[datetime, str], row_id: int) -> str:
+    """Курсор для строки с ключом (created_at, id)"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, as_text: bool = False) -> Tuple[Union[datetime, str], int]:
+    """Разобрать курсор в (created_at, id) или выбросить 400; as_text - дата строкой, как в БД"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        parsed = datetime.fromisoformat(created_at)
+        return (created_at if as_text else parsed), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
@@ -0,0 +1,155 @@
+"""
+Хеширование паролей bcrypt в отдельном пуле процессов
+
+bcrypt нагружает CPU и держит GIL только частично, поэтому на общем threadpool
+всплеск логинов занимает все потоки и тормозит обычные запросы. Здесь хеширование
+выполняется небольшим пулом процессов с ограниченной очередью: при переполнении
+запрос сразу получает 503, а не ждет в очереди.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import asyncio
+import multiprocessing
+import threading
+import time
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from app.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+
+# Границы гистограммы времени хеширования (секунды)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Хеширование пароля с заданной стоимостью"""
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля"""
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Стоимость (cost) из bcrypt хеша вида $2b$12$..."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Хеш создан с другой стоимостью и должен быть пересчитан"""
+    return hash_rounds(hashed_password) != BCRYPT_ROUNDS
+
+
+class HashingMetrics:
+    """Счетчики и гистограмма времени хеширования по операциям"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict] = {}
+        self.rejected = 0
+        self.rehashed = 0
+
+    def observe(self, operation: str, seconds: float) -> None:
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {
+                    "count": 0, "sum": 0.0, "max": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                }
+            op["count"] += 1
+            op["sum"] += seconds
+            op["max"] = max(op["max"], seconds)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    op["buckets"][i] += 1
+
+    def snapshot(self) -> Dict:
+        """Текущие значения метрик"""
+        with self._lock:
+            operations = {
+                name: {
+                    "count": op["count"],
+                    "sum_seconds": round(op["sum"], 6),
+                    "avg_seconds": round(op["sum"] / op["count"], 6) if op["count"] else 0.0,
+                    "max_seconds": round(op["max"], 6),
+                    "buckets": dict(zip((str(b) for b in LATENCY_BUCKETS), op["buckets"])),
+                }
+                for name, op in self._ops.items()
+            }
+            return {"operations": operations, "rejected": self.rejected, "rehashed": self.rehashed}
+
+
+class PasswordHasher:
+    """Пул процессов для bcrypt с ограниченным числом ожидающих задач"""
+
+    def __init__(self, workers: int = 2, queue_size: int = 32):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics = HashingMetrics()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pending(self) -> int:
+        """Задачи в работе и в очереди"""
+        return self._pending
+
+    def start(self) -> None:
+        """Запустить пул процессов (spawn: без копии состояния event loop и соединений)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+    def shutdown(self) -> None:
+        """Остановить пул процессов"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, operation: str, func, *args):
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self.metrics.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            if self._executor is None:
+                self.start()
+            started = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self.metrics.observe(operation, time.perf_counter() - started)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Хешировать пароль с текущей стоимостью BCRYPT_ROUNDS"""
+        return await self._run("hash", hash_password, password, BCRYPT_ROUNDS)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Проверить пароль"""
+        return await self._run("verify", check_password, plain_password, hashed_password)
+
+
+# Пул процесса приложения, запускается при старте и останавливается при завершении
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE_SIZE)
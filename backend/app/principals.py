@@ -0,0 +1,158 @@
+"""
+Кеш аутентифицированных пользователей (principal), чтобы не ходить в БД на каждый запрос
+
+Ключ кеша - subject токена (username) и версия пользователя. Любое изменение пользователя
+увеличивает версию через invalidate(), поэтому запись, загруженная до изменения, больше
+не будет прочитана, даже если она попала в кеш уже после инвалидации.
+
+Для проверки прав без загрузки пользователя роли передаются в токене, а актуальность
+токена сверяется с компактной таблицей версий (id -> token_version, is_active).
+"""
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE, TOKEN_VERSION_REFRESH_SECONDS
+from app.models import User
+
+# Колонки пользователя, сохраняемые в кеше
+USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+class PrincipalCache:
+    """Кеш снимков пользователей с коротким TTL и счетчиком версий"""
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, float, Dict[str, Any]]] = {}
+        self._versions: Dict[str, int] = {}
+
+    def version(self, username: str) -> int:
+        """Текущая версия пользователя (берется до загрузки из БД)"""
+        with self._lock:
+            return self._versions.get(username, 0)
+
+    def get(self, username: str) -> Optional[User]:
+        """Получить отсоединенную от сессии копию пользователя или None"""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            version, expires_at, values = entry
+            if version != self._versions.get(username, 0) or expires_at < time.monotonic():
+                del self._entries[username]
+                return None
+        # Новый экземпляр на каждый запрос: объекты не разделяются между запросами
+        return User(**values)
+
+    def put(self, username: str, version: int, user: User) -> None:
+        """Сохранить снимок пользователя, загруженный при версии version"""
+        if self.ttl <= 0:
+            return
+        values = {key: getattr(user, key) for key in USER_COLUMNS}
+        with self._lock:
+            if version != self._versions.get(username, 0):
+                # Пользователь изменился, пока шла загрузка
+                return
+            if len(self._entries) >= self.maxsize and username not in self._entries:
+                # Вытесняем самую старую запись
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[username] = (version, time.monotonic() + self.ttl, values)
+
+    def invalidate(self, username: str) -> None:
+        """Сбросить кеш пользователя после изменения (роль, статус, профиль, пароль)"""
+        with self._lock:
+            self._versions[username] = self._versions.get(username, 0) + 1
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        """Очистить кеш"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Кеш процесса, используется зависимостью get_current_user
+principal_cache = PrincipalCache(ttl=PRINCIPAL_CACHE_TTL, maxsize=PRINCIPAL_CACHE_SIZE)
+
+
+class TokenPrincipal(NamedTuple):
+    """Пользователь, восстановленный из claims токена (без загрузки из БД)"""
+    id: int
+    username: str
+    is_admin: bool
+    is_moderator: bool
+
+
+class TokenVersionTable:
+    """Версии токенов и статус активности пользователей: id -> (token_version, is_active)"""
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[int, bool]] = {}
+        self._loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def is_stale(self) -> bool:
+        """Таблица не загружена или пора перечитать ее из БД"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+
+    def load(self, rows: Iterable[Tuple[int, int, bool]]) -> None:
+        """Заменить таблицу строками (id, token_version, is_active)"""
+        entries = {user_id: (version or 0, bool(is_active)) for user_id, version, is_active in rows}
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+
+    def get(self, user_id: int) -> Optional[Tuple[int, bool]]:
+        return self._entries.get(user_id)
+
+    def set(self, user_id: int, version: int, is_active: bool) -> None:
+        """Обновить пользователя после изменения в БД"""
+        with self._lock:
+            self._entries[user_id] = (version or 0, bool(is_active))
+
+    def remove(self, user_id: int) -> None:
+        """Удалить пользователя (его токены перестают приниматься)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+TOKEN_VERSION_COLUMNS = (User.id, User.token_version, User.is_active)
+
+# Таблица процесса, загружается при старте и обновляется при изменении пользователей
+token_versions = TokenVersionTable(refresh_interval=TOKEN_VERSION_REFRESH_SECONDS)
+
+
+def load_token_versions(db: Session) -> int:
+    """Загрузить таблицу версий токенов из БД, возвращает количество пользователей"""
+    token_versions.load(db.execute(select(*TOKEN_VERSION_COLUMNS)).all())
+    return len(token_versions)
+
+
+async def refresh_token_versions(db: AsyncSession) -> None:
+    """Перечитать таблицу версий токенов (асинхронная сессия)"""
+    token_versions.load((await db.execute(select(*TOKEN_VERSION_COLUMNS))).all())
+
+
+async def fetch_token_version(db: AsyncSession, user_id: int) -> Optional[Tuple[int, bool]]:
+    """Загрузить версию токена одного пользователя (например, зарегистрированного после загрузки)"""
+    row = (await db.execute(select(*TOKEN_VERSION_COLUMNS).where(User.id == user_id))).first()
+    if row is None:
+        return None
+    token_versions.set(*row)
+    return token_versions.get(user_id)
+
+
+def bump_token_version(user: User) -> None:
+    """Отозвать выданные пользователю токены (вызывать до commit)"""
+    user.token_version = (user.token_version or 0) + 1
@@ -0,0 +1,278 @@
+"""
+Профилирование отдельных запросов по требованию администратора
+
+Запрос с заголовком X-Profile: 1 (или параметром ?profile=1) и токеном администратора
+выполняется под сэмплирующим профилировщиком: отдельный поток раз в
+PROFILE_INTERVAL_MS снимает стеки всех потоков процесса (sys._current_frames), поэтому
+в профиль попадают и асинхронный код в цикле событий, и синхронные endpoints в
+threadpool. Профиль охватывает весь процесс: запросы, выполнявшиеся одновременно с
+профилируемым, и фоновые потоки тоже попадают в него (в сводке - "scope": "process",
+у каждого стека первым идет имя потока). Простаивающие потоки (ожидание в
+select/queue) не учитываются. Остановка сэмплера и запись файлов выполняются в
+threadpool, не блокируя цикл событий.
+
+Результат сохраняется в PROFILE_DIR в формате collapsed stacks (открывается в
+speedscope и flamegraph.pl) вместе со сводкой самых горячих функций, id профиля
+возвращается в заголовке X-Profile-Id. Одновременно выполняется один профиль,
+число профилей ограничено PROFILE_RATE_LIMIT за PROFILE_RATE_WINDOW секунд, время
+сэмплирования - PROFILE_MAX_SECONDS: функцию можно держать включенной в production.
+"""
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+import json
+import re
+import sys
+import threading
+import time
+
+import anyio
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import check_token_version, decode_token, has_role_claims
+from app.config import (
+    PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_KEEP, PROFILE_MAX_SECONDS,
+    PROFILE_RATE_LIMIT, PROFILE_RATE_WINDOW, PROFILING_ENABLED,
+)
+from app.database import AsyncSessionLocal
+from app.ratelimit import MemoryRateLimitBackend
+
+# Корень backend/: пути файлов в профиле показываются относительно него
+SOURCE_ROOT = str(Path(__file__).resolve().parent.parent)
+
+# Функции и модули, в которых поток простаивает (select цикла событий, ожидание очереди)
+IDLE_FILES = ("selectors.py", "threading.py")
+IDLE_FUNCTIONS = ("select", "poll", "wait")
+
+# Самых горячих функций в сводке
+TOP_FUNCTIONS = 15
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9]{6}-[a-z0-9_-]{1,80}$")
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+def frame_label(frame) -> str:
+    """Имя функции с файлом и строкой начала (как в speedscope)"""
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(SOURCE_ROOT):
+        filename = filename[len(SOURCE_ROOT) + 1:]
+    else:
+        filename = Path(filename).name
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def is_idle(frame) -> bool:
+    return (
+        frame.f_code.co_filename.endswith(IDLE_FILES)
+        and frame.f_code.co_name in IDLE_FUNCTIONS
+    )
+
+
+class StackSampler:
+    """Поток, периодически снимающий стеки всех остальных потоков"""
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self.sample_count += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or is_idle(frame):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[tuple(reversed(stack))] += 1
+
+
+def summarize(samples: Counter) -> Dict[str, List[Dict[str, Any]]]:
+    """Самые горячие функции: собственное время (вершина стека) и общее (с вызываемыми)"""
+    total = sum(samples.values()) or 1
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    for stack, count in samples.items():
+        own[stack[-1]] += count
+        for label in set(stack[1:]):
+            inclusive[label] += count
+
+    def top(counter: Counter) -> List[Dict[str, Any]]:
+        return [
+            {"function": label, "samples": count, "percent": round(100 * count / total, 1)}
+            for label, count in counter.most_common(TOP_FUNCTIONS)
+        ]
+
+    return {"top_self": top(own), "top_total": top(inclusive)}
+
+
+class ProfileStore:
+    """Каталог профилей: <id>.collapsed и <id>.json со сводкой, хранятся последние keep"""
+
+    def __init__(self, directory: Path, keep: int = 50):
+        self.directory = directory
+        self.keep = keep
+
+    def new_id(self, method: str, path: str) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "_", path.lower()).strip("_")[:60] or "root"
+        return f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{method.lower()}-{slug}"
+
+    def save(self, profile_id: str, samples: Counter, summary: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lines = [f"{';'.join(stack)} {count}" for stack, count in samples.items()]
+        (self.directory / f"{profile_id}.collapsed").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        (self.directory / f"{profile_id}.json").write_text(
+            json.dumps({"id": profile_id, **summary}, ensure_ascii=False), encoding="utf-8"
+        )
+        for old in sorted(self.directory.glob("*.json"))[:-self.keep or None]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".collapsed").unlink(missing_ok=True)
+
+    def path(self, profile_id: str, suffix: str) -> Optional[Path]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.exists() else None
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        return [
+            json.loads(path.read_text(encoding="utf-8"))
+            for path in sorted(self.directory.glob("*.json"), reverse=True)
+        ]
+
+
+profile_store = ProfileStore(PROFILE_DIR, keep=PROFILE_KEEP)
+
+
+def profile_requested(scope) -> bool:
+    """Запрос просит профилирование заголовком X-Profile или параметром profile"""
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return value.strip() in (b"1", b"true")
+    query = scope.get("query_string", b"")
+    if b"profile=" not in query:
+        return False
+    return parse_qs(query.decode("latin-1")).get("profile", [""])[0] in ("1", "true")
+
+
+async def admin_user_id(scope) -> Optional[int]:
+    """id администратора из Bearer токена запроса или None"""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            break
+    else:
+        return None
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        payload = decode_token(token)
+        if not has_role_claims(payload) or "admin" not in payload["roles"]:
+            return None
+        async with AsyncSessionLocal() as db:
+            await check_token_version(db, payload)
+    except HTTPException:
+        return None
+    return payload["uid"]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: профилирование запроса по требованию администратора"""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self.enabled = PROFILING_ENABLED
+        self.rate_limits = MemoryRateLimitBackend()
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if not (self.enabled and scope["type"] == "http" and profile_requested(scope)):
+            await self.app(scope, receive, send)
+            return
+        if await admin_user_id(scope) is None:
+            # Флаг от обычного пользователя просто игнорируется
+            await self.app(scope, receive, send)
+            return
+
+        count, _ = await self.rate_limits.hit("profile", PROFILE_RATE_WINDOW, PROFILE_RATE_LIMIT)
+        if count > PROFILE_RATE_LIMIT:
+            await self.app(scope, receive, with_header(send, PROFILE_HEADER, b"rate-limited"))
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, with_header(send, PROFILE_HEADER, b"busy"))
+            return
+
+        try:
+            await self.profile(scope, receive, send)
+        finally:
+            self._busy.release()
+
+    async def profile(self, scope, receive, send):
+        profile_id = self.store.new_id(scope["method"], scope["path"])
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await with_header(send, PROFILE_ID_HEADER, profile_id.encode())(message)
+
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_SECONDS)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - started
+            # Сэмплер останавливается и профиль сохраняется и при отмене запроса
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(sampler.stop)
+                summary = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "duration_ms": round(duration * 1000, 1),
+                    "interval_ms": PROFILE_INTERVAL_MS,
+                    "samples": sampler.sample_count,
+                    # Стеки всех потоков процесса, а не только профилируемого запроса
+                    "scope": "process",
+                    **summarize(sampler.samples),
+                }
+                await run_in_threadpool(self.store.save, profile_id, sampler.samples, summary)
+
+
+def with_header(send, name: bytes, value: bytes):
+    """send, добавляющий заголовок к началу ответа"""
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message["headers"] = list(message.get("headers", [])) + [(name, value)]
+        await send(message)
+    return wrapped
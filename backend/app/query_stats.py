@@ -0,0 +1,143 @@
+"""
+Подсчет SQL запросов и их времени на запрос к API (поиск N+1 и регрессий)
+
+События before/after_cursor_execute движков пишут число запросов и время в
+статистику текущего запроса (contextvar, ее видят и потоки threadpool, и асинхронные
+сессии). В разработке QueryStatsMiddleware отдает их в заголовках ответа
+X-DB-Queries / X-DB-Query-Time-Ms, а одинаковый запрос, повторенный в одном запросе
+к API больше N_PLUS_ONE_THRESHOLD раз, пишется в лог как вероятный N+1.
+
+Для проверки бюджета запросов (в тестах или скриптах) - query_budget(): считает все
+запросы внутри блока независимо от потока (кроме фоновых, например записи логов) и
+падает с AssertionError при превышении.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import N_PLUS_ONE_THRESHOLD, QUERY_STATS_HEADERS
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b"x-db-queries"
+QUERY_TIME_HEADER = b"x-db-query-time-ms"
+
+
+class QueryStats:
+    """Число SQL запросов, их суммарное время и повторы одинаковых запросов"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def add(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Запросы, выполненные больше threshold раз"""
+        with self._lock:
+            return {sql: n for sql, n in self.statements.items() if n > threshold}
+
+
+# Статистика и ASGI scope текущего запроса к API (устанавливаются middleware)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+current_request_scope: ContextVar[Optional[dict]] = ContextVar("current_request_scope", default=None)
+
+# Запросы фоновых потоков (пакетная запись логов) не относятся к блокам query_budget
+background_queries: ContextVar[bool] = ContextVar("background_queries", default=False)
+
+# Активные блоки query_budget (считают запросы из любого потока)
+_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.add(statement, seconds)
+    if _collectors and not background_queries.get():
+        with _collectors_lock:
+            collectors = list(_collectors)
+        for collector in collectors:
+            collector.add(statement, seconds)
+
+
+def install_query_hooks(engine: Engine) -> None:
+    """Подключить подсчет запросов к движку (для AsyncEngine - к его sync_engine)"""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """Проверить, что блок выполняет не больше max_queries SQL запросов"""
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+    if stats.count > max_queries:
+        statements = "\n".join(
+            f"  {n} x {sql}" for sql, n in sorted(stats.statements.items(), key=lambda item: -item[1])
+        )
+        raise AssertionError(
+            f"Expected at most {max_queries} SQL queries, got {stats.count}:\n{statements}"
+        )
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: статистика SQL запросов на каждый запрос к API"""
+
+    def __init__(self, app, headers: bool = QUERY_STATS_HEADERS, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.headers = headers
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        scope_token = current_request_scope.set(scope)
+
+        async def send_with_stats(message):
+            if self.headers and message["type"] == "http.response.start":
+                # Для потоковых ответов учтены запросы до начала отправки тела
+                message["headers"] = list(message.get("headers", [])) + [
+                    (QUERY_COUNT_HEADER, str(stats.count).encode()),
+                    (QUERY_TIME_HEADER, f"{stats.seconds * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            current_request_scope.reset(scope_token)
+            if self.n_plus_one_threshold > 0:
+                for statement, count in stats.repeated(self.n_plus_one_threshold).items():
+                    logger.warning(
+                        "Possible N+1: %s %s ran %d times: %s",
+                        scope["method"], scope["path"], count, " ".join(statement.split())[:500],
+                    )
@@ -0,0 +1,232 @@
+"""
+Ограничение частоты попыток входа (скользящее окно) по IP и username
+
+Проверка выполняется до authenticate_user, поэтому отклоненная попытка не тратит
+время bcrypt. Хранилище подключаемое: память процесса (один воркер) или Redis
+(общий счетчик для нескольких воркеров и серверов). Отказы не пишутся в лог
+построчно, а суммируются в дневных счетчиках, которые показывает сводка логов.
+
+Отклоненная попытка не учитывается ни в одном окне: все окна попытки (IP, username
+с этого IP, username в целом) проверяются и записываются одним атомарным шагом, и
+попытка записывается во все окна, только если место есть в каждом. Поэтому блокировка
+снимается через window секунд после последней разрешенной попытки, даже если клиент
+продолжает стучаться, а один IP не может заполнить общее окно username отклоненными
+попытками и заблокировать вход с других адресов. Лимит username считается отдельно
+для каждого IP, а общий лимит username выше.
+"""
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException, Request, status
+
+from app.config import (
+    LOGIN_RATE_WINDOW,
+    LOGIN_RATE_LIMIT_PER_IP,
+    LOGIN_RATE_LIMIT_PER_USERNAME,
+    LOGIN_RATE_LIMIT_PER_USERNAME_TOTAL,
+    RATE_LIMIT_REDIS_URL,
+)
+from app.logger import get_client_ip
+
+# Имя дневного счетчика отклоненных попыток входа
+THROTTLED_COUNTER = "login_throttled"
+
+# Сколько хранить дневные счетчики (сводка логов показывает до 365 дней), секунды
+COUNTER_TTL = 400 * 24 * 3600
+
+
+class MemoryRateLimitBackend:
+    """Хранилище в памяти процесса"""
+
+    # Порог числа ключей, после которого удаляются устаревшие окна
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, Tuple[int, float]] = {}
+
+    async def hit(self, key: str, window: int, limit: int) -> Tuple[int, float]:
+        """Зарегистрировать попытку в одном окне (см. hit_all)"""
+        return (await self.hit_all([(key, limit)], window))[0]
+
+    async def hit_all(self, checks: Sequence[Tuple[str, int]], window: int) -> List[Tuple[int, float]]:
+        """
+        Зарегистрировать попытку во всех окнах checks (ключ, limit), если в каждом есть место
+
+        Returns:
+            Для каждого окна (попыток в окне с учетом этой, секунд до освобождения места);
+            больше limit - окно заполнено, и попытка не записана ни в одно окно
+        """
+        now = time.monotonic()
+        with self._lock:
+            windows = []
+            for key, _ in checks:
+                hits = self._hits.get(key)
+                if hits is None:
+                    if len(self._hits) >= self.MAX_KEYS:
+                        self._sweep(now, window)
+                    hits = self._hits[key] = deque()
+                while hits and hits[0] <= now - window:
+                    hits.popleft()
+                windows.append(hits)
+            allowed = all(len(hits) < limit for hits, (_, limit) in zip(windows, checks))
+            if allowed:
+                for hits in windows:
+                    hits.append(now)
+            return [
+                (len(hits) + (0 if allowed else 1), (hits[0] if hits else now) + window - now)
+                for hits in windows
+            ]
+
+    def _sweep(self, now: float, window: int) -> None:
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - window]:
+            del self._hits[key]
+
+    async def incr(self, name: str) -> None:
+        """Увеличить счетчик (хранится COUNTER_TTL секунд с последнего изменения)"""
+        now = time.monotonic()
+        with self._lock:
+            if name not in self._counters:
+                for expired in [key for key, (_, expires_at) in self._counters.items() if expires_at <= now]:
+                    del self._counters[expired]
+            value = self._counters.get(name, (0, 0.0))[0]
+            self._counters[name] = (value + 1, now + COUNTER_TTL)
+
+    async def get_counters(self, names: List[str]) -> List[int]:
+        """Значения счетчиков (0, если счетчика нет)"""
+        with self._lock:
+            return [self._counters.get(name, (0, 0.0))[0] for name in names]
+
+
+class RedisRateLimitBackend:
+    """Хранилище в Redis (или совместимом сервере): окно - sorted set, счетчики - INCR"""
+
+    # Проверка всех окон и запись попытки во все окна - атомарно на сервере: попытка
+    # записывается, только если ни одно окно не заполнено.
+    # ARGV: время, window, id попытки, limit для каждого ключа из KEYS
+    HIT_SCRIPT = """
+    local counts = {}
+    local allowed = true
+    for i, key in ipairs(KEYS) do
+        redis.call('ZREMRANGEBYSCORE', key, 0, ARGV[1] - ARGV[2])
+        counts[i] = redis.call('ZCARD', key)
+        if counts[i] >= tonumber(ARGV[3 + i]) then
+            allowed = false
+        end
+    end
+    local result = {}
+    for i, key in ipairs(KEYS) do
+        if allowed then
+            redis.call('ZADD', key, ARGV[1], ARGV[3])
+            redis.call('EXPIRE', key, ARGV[2])
+        end
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        result[i] = {counts[i] + 1, oldest[2] or ARGV[1]}
+    end
+    return result
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set, but the 'redis' package is not installed")
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url)
+        self._hit = self._redis.register_script(self.HIT_SCRIPT)
+
+    async def hit(self, key: str, window: int, limit: int) -> Tuple[int, float]:
+        return (await self.hit_all([(key, limit)], window))[0]
+
+    async def hit_all(self, checks: Sequence[Tuple[str, int]], window: int) -> List[Tuple[int, float]]:
+        now = time.time()
+        results = await self._hit(
+            keys=[self.prefix + key for key, _ in checks],
+            args=[repr(now), window, f"{now}:{uuid.uuid4().hex}", *(limit for _, limit in checks)],
+        )
+        return [(int(count), float(oldest) + window - now) for count, oldest in results]
+
+    async def incr(self, name: str) -> None:
+        key = self.prefix + name
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, COUNTER_TTL)
+        await pipe.execute()
+
+    async def get_counters(self, names: List[str]) -> List[int]:
+        if not names:
+            return []
+        values = await self._redis.mget([self.prefix + name for name in names])
+        return [int(value) if value else 0 for value in values]
+
+
+class LoginRateLimiter:
+    """Скользящее окно попыток входа по IP, по username с одного IP и по username в целом"""
+
+    def __init__(self, backend, window: int, per_ip: int, per_username: int, per_username_total: int = 0):
+        self.backend = backend
+        self.window = window
+        self.per_ip = per_ip
+        self.per_username = per_username
+        self.per_username_total = per_username_total
+
+    async def check(self, ip: Optional[str], username: str) -> None:
+        """Зарегистрировать попытку входа или выбросить 429, если лимит превышен"""
+        checks = []
+        if ip and self.per_ip > 0:
+            checks.append((f"login:ip:{ip}", self.per_ip))
+        username = username.strip().lower() if username else ""
+        if username and self.per_username > 0:
+            checks.append((f"login:user:{username}:ip:{ip or '-'}", self.per_username))
+        if username and self.per_username_total > 0:
+            checks.append((f"login:user:{username}", self.per_username_total))
+        if not checks:
+            return
+
+        # Попытка записывается во все окна или ни в одно
+        results = await self.backend.hit_all(checks, self.window)
+        retry_after = [wait for (_, limit), (count, wait) in zip(checks, results) if count > limit]
+        if retry_after:
+            await self.backend.incr(daily_counter_name(datetime.utcnow()))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(max(1, int(max(retry_after)) + 1))},
+            )
+
+    async def throttled_count(self, days: int) -> int:
+        """Количество отклоненных попыток за последние days дней"""
+        today = datetime.utcnow()
+        names = [daily_counter_name(today - timedelta(days=i)) for i in range(days + 1)]
+        return sum(await self.backend.get_counters(names))
+
+
+def daily_counter_name(moment: datetime) -> str:
+    """Имя дневного счетчика отклоненных попыток"""
+    return f"{THROTTLED_COUNTER}:{moment:%Y-%m-%d}"
+
+
+def create_backend():
+    """Хранилище из настроек: Redis, если задан RATE_LIMIT_REDIS_URL, иначе память"""
+    if RATE_LIMIT_REDIS_URL:
+        return RedisRateLimitBackend(RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitBackend()
+
+
+login_rate_limiter = LoginRateLimiter(
+    create_backend(),
+    window=LOGIN_RATE_WINDOW,
+    per_ip=LOGIN_RATE_LIMIT_PER_IP,
+    per_username=LOGIN_RATE_LIMIT_PER_USERNAME,
+    per_username_total=LOGIN_RATE_LIMIT_PER_USERNAME_TOTAL,
+)
+
+
+async def check_login_rate(request: Request, username: str) -> None:
+    """Проверить лимит попыток входа для запроса (вызывать до authenticate_user)"""
+    await login_rate_limiter.check(get_client_ip(request), username)
@@ -0,0 +1,107 @@
+"""
+Проверка готовности экземпляра принимать трафик (/ready)
+
+В отличие от /health (процесс жив), /ready проверяет зависимости и перегрузку:
+время ответа БД, заполнение пулов соединений, запись в каталог загрузок, число
+генераций PDF и ожидающих потока вызовов, очередь логов активности. Если хотя бы
+одна проверка не прошла порог из настроек READY_*, ответ - 503, и балансировщик
+перестает направлять запросы на экземпляр.
+"""
+from typing import Any, Dict
+import asyncio
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from app.config import (
+    READY_DB_LATENCY_MS, READY_DB_TIMEOUT, READY_MAX_LOG_BACKLOG, READY_MAX_PDF_JOBS,
+    READY_MAX_POOL_USAGE, READY_MAX_THREADPOOL_WAITING, UPLOAD_DIR,
+)
+from app.database import async_engine
+from app.log_writer import activity_log_writer
+from app.metrics import pdf_jobs, pool_metrics, threadpool_usage
+
+
+async def check_database() -> Dict[str, Any]:
+    """Время выполнения SELECT 1 через асинхронный движок"""
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    started = time.perf_counter()
+    try:
+        # Таймаут включает ожидание соединения из заполненного пула
+        await asyncio.wait_for(ping(), timeout=READY_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"timeout after {READY_DB_TIMEOUT}s"}
+    except Exception as e:
+        # Текст ошибки может содержать адрес БД - отдаем только тип
+        return {"ok": False, "error": type(e).__name__}
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {"ok": latency_ms <= READY_DB_LATENCY_MS, "latency_ms": latency_ms}
+
+
+def check_pools() -> Dict[str, Any]:
+    """Заполнение пулов соединений (только пулы с ограниченным размером)"""
+    result: Dict[str, Any] = {"ok": True}
+    for name, values in pool_metrics.snapshot().items():
+        capacity = values.get("capacity")
+        if not capacity:
+            continue
+        usage = values["checkedout"] / capacity
+        result[name] = {"in_use": values["checkedout"], "capacity": capacity, "usage": round(usage, 2)}
+        if usage > READY_MAX_POOL_USAGE:
+            result["ok"] = False
+    return result
+
+
+def touch_upload_dir() -> None:
+    """Создать и удалить временный файл в каталоге загрузок"""
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix=".ready-"):
+        pass
+
+
+async def check_upload_dir() -> Dict[str, Any]:
+    """Каталог загрузок доступен для записи"""
+    try:
+        # Файловые операции - в отдельном потоке: зависшая файловая система (NFS)
+        # не блокирует цикл событий дольше таймаута
+        await asyncio.wait_for(asyncio.to_thread(touch_upload_dir), timeout=READY_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"timeout after {READY_DB_TIMEOUT}s"}
+    except OSError as e:
+        return {"ok": False, "error": e.strerror or type(e).__name__}
+    return {"ok": True}
+
+
+def check_workers() -> Dict[str, Any]:
+    """Генерации PDF и вызовы, ожидающие свободный поток threadpool"""
+    usage = threadpool_usage()
+    return {
+        "ok": pdf_jobs.value <= READY_MAX_PDF_JOBS and usage["waiting"] <= READY_MAX_THREADPOOL_WAITING,
+        "pdf_jobs": pdf_jobs.value,
+        "threadpool_busy": usage["busy"],
+        "threadpool_limit": usage["limit"],
+        "threadpool_waiting": usage["waiting"],
+    }
+
+
+def check_log_writer() -> Dict[str, Any]:
+    """Очередь фоновой записи логов активности"""
+    backlog = activity_log_writer.backlog
+    running = activity_log_writer.running
+    return {"ok": running and backlog <= READY_MAX_LOG_BACKLOG, "running": running, "backlog": backlog}
+
+
+async def check_readiness() -> Dict[str, Any]:
+    """Результаты всех проверок и общий статус ready / not_ready"""
+    checks = {
+        "database": await check_database(),
+        "connection_pools": check_pools(),
+        "upload_dir": await check_upload_dir(),
+        "workers": check_workers(),
+        "log_writer": check_log_writer(),
+    }
+    ready = all(check["ok"] for check in checks.values())
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
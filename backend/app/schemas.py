@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 
@@ -39,11 +39,30 @@ class DessertUpdate(BaseModel):
 
 class DessertResponse(DessertBase):
     id: int
+    weight_grams: Optional[float] = None
 
     class Config:
         from_attributes = True
 
 
+class DessertBulkSelection(BaseModel):
+    """Выбор десертов для массовой операции: список ID и/или фильтр"""
+    ids: Optional[list[int]] = Field(None, description="ID десертов")
+    category: Optional[str] = Field(None, description="Точное совпадение категории")
+    is_active: Optional[bool] = Field(None, description="Фильтр по статусу активности")
+
+
+class DessertBulkUpdate(DessertBulkSelection):
+    """Массовое частичное обновление десертов"""
+    changes: DessertUpdate
+
+
+class DessertBulkResult(BaseModel):
+    """Результат массовой операции"""
+    matched: int
+    affected: int
+
+
 class PDFExportSettings(BaseModel):
     """Настройки экспорта PDF"""
     dessert_ids: list[int] = Field(..., description="ID выбранных десертов")
@@ -112,6 +131,7 @@ class ProfileUpdateResponse(BaseModel):
     """Ответ при обновлении профиля"""
     message: str
     user: UserResponse
+    access_token: Optional[str] = None  # Новый токен, если прежние отозваны (смена пароля)
 
 
 class UpdateCompanyProfileRequest(BaseModel):
@@ -150,8 +170,8 @@ class ActivityLogResponse(BaseModel):
     entity_type: Optional[str] = None
     entity_id: Optional[int] = None
     description: Optional[str] = None
-    old_values: Optional[str] = None
-    new_values: Optional[str] = None
+    old_values: Optional[Dict[str, Any]] = None
+    new_values: Optional[Dict[str, Any]] = None
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     created_at: datetime
@@ -166,3 +186,5 @@ class ActivityLogListResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страниц больше нет)
+    total_is_estimate: bool = False  # total приблизительный или ограничен сверху
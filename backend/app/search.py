@@ -0,0 +1,188 @@
+"""
+In-memory триграммный индекс для нечеткого поиска десертов (устойчив к опечаткам)
+
+Индексируются слова из названия, категории и состава. Слово запроса сравнивается
+со словарем индекса по коэффициенту Жаккара на множествах триграмм (как pg_trgm),
+затем найденные слова переводятся в десерты с весом поля, где слово встретилось.
+"""
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.config import FUZZY_SIMILARITY_THRESHOLD
+from app.models import Dessert
+import re
+import threading
+
+# Вес поля, в котором найдено слово
+FIELD_WEIGHTS = {
+    "title": 1.0,
+    "category": 0.7,
+    "ingredients": 0.5,
+}
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_words(text: Optional[str]) -> List[str]:
+    """Разбить текст на слова в нижнем регистре (ё приводится к е)"""
+    if not text:
+        return []
+    return WORD_PATTERN.findall(text.lower().replace("ё", "е"))
+
+
+def word_trigrams(word: str) -> FrozenSet[str]:
+    """Триграммы слова с отступами по краям, как в pg_trgm"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Потокобезопасный триграммный индекс с инкрементальным обновлением"""
+
+    def __init__(self, threshold: float = 0.3):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._word_trigram_count: Dict[str, int] = {}
+        self._word_docs: Dict[str, Dict[int, float]] = {}
+        self._doc_words: Dict[int, Dict[str, float]] = {}
+        self._doc_active: Dict[int, bool] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_words)
+
+    def clear(self) -> None:
+        """Очистить индекс"""
+        with self._lock:
+            self._trigram_words.clear()
+            self._word_trigram_count.clear()
+            self._word_docs.clear()
+            self._doc_words.clear()
+            self._doc_active.clear()
+
+    def upsert(
+        self,
+        doc_id: int,
+        title: Optional[str] = None,
+        category: Optional[str] = None,
+        ingredients: Optional[str] = None,
+        is_active: Optional[bool] = True,
+    ) -> None:
+        """Добавить или переиндексировать десерт"""
+        words: Dict[str, float] = {}
+        for field, text in (("title", title), ("category", category), ("ingredients", ingredients)):
+            weight = FIELD_WEIGHTS[field]
+            for word in normalize_words(text):
+                if words.get(word, 0.0) < weight:
+                    words[word] = weight
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._doc_words[doc_id] = words
+            self._doc_active[doc_id] = bool(is_active)
+            for word, weight in words.items():
+                docs = self._word_docs.get(word)
+                if docs is None:
+                    docs = self._word_docs[word] = {}
+                    trigrams = word_trigrams(word)
+                    self._word_trigram_count[word] = len(trigrams)
+                    for trigram in trigrams:
+                        self._trigram_words.setdefault(trigram, set()).add(word)
+                docs[doc_id] = weight
+
+    def remove(self, doc_id: int) -> None:
+        """Удалить десерт из индекса"""
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: int) -> None:
+        words = self._doc_words.pop(doc_id, None)
+        self._doc_active.pop(doc_id, None)
+        if not words:
+            return
+        for word in words:
+            docs = self._word_docs.get(word)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                # Слово больше нигде не встречается - убираем его из словаря
+                del self._word_docs[word]
+                del self._word_trigram_count[word]
+                for trigram in word_trigrams(word):
+                    bucket = self._trigram_words.get(trigram)
+                    if bucket is not None:
+                        bucket.discard(word)
+                        if not bucket:
+                            del self._trigram_words[trigram]
+
+    def search(
+        self,
+        query: str,
+        limit: int = 100,
+        is_active: Optional[bool] = None,
+    ) -> List[Tuple[int, float]]:
+        """Найти десерты, похожие на запрос: список (id, score) по убыванию score"""
+        query_words = list(dict.fromkeys(normalize_words(query)))
+        if not query_words:
+            return []
+
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for query_word in query_words:
+                trigrams = word_trigrams(query_word)
+                common: Counter = Counter()
+                for trigram in trigrams:
+                    bucket = self._trigram_words.get(trigram)
+                    if bucket:
+                        common.update(bucket)
+
+                # Лучшее совпадение слова запроса для каждого десерта
+                best: Dict[int, float] = {}
+                for word, shared in common.items():
+                    similarity = shared / (len(trigrams) + self._word_trigram_count[word] - shared)
+                    if similarity < self.threshold:
+                        continue
+                    for doc_id, weight in self._word_docs[word].items():
+                        score = similarity * weight
+                        if score > best.get(doc_id, 0.0):
+                            best[doc_id] = score
+
+                for doc_id, score in best.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+            if is_active is not None:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if self._doc_active.get(doc_id) == is_active
+                }
+
+        total = len(query_words)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(doc_id, score / total) for doc_id, score in ranked]
+
+    def rebuild(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Optional[str], Optional[bool]]]) -> None:
+        """Полностью перестроить индекс из строк (id, title, category, ingredients, is_active)"""
+        self.clear()
+        for doc_id, title, category, ingredients, is_active in rows:
+            self.upsert(doc_id, title, category, ingredients, is_active)
+
+
+# Индекс каталога, общий для процесса
+dessert_index = TrigramIndex(threshold=FUZZY_SIMILARITY_THRESHOLD)
+
+
+def index_dessert(dessert: Dessert) -> None:
+    """Переиндексировать десерт после создания или изменения"""
+    dessert_index.upsert(
+        dessert.id, dessert.title, dessert.category, dessert.ingredients, dessert.is_active
+    )
+
+
+def rebuild_dessert_index(db: Session) -> int:
+    """Построить индекс по всем десертам из БД, возвращает количество десертов"""
+    rows = db.query(
+        Dessert.id, Dessert.title, Dessert.category, Dessert.ingredients, Dessert.is_active
+    ).yield_per(1000)
+    dessert_index.rebuild(rows)
+    return len(dessert_index)
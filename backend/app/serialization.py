@@ -0,0 +1,54 @@
+"""
+Быстрая сериализация больших списков: строки выборки (кортежи колонок) сразу в orjson
+
+ORM объекты не создаются, а повторная валидация через response_model пропускается,
+так как ответ возвращается готовым Response. Форма JSON совпадает с Pydantic схемами.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.config import VALIDATE_FAST_PATH
+
+# OPT_UTC_Z: datetime в UTC сериализуется с суффиксом "Z", как в Pydantic
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(Response):
+    """JSON ответ, кодируемый orjson"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+@lru_cache(maxsize=None)
+def model_columns(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """Имена полей схемы ответа в порядке объявления"""
+    return tuple(model.model_fields.keys())
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Кешированный TypeAdapter для списка схем (создание адаптера дорогое)"""
+    return TypeAdapter(List[model])
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]], columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """Преобразовать строки выборки в словари с заданными ключами"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def serialize_rows(
+    rows: Iterable[Sequence[Any]],
+    columns: Sequence[str],
+    model: Optional[Type[BaseModel]] = None,
+) -> List[Dict[str, Any]]:
+    """Строки выборки в список словарей формы model (с проверкой схемы при VALIDATE_FAST_PATH)"""
+    items = rows_to_dicts(rows, columns)
+    if VALIDATE_FAST_PATH and model is not None:
+        list_adapter(model).validate_python(items)
+    return items
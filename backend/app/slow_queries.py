@@ -0,0 +1,234 @@
+"""
+Журнал медленных SQL запросов
+
+Запрос дольше SLOW_QUERY_MS пишется в логгер app.slow_queries одной JSON записью:
+SQL, параметры (SLOW_QUERY_PARAMS: full - как есть, redact - строки скрыты,
+none - без параметров), время, маршрут запроса к API и место вызова в коде
+приложения. Параметры с именами из SENSITIVE_PARAM_NAMES скрываются всегда:
+позиционные параметры (sqlite, asyncpg) сопоставляются с именами по скомпилированному
+запросу, а если это невозможно - в запросах к SENSITIVE_TABLES строки скрываются и
+в режиме full.
+
+При первом появлении медленного SELECT к записи добавляется план (EXPLAIN /
+EXPLAIN QUERY PLAN). Он выполняется на том же соединении (второе соединение из
+исчерпанного пула ждало бы само себя), курсором DBAPI в обход событий движка;
+в PostgreSQL - внутри SAVEPOINT, чтобы ошибка плана не прервала транзакцию запроса.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import re
+import sys
+import threading
+import time
+
+import greenlet
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import SLOW_QUERY_EXPLAIN, SLOW_QUERY_MS, SLOW_QUERY_PARAMS
+from app.query_stats import current_request_scope
+
+logger = logging.getLogger(__name__)
+
+# Код приложения (место вызова ищется среди этих файлов)
+APP_DIR = str(Path(__file__).resolve().parent.parent)
+
+# Параметры с такими именами скрываются в любом режиме
+SENSITIVE_PARAM_NAMES = ("password", "token", "secret", "hash")
+
+# Таблицы с секретами: если имена позиционных параметров неизвестны, строки скрываются
+SENSITIVE_TABLES = ("users",)
+SENSITIVE_TABLE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(SENSITIVE_TABLES) + r")\b", re.IGNORECASE
+)
+
+# Сколько разных медленных запросов помнится для однократного EXPLAIN
+MAX_EXPLAINED_STATEMENTS = 1000
+
+# Значения, которые не скрываются в режиме redact
+PLAIN_TYPES = (int, float, bool, Decimal, date, datetime)
+
+
+def redact_value(value: Any) -> Any:
+    if value is None or isinstance(value, PLAIN_TYPES):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<redacted {type(value).__name__}[{len(value)}]>"
+    return f"<redacted {type(value).__name__}>"
+
+
+def format_value(value: Any, mode: str) -> Any:
+    if mode == "redact":
+        return redact_value(value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def is_sensitive(name: Any) -> bool:
+    return any(part in str(name).lower() for part in SENSITIVE_PARAM_NAMES)
+
+
+def format_params(
+    parameters: Any,
+    mode: str = SLOW_QUERY_PARAMS,
+    names: Optional[Sequence[str]] = None,
+    statement: str = "",
+) -> Any:
+    """
+    Параметры запроса для записи в лог
+
+    names - имена позиционных параметров по порядку (None - неизвестны),
+    statement - SQL запроса (по нему определяется обращение к SENSITIVE_TABLES).
+    """
+    if mode == "none" or parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {
+            key: "<redacted>" if is_sensitive(key) else format_value(value, mode)
+            for key, value in parameters.items()
+        }
+    if isinstance(parameters, (list, tuple)):
+        if names is not None and len(names) == len(parameters):
+            return [
+                "<redacted>" if is_sensitive(name) else format_value(value, mode)
+                for name, value in zip(names, parameters)
+            ]
+        if mode == "full" and SENSITIVE_TABLE_PATTERN.search(statement):
+            mode = "redact"
+        return [format_value(value, mode) for value in parameters]
+    return format_value(parameters, mode)
+
+
+def positional_names(context: Any) -> Optional[Sequence[str]]:
+    """Имена позиционных параметров скомпилированного запроса (None - запрос не скомпилирован)"""
+    compiled = getattr(context, "compiled", None)
+    return getattr(compiled, "positiontup", None) if compiled is not None else None
+
+
+def find_call_site() -> Optional[str]:
+    """Ближайший к запросу кадр стека в коде приложения (файл:строка функция)"""
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent()
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename != __file__ and not filename.endswith("database.py"):
+            relative = filename[len(APP_DIR) + 1:]
+            return f"{relative}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+        if frame is None and current.parent is not None:
+            # Асинхронная сессия: запрос выполняется в greenlet SQLAlchemy,
+            # а вызвавший его код - в стеке родительского greenlet
+            current = current.parent
+            frame = current.gr_frame
+    return None
+
+
+def request_route() -> Optional[Dict[str, Any]]:
+    """Маршрут текущего запроса к API"""
+    scope = current_request_scope.get()
+    if scope is None:
+        return None
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__qualname__", None)
+    return {
+        "method": scope.get("method"),
+        "path": scope.get("path"),
+        "endpoint": f"{endpoint.__module__}.{name}" if name else None,
+    }
+
+
+class SlowQueryLog:
+    """Обработчики событий движка, пишущие медленные запросы в лог"""
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_MS,
+        explain: bool = SLOW_QUERY_EXPLAIN,
+        params_mode: str = SLOW_QUERY_PARAMS,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.params_mode = params_mode
+        self._lock = threading.Lock()
+        self._explained: set = set()
+
+    def install(self, engine: Engine) -> None:
+        """Подключить к движку (для AsyncEngine - к его sync_engine)"""
+        if self.threshold <= 0:
+            return
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["slow_query_started"].pop()
+        if seconds < self.threshold:
+            return
+
+        record: Dict[str, Any] = {
+            "event": "slow_query",
+            "duration_ms": round(seconds * 1000, 1),
+            "sql": statement,
+            # Для executemany - параметры первой строки
+            "params": format_params(
+                (parameters[0] if parameters else None) if executemany else parameters,
+                self.params_mode,
+                names=positional_names(context),
+                statement=statement,
+            ),
+            "executemany": len(parameters) if executemany else None,
+            "route": request_route(),
+            "call_site": find_call_site(),
+        }
+        if self.explain and self.first_occurrence(statement):
+            record["plan"] = self.explain_plan(conn, statement, parameters, executemany)
+        logger.warning(
+            "slow_query %s", orjson.dumps(record, default=str).decode(), extra={"slow_query": record}
+        )
+
+    def first_occurrence(self, statement: str) -> bool:
+        with self._lock:
+            if statement in self._explained or len(self._explained) >= MAX_EXPLAINED_STATEMENTS:
+                return False
+            self._explained.add(statement)
+            return True
+
+    def explain_plan(self, conn, statement: str, parameters: Any, executemany: bool) -> Optional[List[str]]:
+        """План запроса на том же соединении (только SELECT: EXPLAIN не выполняет запрос)"""
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        postgresql = conn.dialect.name == "postgresql"
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            # Новый курсор: результаты медленного запроса еще не прочитаны из его курсора
+            cursor = conn.connection.dbapi_connection.cursor()
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        try:
+            if postgresql:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception as e:
+                if postgresql:
+                    cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                return [f"EXPLAIN failed: {e}"]
+            if postgresql:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            # Текст плана - последняя колонка (SQLite: id, parent, notused, detail)
+            return [str(row[-1]) for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            cursor.close()
+
+
+slow_query_log = SlowQueryLog()
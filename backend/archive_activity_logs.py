@@ -0,0 +1,41 @@
+"""
+Архивирование логов активности старше LOG_RETENTION_DAYS (запускать по расписанию, например cron раз в сутки)
+
+Использование: python archive_activity_logs.py [--days N] [--archive-dir PATH]
+"""
+from pathlib import Path
+import argparse
+
+from app.config import LOG_RETENTION_DAYS, LOG_ARCHIVE_DIR, LOG_PARTITIONS_AHEAD
+from app.database import SessionLocal
+from app.log_retention import archive_logs, ensure_log_partitions
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive and delete old activity logs")
+    parser.add_argument("--days", type=int, default=LOG_RETENTION_DAYS, help="Retention period in days")
+    parser.add_argument("--archive-dir", type=Path, default=LOG_ARCHIVE_DIR, help="Directory for .ndjson.gz archives")
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        print("Retention is disabled (LOG_RETENTION_DAYS=0), nothing to do")
+        return
+
+    db = SessionLocal()
+    try:
+        created = ensure_log_partitions(db, LOG_PARTITIONS_AHEAD)
+        if created:
+            print(f"✓ Created partitions: {', '.join(created)}")
+        result = archive_logs(db, args.days, args.archive_dir)
+        print(
+            f"✓ Archived {result['archived']} log entries to {args.archive_dir} "
+            f"(deleted rows: {result['deleted']}, dropped partitions: {result['dropped_partitions']})"
+        )
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
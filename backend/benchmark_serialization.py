@@ -0,0 +1,105 @@
+"""
+Бенчмарк сериализации списков: ORM + Pydantic + json (как раньше) против строк выборки + orjson
+
+Использование:
+    python benchmark_serialization.py [количество_строк]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Отдельная временная БД, чтобы не трогать рабочую
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/benchmark.db"
+
+from app.database import engine, SessionLocal, Base
+from app.log_clients import intern_log_clients
+from app.models import Dessert, ActivityLog
+from app.schemas import DessertResponse, ActivityLogResponse
+from app.serialization import ORJSONResponse, list_adapter, model_columns, serialize_rows
+
+
+def seed(db, rows: int):
+    """Заполнить БД тестовыми десертами и логами"""
+    db.bulk_insert_mappings(Dessert, [
+        {
+            "title": f"Десерт {i}",
+            "category": "Торты",
+            "description": "Нежный бисквит с кремом " * 10,
+            "ingredients": "мука, сахар, яйца, сливки, масло",
+            "calories": 250 + i % 100,
+            "proteins": 5.5,
+            "fats": 12.0,
+            "carbs": 30.0,
+            "weight": "120 г",
+            "price": 300 + i % 50,
+        }
+        for i in range(rows)
+    ])
+    logs = [
+        {
+            "user_id": 1,
+            "username": "admin",
+            "action": "dessert_update",
+            "entity_type": "dessert",
+            "entity_id": i,
+            "description": f"Admin admin updated dessert: Десерт {i}",
+            "old_values": {"price": 300},
+            "new_values": {"price": 350},
+            "ip_address": "127.0.0.1",
+            "user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)",
+        }
+        for i in range(rows)
+    ]
+    # IP и User-Agent хранятся в справочниках: в записи лога - id строк справочника
+    intern_log_clients(db, logs)
+    db.bulk_insert_mappings(ActivityLog, logs)
+    db.commit()
+
+
+def before(db, model_cls, schema):
+    """Старый путь: ORM объекты, валидация response_model, stdlib json"""
+    adapter = list_adapter(schema)
+    objects = db.query(model_cls).all()
+    validated = adapter.validate_python(objects, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(db, model_cls, schema):
+    """Новый путь: кортежи колонок, словари, orjson"""
+    columns = model_columns(schema)
+    rows = db.query(*[getattr(model_cls, c) for c in columns]).all()
+    return ORJSONResponse(serialize_rows(rows, columns, schema)).body
+
+
+def measure(func, db, model_cls, schema, rows: int, repeat: int = 5) -> float:
+    """Лучшее время на одну строку в микросекундах"""
+    best = float("inf")
+    for _ in range(repeat):
+        db.expunge_all()
+        started = time.perf_counter()
+        func(db, model_cls, schema)
+        best = min(best, time.perf_counter() - started)
+    return best / rows * 1_000_000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seed(db, rows)
+        print(f"Rows: {rows}")
+        for model_cls, schema in ((Dessert, DessertResponse), (ActivityLog, ActivityLogResponse)):
+            old = measure(before, db, model_cls, schema, rows)
+            new = measure(after, db, model_cls, schema, rows)
+            print(f"{schema.__name__:<22} before: {old:6.2f} us/row  after: {new:6.2f} us/row  speedup: {old / new:4.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
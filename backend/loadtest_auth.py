@@ -0,0 +1,145 @@
+"""
+Нагрузочный тест зависимости аутентификации: не блокируют ли проверки токена event loop
+
+Запускает приложение в процессе (httpx + ASGI), искусственно замедляет запросы к таблице
+users и параллельно с авторизованными запросами измеряет задержку несвязанного /health.
+Для сравнения тот же сценарий прогоняется со старой синхронной зависимостью, а новая
+асинхронная - дважды: без кеша пользователей (каждый запрос идет в БД) и с кешем.
+
+Использование (httpx ставится из requirements-dev.txt):
+    pip install -r requirements-dev.txt
+    python loadtest_auth.py [авторизованных_запросов] [задержка_запроса_мс]
+
+Количество запросов не должно превышать размер пула синхронного движка (5 + 10):
+старая зависимость ждет свободное соединение прямо в event loop и зависает навсегда.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Отдельная временная БД, чтобы не трогать рабочую
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/loadtest.db"
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("loadtest_auth.py requires httpx: pip install -r requirements-dev.txt")
+from fastapi import Depends, HTTPException
+from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from main import app
+from app.auth import ALGORITHM, SECRET_KEY, create_access_token, get_current_user, get_user_by_username, oauth2_scheme
+from app.database import SessionLocal, async_engine, engine, get_db
+from app.models import User
+from app.principals import principal_cache
+
+HEALTH_PROBES = 40
+
+
+def blocking_get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Прежняя реализация: синхронный запрос к БД прямо в event loop"""
+    username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    user = get_user_by_username(db, username)
+    if user is None:
+        raise HTTPException(status_code=401)
+    return user
+
+
+async def blocking_dependency(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    # async def без await: FastAPI выполняет ее в event loop, как было раньше
+    return blocking_get_current_user(token, db)
+
+
+def slow_down_user_lookups(delay: float) -> None:
+    """
+    Добавить задержку к каждому запросу к таблице users (имитация медленной БД)
+
+    Задержка выполняется в потоке, который исполняет SQL: для синхронного движка это
+    поток вызывающего кода, для aiosqlite - его фоновый поток, как у настоящего драйвера.
+    """
+    def trace(statement):
+        if "FROM users" in statement:
+            time.sleep(delay)
+
+    # Соединения, открытые до подписки на событие, остались бы без задержки
+    engine.dispose()
+
+    @event.listens_for(engine, "connect")
+    def on_sync_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(trace)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_async_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(lambda driver_connection: driver_connection.set_trace_callback(trace))
+
+
+async def run_scenario(client: httpx.AsyncClient, token: str, requests: int) -> dict:
+    """Параллельно запустить авторизованные запросы и замерить задержку /health"""
+    headers = {"Authorization": f"Bearer {token}"}
+    health_latencies = []
+
+    async def probe_health():
+        for _ in range(HEALTH_PROBES):
+            started = time.perf_counter()
+            response = await client.get("/health")
+            response.raise_for_status()
+            health_latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    auth_calls = [client.get("/api/auth/me", headers=headers) for _ in range(requests)]
+    responses, _ = await asyncio.gather(asyncio.gather(*auth_calls), probe_health())
+    elapsed = time.perf_counter() - started
+    assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses][:5]
+
+    return {
+        "elapsed_s": elapsed,
+        "health_p50_ms": statistics.median(health_latencies),
+        "health_p95_ms": statistics.quantiles(health_latencies, n=20)[-1],
+        "health_max_ms": max(health_latencies),
+    }
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    db = SessionLocal()
+    db.add(User(username="loadtest", email="loadtest@example.com", hashed_password="-"))
+    db.commit()
+    db.close()
+    token = create_access_token(data={"sub": "loadtest"})
+    slow_down_user_lookups(delay_ms / 1000)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        print(f"{requests} concurrent /api/auth/me requests, user lookup delay {delay_ms:.0f} ms")
+        scenarios = (
+            ("blocking (before)", blocking_dependency, 0),
+            ("async, no cache", None, 0),
+            ("async, cached", None, principal_cache.ttl),
+        )
+        for name, override, cache_ttl in scenarios:
+            if override:
+                app.dependency_overrides[get_current_user] = override
+            else:
+                app.dependency_overrides.pop(get_current_user, None)
+            # Без кеша каждый запрос проверяет пользователя в БД (сценарий до кеша principal)
+            principal_cache.clear()
+            principal_cache.ttl = cache_ttl
+            result = await run_scenario(client, token, requests)
+            print(
+                f"{name:<18} total: {result['elapsed_s']:6.2f} s  "
+                f"/health p50: {result['health_p50_ms']:6.1f} ms  p95: {result['health_p95_ms']:6.1f} ms  "
+                f"max: {result['health_max_ms']:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
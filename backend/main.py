@@ -1,9 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.database import engine, Base
-from app.api import desserts, pdf, upload, auth, users, logs
-from app.config import UPLOAD_DIR, IMAGES_URL_PREFIX
+from app.database import engine, async_engine, Base, SessionLocal
+from app.api import desserts, pdf, upload, auth, users, logs, metrics, profiles
+from app.config import UPLOAD_DIR, IMAGES_URL_PREFIX, LOG_PARTITIONS_AHEAD
+from app.search import rebuild_dessert_index
+from app.passwords import password_hasher
+from app.log_writer import activity_log_writer
+from app.log_retention import ensure_log_partitions
+from app.principals import load_token_versions
+from app.metrics import MetricsMiddleware, pool_metrics
+from app.query_stats import QueryStatsMiddleware, install_query_hooks
+from app.profiling import ProfilingMiddleware
+from app.readiness import check_readiness
 from pathlib import Path
 import os
 
@@ -34,6 +44,19 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Профилирование запросов по требованию администратора (X-Profile: 1)
+app.add_middleware(ProfilingMiddleware)
+
+# Подсчет SQL запросов на запрос к API (заголовки в разработке, предупреждения о N+1)
+app.add_middleware(QueryStatsMiddleware)
+install_query_hooks(engine)
+install_query_hooks(async_engine.sync_engine)
+
+# Метрики запросов (добавлен последним - внешний слой, учитывает и CORS ответы)
+app.add_middleware(MetricsMiddleware)
+pool_metrics.instrument("sync", engine.pool)
+pool_metrics.instrument("async", async_engine.sync_engine.pool)
+
 # Подключаем статические файлы для изображений
 app.mount(IMAGES_URL_PREFIX, StaticFiles(directory=str(UPLOAD_DIR)), name="images")
 
@@ -44,6 +67,68 @@ app.include_router(pdf.router)
 app.include_router(upload.router)
 app.include_router(users.router)
 app.include_router(logs.router)
+app.include_router(metrics.router)
+app.include_router(profiles.router)
+
+
+@app.on_event("startup")
+def build_search_index():
+    """Построить индекс нечеткого поиска по каталогу"""
+    db = SessionLocal()
+    try:
+        rebuild_dessert_index(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def load_token_version_table():
+    """Загрузить таблицу версий токенов для проверки прав без загрузки пользователей"""
+    db = SessionLocal()
+    try:
+        load_token_versions(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def create_log_partitions():
+    """Создать месячные секции логов активности наперед (PostgreSQL с секционированием)"""
+    db = SessionLocal()
+    try:
+        ensure_log_partitions(db, LOG_PARTITIONS_AHEAD)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_password_hasher():
+    """Запустить пул процессов хеширования паролей"""
+    password_hasher.start()
+
+
+@app.on_event("startup")
+def start_activity_log_writer():
+    """Запустить фоновую запись логов активности"""
+    activity_log_writer.start()
+
+
+@app.on_event("shutdown")
+def stop_activity_log_writer():
+    """Дописать накопленные логи активности и остановить запись"""
+    activity_log_writer.stop()
+
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    """Закрыть соединения асинхронного движка"""
+    await async_engine.dispose()
+
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    """Остановить пул процессов хеширования паролей"""
+    password_hasher.shutdown()
 
 
 @app.get("/")
@@ -55,3 +140,10 @@ def root():
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: 503, если зависимость недоступна или экземпляр перегружен"""
+    report = await check_readiness()
+    return JSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
@@ -0,0 +1,140 @@
+"""
+Общие фикстуры тестов API
+
+Приложение запускается один раз на сессию с временной SQLite базой, после каждого
+теста таблицы очищаются, а кеши процесса (индекс поиска, пользователи, версии
+токенов, лимиты входа, справочники журнала) сбрасываются.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import sys
+import tempfile
+
+# Настройки читаются при импорте app.config, поэтому задаются до импорта приложения
+TEST_DIR = Path(tempfile.mkdtemp(prefix="dessert-catalog-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR / 'test.db'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("ENVIRONMENT", "development")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("VALIDATE_FAST_PATH", "1")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "1")
+os.environ.setdefault("LOG_WRITER_FLUSH_INTERVAL", "0.05")
+os.environ.setdefault("PROFILE_DIR", str(TEST_DIR / "profiles"))
+os.environ.setdefault("LOG_ARCHIVE_DIR", str(TEST_DIR / "archives"))
+os.environ.pop("RATE_LIMIT_REDIS_URL", None)
+os.environ.pop("METRICS_TOKEN", None)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.auth import get_password_hash
+from app.database import Base, SessionLocal, engine
+from app.log_clients import lookup_caches
+from app.log_writer import activity_log_writer
+from app.models import User
+from app.principals import principal_cache, token_versions
+from app.query_stats import query_budget as check_query_budget
+from app.ratelimit import MemoryRateLimitBackend, login_rate_limiter
+from app.search import dessert_index
+
+DEFAULT_PASSWORD = "secret1"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def clean_state(client):
+    yield
+    activity_log_writer.flush()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    dessert_index.clear()
+    principal_cache.clear()
+    token_versions.load([])
+    for cache in lookup_caches.values():
+        cache.clear()
+    login_rate_limiter.backend = MemoryRateLimitBackend()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def create_user():
+    """Создать пользователя напрямую в БД"""
+    def create(username: str, password: str = DEFAULT_PASSWORD, **fields) -> User:
+        session = SessionLocal()
+        try:
+            user = User(
+                username=username,
+                email=fields.pop("email", f"{username}@example.com"),
+                hashed_password=get_password_hash(password),
+                **fields,
+            )
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+            session.expunge(user)
+            return user
+        finally:
+            session.close()
+    return create
+
+
+@pytest.fixture
+def login(client):
+    """Войти и получить заголовки с Bearer токеном"""
+    def do_login(username: str, password: str = DEFAULT_PASSWORD) -> dict:
+        response = client.post("/api/auth/login-json", json={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return do_login
+
+
+@pytest.fixture
+def admin_headers(create_user, login):
+    create_user("admin", is_admin=True)
+    return login("admin")
+
+
+@pytest.fixture
+def create_dessert(client, admin_headers):
+    """Создать десерт через API (с индексацией для поиска)"""
+    def create(title: str, **fields) -> dict:
+        payload = {"title": title, "category": "Торты", **fields}
+        response = client.post("/api/desserts/", json=payload, headers=admin_headers)
+        assert response.status_code == 201, response.text
+        return response.json()
+    return create
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Проверка числа SQL запросов: with query_budget(3): client.get(...)
+
+    Очередь логов записывается до и после блока, запросы фоновой записи логов не считаются.
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        activity_log_writer.flush()
+        with check_query_budget(max_queries) as stats:
+            yield stats
+        activity_log_writer.flush()
+    return budget
@@ -0,0 +1,48 @@
+"""Роутеры на асинхронной сессии: десерты, пользователи, профиль, логи"""
+import asyncio
+
+import httpx
+import pytest
+
+import main
+
+
+def test_users_crud_through_async_session(client, admin_headers, create_user):
+    user = create_user("manager", company_name="Sweet Bakery")
+
+    listed = client.get("/api/users/", params={"search": "bakery"}, headers=admin_headers).json()
+    assert listed["total"] == 1 and listed["users"][0]["username"] == "manager"
+
+    updated = client.put(f"/api/users/{user.id}", json={"is_moderator": True}, headers=admin_headers)
+    assert updated.status_code == 200 and updated.json()["is_moderator"] is True
+
+    assert client.delete(f"/api/users/{user.id}", headers=admin_headers).status_code == 204
+    assert client.get(f"/api/users/{user.id}", headers=admin_headers).status_code == 404
+
+
+def test_dessert_crud_through_async_session(client, admin_headers, create_dessert):
+    dessert = create_dessert("Эклер", price=90)
+
+    response = client.put(f"/api/desserts/{dessert['id']}", json={"price": 95}, headers=admin_headers)
+    assert response.json()["price"] == 95
+
+    assert client.delete(f"/api/desserts/{dessert['id']}", headers=admin_headers).status_code == 204
+    assert client.get(f"/api/desserts/{dessert['id']}").status_code == 404
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_share_the_event_loop(client, create_dessert):
+    for i in range(5):
+        create_dessert(f"Десерт {i}")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(async_client.get("/api/desserts/") for _ in range(20)))
+
+    assert {response.status_code for response in responses} == {200}
+    assert {len(response.json()) for response in responses} == {5}
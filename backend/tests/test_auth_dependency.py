@@ -0,0 +1,56 @@
+"""Зависимость аутентификации не блокирует event loop"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app.auth
+import main
+from app.auth import create_access_token
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_me_returns_current_user(client, create_user, login):
+    create_user("manager")
+
+    response = client.get("/api/auth/me", headers=login("manager"))
+
+    assert response.status_code == 200
+    assert response.json()["username"] == "manager"
+
+
+@pytest.mark.parametrize("token", ["not-a-jwt", create_access_token({"sub": "ghost"})])
+def test_invalid_token_or_unknown_user_is_401(client, token):
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_slow_user_lookup_does_not_delay_other_requests(client, create_user, monkeypatch):
+    create_user("manager")
+    load_user = app.auth.get_user_by_username_async
+
+    async def slow_load_user(db, username):
+        await asyncio.sleep(0.5)
+        return await load_user(db, username)
+
+    monkeypatch.setattr(app.auth, "get_user_by_username_async", slow_load_user)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'manager'})}"}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        me = asyncio.ensure_future(async_client.get("/api/auth/me", headers=headers))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        health = await async_client.get("/health")
+        health_seconds = time.perf_counter() - started
+        assert (await me).status_code == 200
+
+    assert health.status_code == 200
+    assert health_seconds < 0.3
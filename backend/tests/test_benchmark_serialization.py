@@ -0,0 +1,20 @@
+"""Бенчмарк сериализации работает с текущей схемой журнала"""
+import json
+
+import benchmark_serialization
+from app.models import ActivityLog, Dessert
+from app.schemas import ActivityLogResponse, DessertResponse
+
+
+def test_seeded_rows_serialize_the_same_on_both_paths(db):
+    benchmark_serialization.seed(db, 3)
+
+    for model_cls, schema in ((Dessert, DessertResponse), (ActivityLog, ActivityLogResponse)):
+        old = json.loads(benchmark_serialization.before(db, model_cls, schema))
+        new = json.loads(benchmark_serialization.after(db, model_cls, schema))
+        assert len(old) == 3
+        assert sorted(old, key=lambda item: item["id"]) == sorted(new, key=lambda item: item["id"])
+
+    log = json.loads(benchmark_serialization.after(db, ActivityLog, ActivityLogResponse))[0]
+    assert log["new_values"] == {"price": 350}
+    assert log["ip_address"] == "127.0.0.1"
@@ -0,0 +1,82 @@
+"""Массовое обновление и удаление десертов"""
+from app.config import BULK_LOG_MAX_IDS
+from app.log_writer import activity_log_writer
+from app.models import ActivityLog, Dessert
+
+
+def import_desserts(client, headers, count: int, category: str = "Сезонные") -> None:
+    content = "title,category,price\n" + "".join(f"Десерт {i},{category},100\n" for i in range(count))
+    response = client.post(
+        "/api/desserts/import", files={"file": ("desserts.csv", content.encode())}, headers=headers
+    )
+    assert response.json()["imported"] == count
+
+
+def last_log(db, action: str) -> ActivityLog:
+    activity_log_writer.flush()
+    return db.query(ActivityLog).filter(ActivityLog.action == action).one()
+
+
+def test_bulk_update_by_filter_logs_each_dessert(client, admin_headers, db):
+    import_desserts(client, admin_headers, BULK_LOG_MAX_IDS + 20)
+    import_desserts(client, admin_headers, 3, category="Торты")
+
+    response = client.put(
+        "/api/desserts/bulk", json={"category": "Сезонные", "changes": {"price": 120}}, headers=admin_headers
+    )
+
+    assert response.json() == {"matched": BULK_LOG_MAX_IDS + 20, "affected": BULK_LOG_MAX_IDS + 20}
+    updated_ids = {dessert.id for dessert in db.query(Dessert).filter(Dessert.price == 120)}
+    assert len(updated_ids) == BULK_LOG_MAX_IDS + 20
+    activity_log_writer.flush()
+    logs = db.query(ActivityLog).filter(ActivityLog.action == "dessert_bulk_update").all()
+    assert {log.entity_id for log in logs} == updated_ids
+    assert all(log.old_values == {"price": 100.0} and log.new_values == {"price": 120} for log in logs)
+
+
+def test_bulk_price_change_is_found_by_changed_field(client, admin_headers, create_dessert):
+    cake = create_dessert("Наполеон", category="Сезонные", price=100)
+    create_dessert("Эклер", category="Пирожные", price=100)
+    client.put("/api/desserts/bulk", json={"category": "Сезонные", "changes": {"price": 150}}, headers=admin_headers)
+    activity_log_writer.flush()
+
+    found = client.get(
+        "/api/logs/", params={"changed_field": "price", "action": "dessert_bulk_update"}, headers=admin_headers
+    ).json()["logs"]
+    by_entity = client.get(
+        "/api/logs/", params={"changed_field": "price", "entity_id": cake["id"]}, headers=admin_headers
+    ).json()["logs"]
+
+    assert [(log["entity_id"], log["new_values"]) for log in found] == [(cake["id"], {"price": 150})]
+    assert [log["action"] for log in by_entity] == ["dessert_bulk_update"]
+
+
+def test_bulk_update_reindexes_rows_leaving_the_filter(client, admin_headers, create_dessert):
+    create_dessert("Тирамису", category="Сезонные")
+
+    client.put(
+        "/api/desserts/bulk", json={"is_active": True, "changes": {"is_active": False}}, headers=admin_headers
+    )
+
+    found = client.get("/api/desserts/", params={"search": "тирамису", "fuzzy": True, "is_active": False}).json()
+    assert [item["title"] for item in found] == ["Тирамису"]
+
+
+def test_bulk_delete_by_filter(client, admin_headers, create_dessert, db):
+    kept = create_dessert("Наполеон", category="Торты")
+    create_dessert("Эклер", category="Пирожные")
+    create_dessert("Макарон", category="Пирожные")
+
+    response = client.post("/api/desserts/bulk/delete", json={"category": "Пирожные"}, headers=admin_headers)
+
+    assert response.json() == {"matched": 2, "affected": 2}
+    assert [d["id"] for d in client.get("/api/desserts/").json()] == [kept["id"]]
+    log = last_log(db, "dessert_bulk_delete")
+    assert log.new_values == {"count": 2}
+    assert sorted(value["title"] for value in log.old_values.values()) == ["Макарон", "Эклер"]
+
+
+def test_bulk_operation_requires_selection(client, admin_headers):
+    response = client.post("/api/desserts/bulk/delete", json={}, headers=admin_headers)
+
+    assert response.status_code == 400
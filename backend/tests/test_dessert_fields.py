@@ -0,0 +1,35 @@
+"""Выборка полей десертов (параметр fields)"""
+
+
+def test_list_returns_only_requested_fields(client, create_dessert):
+    create_dessert("Тирамису", description="Длинное описание " * 20, price=250)
+
+    response = client.get("/api/desserts/", params={"fields": "title,price"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": response.json()[0]["id"], "title": "Тирамису", "price": 250}]
+
+
+def test_list_without_fields_returns_full_objects(client, create_dessert):
+    create_dessert("Наполеон", description="Слоеный торт")
+
+    item = client.get("/api/desserts/").json()[0]
+
+    assert item["description"] == "Слоеный торт"
+    assert {"id", "title", "category", "image_url", "is_active"} <= item.keys()
+
+
+def test_detail_returns_only_requested_fields(client, create_dessert):
+    dessert = create_dessert("Чизкейк", price=300)
+
+    response = client.get(f"/api/desserts/{dessert['id']}", params={"fields": "category"})
+
+    assert response.status_code == 200
+    assert response.json() == {"id": dessert["id"], "category": "Торты"}
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get("/api/desserts/", params={"fields": "title,password"})
+
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
@@ -0,0 +1,54 @@
+"""Потоковый импорт и экспорт десертов (CSV / NDJSON)"""
+import json
+
+
+def upload(client, headers, name: str, content: bytes):
+    return client.post("/api/desserts/import", files={"file": (name, content)}, headers=headers)
+
+
+def test_csv_import_reports_invalid_rows(client, admin_headers):
+    content = "title,category,price\nТирамису,Торты,250\n,Торты,100\nЭклер,Пирожные,90\n".encode()
+
+    response = upload(client, admin_headers, "desserts.csv", content)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["imported"] == 2
+    assert body["error_count"] == 1
+    assert body["errors"][0]["line"] == 3
+
+
+def test_ndjson_import_then_export_round_trip(client, admin_headers):
+    lines = [{"title": "Макарон", "category": "Пирожные", "price": 60}, {"title": "Наполеон", "category": "Торты"}]
+    content = "\n".join(json.dumps(line, ensure_ascii=False) for line in lines).encode()
+    assert upload(client, admin_headers, "desserts.ndjson", content).json()["imported"] == 2
+
+    response = client.get("/api/desserts/export", params={"format": "ndjson"}, headers=admin_headers)
+
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["title"] for item in exported] == ["Макарон", "Наполеон"]
+
+
+def test_non_utf8_file_is_reported_not_500(client, admin_headers):
+    content = "title,category\nТирамису,Торты\n".encode("cp1251")
+
+    response = upload(client, admin_headers, "desserts.csv", content)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["imported"] == 0
+    assert "UTF-8" in body["errors"][-1]["error"]
+
+
+def test_broken_csv_keeps_rows_read_before_the_error(client, admin_headers):
+    # Незакрытая кавычка растягивает поле до конца файла и превышает предел размера поля
+    content = ("title,category\nТирамису,Торты\n\"Эклер,Пирожные\n" + "x" * 200_000 + "\n").encode()
+
+    response = upload(client, admin_headers, "desserts.csv", content)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["imported"] == 1
+    assert body["errors"][-1]["error"].startswith("Invalid CSV")
+    assert [d["title"] for d in client.get("/api/desserts/").json()] == ["Тирамису"]
@@ -0,0 +1,34 @@
+"""Нечеткий поиск десертов по триграммному индексу"""
+from app.search import TrigramIndex
+
+
+def test_index_finds_word_with_typo():
+    index = TrigramIndex(threshold=0.3)
+    index.upsert(1, "Тирамису", "Торты", "маскарпоне, кофе", True)
+    index.upsert(2, "Наполеон", "Торты", "слоеное тесто", True)
+
+    assert [doc_id for doc_id, _ in index.search("тирамиссу")] == [1]
+    assert [doc_id for doc_id, _ in index.search("маскарпон")] == [1]
+
+
+def test_index_filters_inactive_and_removed_documents():
+    index = TrigramIndex(threshold=0.3)
+    index.upsert(1, "Эклер", "Пирожные", None, False)
+    index.upsert(2, "Эклер шоколадный", "Пирожные", None, True)
+    index.remove(2)
+
+    assert index.search("эклер", is_active=True) == []
+    assert [doc_id for doc_id, _ in index.search("эклер", is_active=False)] == [1]
+
+
+def test_fuzzy_list_is_ranked_and_follows_updates(client, create_dessert, admin_headers):
+    cheesecake = create_dessert("Чизкейк", category="Торты")
+    create_dessert("Чизкейк Нью-Йорк", category="Торты")
+    create_dessert("Наполеон", category="Торты")
+
+    found = client.get("/api/desserts/", params={"search": "чизкеик", "fuzzy": True}).json()
+    assert [d["title"] for d in found] == ["Чизкейк", "Чизкейк Нью-Йорк"]
+
+    client.put(f"/api/desserts/{cheesecake['id']}", json={"title": "Медовик"}, headers=admin_headers)
+    found = client.get("/api/desserts/", params={"search": "медовек", "fuzzy": True}).json()
+    assert [d["id"] for d in found] == [cheesecake["id"]]
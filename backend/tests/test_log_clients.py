@@ -0,0 +1,67 @@
+"""Справочники IP адресов и User-Agent журнала"""
+from app.log_clients import LookupCache, intern_log_clients, lookup_caches
+from app.log_writer import activity_log_writer
+from app.logger import log_activity
+from app.models import ActivityLog, LogIpAddress, LogUserAgent
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0"
+
+
+def test_repeated_clients_share_lookup_rows(db):
+    for _ in range(3):
+        log_activity(db, "login", ip_address="10.0.0.1", user_agent=USER_AGENT, commit=False)
+    log_activity(db, "login", ip_address="10.0.0.2", user_agent=USER_AGENT, commit=False)
+    db.commit()
+
+    assert db.query(LogIpAddress).count() == 2
+    assert db.query(LogUserAgent).count() == 1
+    logs = db.query(ActivityLog).order_by(ActivityLog.id).all()
+    assert [log.ip_address for log in logs] == ["10.0.0.1"] * 3 + ["10.0.0.2"]
+    assert {log.user_agent for log in logs} == {USER_AGENT}
+    assert len({log.user_agent_id for log in logs}) == 1
+
+
+def test_api_log_exposes_client_values(client, admin_headers):
+    activity_log_writer.flush()
+
+    response = client.get("/api/logs/", params={"action": "login"}, headers=admin_headers)
+
+    log = response.json()["logs"][0]
+    assert log["ip_address"] == "testclient"
+    assert log["user_agent"] == "testclient"
+
+
+def test_rolled_back_lookup_is_not_cached(db):
+    entry = {"ip_address": "10.0.0.9", "user_agent": None}
+    intern_log_clients(db, [entry])
+    db.rollback()
+
+    assert lookup_caches["ip_address"].get("10.0.0.9") is None
+    assert db.query(LogIpAddress).count() == 0
+
+    entry = {"ip_address": "10.0.0.9", "user_agent": None}
+    intern_log_clients(db, [entry])
+    db.commit()
+    assert lookup_caches["ip_address"].get("10.0.0.9") == entry["ip_address_id"]
+    assert entry["user_agent_id"] is None
+
+
+def test_long_user_agent_is_truncated(db):
+    long_agent = "A" * 2000
+    log_activity(db, "login", user_agent=long_agent, commit=False)
+    db.commit()
+
+    stored = db.query(LogUserAgent).one().value
+    assert long_agent.startswith(stored)
+    assert len(stored) == LogUserAgent.value.type.length
+
+
+def test_lookup_cache_evicts_least_recently_used():
+    cache = LookupCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
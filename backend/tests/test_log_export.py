@@ -0,0 +1,57 @@
+"""Потоковый экспорт журнала в NDJSON/CSV"""
+import csv
+import io
+import json
+
+from app.log_writer import activity_log_writer
+from app.logger import log_activity
+
+
+def add_logs(db, user) -> None:
+    log_activity(db, "dessert_update", user=user, entity_type="dessert", entity_id=1,
+                 description="Цена изменена", old_values={"price": 100}, new_values={"price": 120}, commit=False)
+    log_activity(db, "dessert_delete", user=user, entity_type="dessert", entity_id=2, commit=False)
+    db.commit()
+    activity_log_writer.flush()
+
+
+def test_ndjson_export_streams_filtered_logs_in_order(client, admin_headers, db, create_user):
+    add_logs(db, create_user("editor"))
+
+    response = client.get("/api/logs/export", params={"format": "ndjson", "entity_type": "dessert"}, headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "activity_logs.ndjson" in response.headers["content-disposition"]
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["action"] for record in records] == ["dessert_update", "dessert_delete"]
+    assert records[0]["description"] == "Цена изменена"
+    assert records[0]["new_values"] == {"price": 120}
+    assert records[0]["username"] == "editor"
+
+
+def test_csv_export_has_header_and_rows(client, admin_headers, db, create_user):
+    add_logs(db, create_user("editor"))
+
+    response = client.get("/api/logs/export", params={"format": "csv", "action": "dessert_delete"}, headers=admin_headers)
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["action"], row["entity_id"]) for row in rows] == [("dessert_delete", "2")]
+
+
+def test_empty_csv_export_still_has_header(client, admin_headers):
+    response = client.get("/api/logs/export", params={"format": "csv", "action": "missing"}, headers=admin_headers)
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 1
+    assert "action" in lines[0].split(",")
+
+
+def test_export_requires_admin(client, create_user, login):
+    create_user("viewer")
+
+    response = client.get("/api/logs/export", headers=login("viewer"))
+
+    assert response.status_code == 403
@@ -0,0 +1,42 @@
+"""Курсорная пагинация журнала"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.log_writer import activity_log_writer
+from app.models import ActivityLog
+
+
+def fetch_all_pages(client, headers, limit: int) -> list:
+    ids, cursor = [], None
+    for _ in range(20):
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/logs/", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids.extend(log["id"] for log in body["logs"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+    raise AssertionError(f"pagination does not end: {ids}")
+
+
+def test_cursor_pages_across_same_second_rows(client, admin_headers, db):
+    activity_log_writer.flush()
+    # Строки со значением по умолчанию CURRENT_TIMESTAMP записаны без микросекунд
+    for _ in range(3):
+        db.execute(text("INSERT INTO activity_logs (action, created_at) VALUES ('legacy', '2024-01-01 10:00:00')"))
+    db.add(ActivityLog(action="precise", created_at=datetime(2024, 1, 1, 10, 0, 0, 500)))
+    db.add(ActivityLog(action="older", created_at=datetime(2024, 1, 1, 9, 59, 59)))
+    db.commit()
+
+    expected = [log.id for log in db.query(ActivityLog).order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())]
+    assert len(expected) == 6
+
+    assert fetch_all_pages(client, admin_headers, limit=2) == expected
+    assert fetch_all_pages(client, admin_headers, limit=1) == expected
+
+
+def test_invalid_cursor_is_rejected(client, admin_headers):
+    response = client.get("/api/logs/", params={"cursor": "not-a-cursor"}, headers=admin_headers)
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+"""Архивирование логов активности старше срока хранения"""
+from datetime import datetime
+import gzip
+import json
+
+from app.log_retention import add_months, archive_logs, ensure_log_partitions
+from app.models import ActivityLog
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+def add_log(db, created_at: datetime, action: str = "login") -> None:
+    db.add(ActivityLog(action=action, username="admin", created_at=created_at))
+    db.commit()
+
+
+def test_old_logs_are_archived_by_month_and_deleted(db, tmp_path):
+    add_log(db, datetime(2024, 1, 10), "jan")
+    add_log(db, datetime(2024, 2, 20), "feb")
+    add_log(db, datetime(2024, 6, 1), "recent")
+
+    result = archive_logs(db, retention_days=90, archive_dir=tmp_path, now=NOW)
+
+    assert result == {"archived": 2, "deleted": 2, "dropped_partitions": 0}
+    assert [log.action for log in db.query(ActivityLog)] == ["recent"]
+    with gzip.open(tmp_path / "activity_logs-2024-01.ndjson.gz") as archive:
+        assert [json.loads(line)["action"] for line in archive] == ["jan"]
+    assert (tmp_path / "activity_logs-2024-02.ndjson.gz").exists()
+
+
+def test_repeated_runs_append_to_the_month_archive(db, tmp_path):
+    add_log(db, datetime(2024, 1, 10), "first")
+    archive_logs(db, retention_days=90, archive_dir=tmp_path, now=NOW)
+    add_log(db, datetime(2024, 1, 11), "second")
+    archive_logs(db, retention_days=90, archive_dir=tmp_path, now=NOW)
+
+    with gzip.open(tmp_path / "activity_logs-2024-01.ndjson.gz") as archive:
+        assert [json.loads(line)["action"] for line in archive] == ["first", "second"]
+
+
+def test_zero_retention_keeps_everything(db, tmp_path):
+    add_log(db, datetime(2020, 1, 1))
+
+    assert archive_logs(db, retention_days=0, archive_dir=tmp_path, now=NOW)["archived"] == 0
+    assert db.query(ActivityLog).count() == 1
+
+
+def test_partitions_are_not_created_without_postgresql(db):
+    assert ensure_log_partitions(db, months_ahead=2, now=NOW) == []
+    assert add_months(datetime(2024, 11, 1), 3) == datetime(2025, 2, 1)
@@ -0,0 +1,68 @@
+"""Дневные сводки журнала и статистика по ним"""
+from datetime import date, datetime, timedelta
+
+from app.log_rollups import rebuild_log_rollups
+from app.log_writer import activity_log_writer
+from app.logger import log_activity
+from app.models import ActivityLog, ActivityLogDailyStat
+
+
+def rollup_counts(db) -> dict:
+    return {
+        (row.day, row.dimension, row.key): row.count
+        for row in db.query(ActivityLogDailyStat)
+    }
+
+
+def test_log_in_caller_transaction_updates_rollups(db, create_user):
+    user = create_user("writer")
+
+    log_activity(db, "dessert_create", user=user, entity_type="dessert", commit=False)
+    log_activity(db, "dessert_create", user=user, entity_type="dessert", commit=False)
+    db.commit()
+
+    today = datetime.utcnow().date()
+    counts = rollup_counts(db)
+    assert counts[(today, "action", "dessert_create")] == 2
+    assert counts[(today, "entity_type", "dessert")] == 2
+    assert counts[(today, "username", "writer")] == 2
+
+
+def test_rebuild_matches_incremental_rollups_and_keeps_archived_days(db, create_user):
+    user = create_user("writer")
+    for action in ("login", "login", "dessert_update"):
+        log_activity(db, action, user=user, entity_type="user", commit=False)
+    # Сводка за день, логи которого уже архивированы
+    archived_day = date(2020, 1, 1)
+    db.add(ActivityLogDailyStat(day=archived_day, dimension="action", key="login", count=5))
+    db.commit()
+    incremental = rollup_counts(db)
+
+    db.query(ActivityLogDailyStat).filter(ActivityLogDailyStat.day != archived_day).delete()
+    db.commit()
+    rebuilt_rows = rebuild_log_rollups(db)
+
+    assert rebuilt_rows == 4
+    assert rollup_counts(db) == incremental
+
+
+def test_summary_is_served_from_rollups(client, admin_headers, db, create_user):
+    user = create_user("editor")
+    for _ in range(3):
+        log_activity(db, "dessert_update", user=user, entity_type="dessert", commit=False)
+    db.add(ActivityLogDailyStat(
+        day=datetime.utcnow().date() - timedelta(days=30), dimension="action", key="old_action", count=9
+    ))
+    db.commit()
+    activity_log_writer.flush()
+
+    response = client.get("/api/logs/stats/summary", params={"days": 7}, headers=admin_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    # Вход администратора через фикстуру тоже попадает в журнал
+    assert body["total_logs"] == db.query(ActivityLog).count() == 4
+    assert body["actions"]["dessert_update"] == 3
+    assert "old_action" not in body["actions"]
+    assert body["entities"]["dessert"] == 3
+    assert body["top_users"][0] == {"username": "editor", "count": 3}
@@ -0,0 +1,67 @@
+"""Поиск по журналу: полнотекстовый по описанию и по началу имени пользователя"""
+from sqlalchemy import select
+
+from app.log_search import UsernamePrefix
+from app.log_writer import activity_log_writer
+from app.logger import log_activity
+from app.models import ActivityLog
+
+
+def add_log(db, create_user, username: str, description: str) -> None:
+    log_activity(db, "dessert_update", user=create_user(username), description=description, commit=False)
+    db.commit()
+
+
+def search_logs(client, headers, **params) -> list:
+    activity_log_writer.flush()
+    response = client.get("/api/logs/", params={"action": "dessert_update", **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return sorted(log["description"] for log in response.json()["logs"])
+
+
+def test_description_words_match_as_prefixes(client, admin_headers, db, create_user):
+    add_log(db, create_user, "editor", "Цена десерта изменена")
+    add_log(db, create_user, "manager", "Обновлено описание десерта")
+    add_log(db, create_user, "baker", "Price changed")
+
+    assert search_logs(client, admin_headers, search="десерт") == ["Обновлено описание десерта", "Цена десерта изменена"]
+    assert search_logs(client, admin_headers, search="ЦЕН дес") == ["Цена десерта изменена"]
+    assert search_logs(client, admin_headers, search="price chang") == ["Price changed"]
+    assert search_logs(client, admin_headers, search="цена price") == []
+
+
+def test_description_search_without_words_is_substring(client, admin_headers, db, create_user):
+    add_log(db, create_user, "editor", "Скидка 50%!")
+    add_log(db, create_user, "manager", "Без скидки")
+
+    assert search_logs(client, admin_headers, search="%!") == ["Скидка 50%!"]
+
+
+def test_username_prefix_is_case_insensitive_and_literal(client, admin_headers, db, create_user):
+    add_log(db, create_user, "Anna", "first")
+    add_log(db, create_user, "annette", "second")
+    add_log(db, create_user, "an_other", "third")
+    add_log(db, create_user, "bob", "fourth")
+
+    assert search_logs(client, admin_headers, username="ANN") == ["first", "second"]
+    assert search_logs(client, admin_headers, username="an_") == ["third"]
+    assert search_logs(client, admin_headers, username="b") == ["fourth"]
+
+
+def test_username_prefix_finds_cyrillic_names(client, admin_headers, db, create_user):
+    add_log(db, create_user, "Иван", "first")
+    add_log(db, create_user, "Ивонна", "second")
+    add_log(db, create_user, "Пётр", "third")
+
+    assert search_logs(client, admin_headers, username="Ив") == ["first", "second"]
+    assert search_logs(client, admin_headers, username="Иван") == ["first"]
+    assert search_logs(client, admin_headers, username="Пётр") == ["third"]
+
+
+def test_username_prefix_uses_the_lower_username_index(db):
+    query = select(ActivityLog.id).where(UsernamePrefix("Ив"))
+
+    compiled = query.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+
+    assert "ix_activity_logs_username_lower" in " ".join(str(row) for row in plan)
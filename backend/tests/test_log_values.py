@@ -0,0 +1,58 @@
+"""Значения логов в JSON и фильтр changed_field"""
+import pytest
+from sqlalchemy import select
+
+from app.log_search import ValueChanged
+from app.log_writer import activity_log_writer
+from app.logger import log_activity
+from app.models import ActivityLog
+
+
+def add_change(db, description: str, old_values, new_values) -> None:
+    log_activity(db, "dessert_update", description=description, old_values=old_values, new_values=new_values, commit=False)
+    db.commit()
+
+
+def changed_logs(client, headers, field: str) -> list:
+    activity_log_writer.flush()
+    response = client.get("/api/logs/", params={"action": "dessert_update", "changed_field": field}, headers=headers)
+    assert response.status_code == 200, response.text
+    return sorted(log["description"] for log in response.json()["logs"])
+
+
+def test_values_round_trip_as_json(client, admin_headers, db):
+    add_change(db, "nested", {"price": 100, "tags": ["a"]}, {"price": 120.5, "tags": ["a", "b"], "meta": {"x": None}})
+    activity_log_writer.flush()
+
+    logs = client.get("/api/logs/", params={"action": "dessert_update"}, headers=admin_headers).json()["logs"]
+
+    assert logs[0]["old_values"] == {"price": 100, "tags": ["a"]}
+    assert logs[0]["new_values"] == {"price": 120.5, "tags": ["a", "b"], "meta": {"x": None}}
+
+
+def test_changed_field_filter(client, admin_headers, db):
+    add_change(db, "price changed", {"price": 100, "title": "A"}, {"price": 120, "title": "A"})
+    add_change(db, "title changed", {"price": 100, "title": "A"}, {"price": 100, "title": "B"})
+    add_change(db, "price set", None, {"price": 90})
+    add_change(db, "price removed", {"price": 90}, None)
+    add_change(db, "no values", None, None)
+
+    assert changed_logs(client, admin_headers, "price") == ["price changed", "price removed", "price set"]
+    assert changed_logs(client, admin_headers, "title") == ["title changed"]
+    assert changed_logs(client, admin_headers, "weight") == []
+
+
+def test_changed_field_name_is_validated(client, admin_headers):
+    response = client.get("/api/logs/", params={"changed_field": "price') OR 1=1 --"}, headers=admin_headers)
+
+    assert response.status_code == 422
+    with pytest.raises(ValueError):
+        ValueChanged("price'")
+
+
+def test_indexed_field_uses_partial_index(db):
+    query = select(ActivityLog.id).where(ValueChanged("price")).order_by(ActivityLog.created_at.desc())
+
+    plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {query.compile(db.get_bind())}").all()
+
+    assert "ix_activity_logs_changed_price" in " ".join(str(row) for row in plan)
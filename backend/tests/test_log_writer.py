@@ -0,0 +1,66 @@
+"""Фоновая запись логов активности пачками"""
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.log_writer import ActivityLogWriter, activity_log_writer
+from app.models import ActivityLog, ActivityLogDailyStat
+
+
+def entry(action: str = "dessert_update", **fields) -> dict:
+    return {"action": action, "username": "admin", "entity_type": "dessert", "created_at": datetime.utcnow(), **fields}
+
+
+def test_entries_are_written_in_batches_with_rollups(db):
+    writer = ActivityLogWriter(SessionLocal, batch_size=3, flush_interval=0.05)
+    writer.start()
+    for _ in range(7):
+        writer.submit(entry(ip_address="10.0.0.1"))
+    writer.flush()
+    writer.stop()
+
+    assert writer.snapshot()["written"] == 7
+    assert writer.batches >= 3
+    assert db.query(ActivityLog).count() == 7
+    assert {log.ip_address for log in db.query(ActivityLog)} == {"10.0.0.1"}
+    rollup = db.query(ActivityLogDailyStat).filter_by(dimension="action", key="dessert_update").one()
+    assert rollup.count == 7
+
+
+def test_full_queue_drops_entries_without_blocking():
+    writer = ActivityLogWriter(SessionLocal, max_queue=2)
+
+    results = [writer.submit(entry()) for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert writer.snapshot()["dropped"] == 1
+
+
+def test_stop_writes_queued_entries(db):
+    writer = ActivityLogWriter(SessionLocal, batch_size=100, flush_interval=10)
+    writer.start()
+    writer.submit(entry("login"))
+    writer.stop()
+
+    assert db.query(ActivityLog).filter_by(action="login").count() == 1
+
+
+def test_failed_batch_is_counted_and_writer_keeps_running(db):
+    writer = ActivityLogWriter(SessionLocal, flush_interval=0.01)
+    writer.start()
+    writer.submit(entry(action=None))
+    writer.flush()
+    writer.submit(entry("login"))
+    writer.flush()
+    writer.stop()
+
+    assert writer.failed == 1
+    assert db.query(ActivityLog).filter_by(action="login").count() == 1
+
+
+def test_api_actions_are_logged_through_the_writer(client, create_dessert, admin_headers):
+    create_dessert("Эклер")
+    activity_log_writer.flush()
+
+    logs = client.get("/api/logs/", params={"action": "dessert_create"}, headers=admin_headers)
+
+    assert [item["action"] for item in logs.json()["logs"]] == ["dessert_create"]
@@ -0,0 +1,102 @@
+"""Ограничение частоты попыток входа"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import app.ratelimit
+from app.config import LOGIN_RATE_LIMIT_PER_USERNAME
+from app.ratelimit import LoginRateLimiter, MemoryRateLimitBackend
+
+
+def attempt(limiter: LoginRateLimiter, ip: str, username: str = "admin") -> int:
+    try:
+        asyncio.run(limiter.check(ip, username))
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_rejected_attempts_do_not_extend_the_block():
+    limiter = LoginRateLimiter(MemoryRateLimitBackend(), window=1, per_ip=2, per_username=0)
+    assert [attempt(limiter, "10.0.0.1") for _ in range(2)] == [200, 200]
+
+    deadline = time.monotonic() + 1.2
+    while time.monotonic() < deadline:
+        if attempt(limiter, "10.0.0.1") == 200:
+            break
+        time.sleep(0.05)
+
+    assert time.monotonic() < deadline, "client stayed blocked while retrying"
+
+
+def test_other_ip_cannot_lock_out_a_username():
+    limiter = LoginRateLimiter(MemoryRateLimitBackend(), window=60, per_ip=0, per_username=3, per_username_total=10)
+
+    assert [attempt(limiter, "10.0.0.66") for _ in range(4)] == [200, 200, 200, 429]
+    assert attempt(limiter, "10.0.0.1") == 200
+
+
+def test_flood_from_one_ip_does_not_fill_the_total_username_window():
+    limiter = LoginRateLimiter(MemoryRateLimitBackend(), window=60, per_ip=20, per_username=5, per_username_total=100)
+
+    results = [attempt(limiter, "10.0.0.1", "victim") for _ in range(150)]
+
+    assert results.count(429) == 145
+    assert attempt(limiter, "10.0.0.2", "victim") == 200
+
+
+def test_rejected_attempt_is_not_recorded_in_any_window():
+    backend = MemoryRateLimitBackend()
+
+    assert asyncio.run(backend.hit_all([("a", 1), ("b", 5)], 60))[0][0] == 1
+    results = asyncio.run(backend.hit_all([("a", 1), ("b", 5)], 60))
+
+    assert [count for count, _ in results] == [2, 2]
+    assert asyncio.run(backend.hit("b", 60, 5))[0] == 2
+
+
+def test_total_username_limit_stops_distributed_guessing():
+    limiter = LoginRateLimiter(MemoryRateLimitBackend(), window=60, per_ip=0, per_username=3, per_username_total=5)
+
+    results = [attempt(limiter, f"10.0.0.{i}") for i in range(6)]
+
+    assert results == [200] * 5 + [429]
+
+
+def test_daily_counters_expire(monkeypatch):
+    backend = MemoryRateLimitBackend()
+    monkeypatch.setattr(app.ratelimit, "COUNTER_TTL", -1)
+    asyncio.run(backend.incr("login_throttled:2024-01-01"))
+    asyncio.run(backend.incr("login_throttled:2024-01-02"))
+
+    assert asyncio.run(backend.get_counters(["login_throttled:2024-01-01", "login_throttled:2024-01-02"])) == [0, 1]
+
+
+def test_login_endpoint_throttles_and_counts_rejections(client, create_user, admin_headers):
+    create_user("manager")
+    for _ in range(LOGIN_RATE_LIMIT_PER_USERNAME):
+        response = client.post("/api/auth/login-json", json={"username": "manager", "password": "wrong"})
+        assert response.status_code == 401
+
+    response = client.post("/api/auth/login-json", json={"username": "manager", "password": "secret1"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    summary = client.get("/api/logs/stats/summary", headers=admin_headers).json()
+    assert summary["throttled_logins"] == 1
+
+
+def test_login_flood_from_one_ip_does_not_lock_out_other_ips(client, create_user, monkeypatch):
+    create_user("victim")
+    # Адрес клиента берется из тестового заголовка
+    monkeypatch.setattr(app.ratelimit, "get_client_ip", lambda request: request.headers["X-Test-Ip"])
+    for _ in range(150):
+        client.post("/api/auth/login-json", json={"username": "victim", "password": "wrong"},
+                    headers={"X-Test-Ip": "10.0.0.1"})
+
+    response = client.post("/api/auth/login-json", json={"username": "victim", "password": "secret1"},
+                           headers={"X-Test-Ip": "10.0.0.2"})
+
+    assert response.status_code == 200
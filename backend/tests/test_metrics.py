@@ -0,0 +1,71 @@
+"""Метрики Prometheus: доступ к /metrics и содержимое"""
+import re
+
+from app.api import metrics as metrics_api
+from app.metrics import Histogram
+
+
+def metric_value(text: str, name: str, **labels) -> float:
+    """Значение ряда с заданными метками (порядок меток - как в выводе)"""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = "^" + re.escape(f"{name}{{{label_text}}}" if labels else name) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    assert match, f"{name} {labels} not found"
+    return float(match.group(1))
+
+
+def test_metrics_require_admin_or_metrics_token(client, create_user, login, monkeypatch):
+    create_user("viewer")
+    monkeypatch.setattr(metrics_api, "METRICS_TOKEN", "scrape-token")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=login("viewer")).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong-token"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+
+def test_requests_are_labelled_by_route_template(client, admin_headers, create_dessert):
+    dessert = create_dessert("Наполеон")
+    client.get(f"/api/desserts/{dessert['id']}")
+    client.get("/api/desserts/999999")
+    client.get("/no-such-page")
+
+    text = client.get("/metrics", headers=admin_headers).text
+
+    route = "/api/desserts/{dessert_id}"
+    assert metric_value(text, "http_requests_total", method="GET", route=route, status=200) >= 1
+    assert metric_value(text, "http_requests_total", method="GET", route=route, status=404) >= 1
+    assert metric_value(text, "http_requests_total", method="GET", route="<unmatched>", status=404) >= 1
+    assert f"/api/desserts/{dessert['id']}\"" not in text
+    count = metric_value(text, "http_request_duration_seconds_count", method="GET", route=route)
+    assert metric_value(text, "http_request_duration_seconds_bucket", method="GET", route=route, le="+Inf") == count
+    # Текущий запрос к /metrics еще выполняется
+    assert metric_value(text, "http_requests_in_progress", method="GET") >= 1
+
+
+def test_process_metrics_are_exposed(client, admin_headers):
+    text = client.get("/metrics", headers=admin_headers).text
+
+    for name in (
+        "threadpool_threads_limit",
+        "pdf_jobs_in_progress",
+        "activity_log_writer_running",
+        "password_hash_pending",
+        "login_throttled_today",
+    ):
+        assert re.search(rf"^{name} \S+$", text, re.MULTILINE), name
+    assert 'db_pool_checkout_seconds_count{pool="sync"}' in text
+    assert metric_value(text, "activity_log_writer_running") == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [1, 3]
+    assert histogram.count == 4
+    assert round(histogram.sum, 6) == 6.05
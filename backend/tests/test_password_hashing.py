@@ -0,0 +1,48 @@
+"""Хеширование паролей в пуле процессов"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import BCRYPT_ROUNDS
+from app.models import User
+from app.passwords import PasswordHasher, hash_password, hash_rounds
+
+
+def test_register_and_login_use_configured_cost(client, db):
+    response = client.post(
+        "/api/auth/register", json={"username": "newbie", "email": "newbie@example.com", "password": "secret1"}
+    )
+    assert response.status_code == 201
+
+    assert hash_rounds(db.query(User).filter_by(username="newbie").one().hashed_password) == BCRYPT_ROUNDS
+    assert client.post("/api/auth/login-json", json={"username": "newbie", "password": "secret1"}).status_code == 200
+    assert client.post("/api/auth/login-json", json={"username": "newbie", "password": "wrong"}).status_code == 401
+
+
+def test_login_rehashes_password_with_old_cost(client, db, create_user):
+    user = create_user("veteran")
+    db.query(User).filter_by(id=user.id).update({"hashed_password": hash_password("secret1", BCRYPT_ROUNDS + 1)})
+    db.commit()
+
+    assert client.post("/api/auth/login-json", json={"username": "veteran", "password": "secret1"}).status_code == 200
+
+    db.expire_all()
+    assert hash_rounds(db.query(User).filter_by(id=user.id).one().hashed_password) == BCRYPT_ROUNDS
+
+
+def test_full_queue_is_rejected_with_503():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(hasher.hash("secret1"))
+
+    assert error.value.status_code == 503
+    assert hasher.metrics.rejected == 1
+
+
+def test_admin_sees_hashing_metrics(client, admin_headers):
+    response = client.get("/api/auth/admin/password-hashing", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json()["rounds"] == BCRYPT_ROUNDS
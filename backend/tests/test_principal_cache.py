@@ -0,0 +1,47 @@
+"""Кеш аутентифицированных пользователей"""
+import time
+
+from app.models import User
+from app.principals import PrincipalCache, principal_cache
+
+
+def make_user(**fields) -> User:
+    return User(id=1, username="manager", email="m@example.com", hashed_password="-", is_active=True, **fields)
+
+
+def test_cached_user_is_a_fresh_copy():
+    cache = PrincipalCache(ttl=30)
+    cache.put("manager", cache.version("manager"), make_user(company_name="A"))
+
+    first = cache.get("manager")
+    first.company_name = "changed"
+
+    assert cache.get("manager").company_name == "A"
+
+
+def test_entry_expires_after_ttl():
+    cache = PrincipalCache(ttl=0.05)
+    cache.put("manager", 0, make_user())
+    time.sleep(0.06)
+
+    assert cache.get("manager") is None
+
+
+def test_load_started_before_invalidation_is_not_cached():
+    cache = PrincipalCache(ttl=30)
+    version = cache.version("manager")
+    cache.invalidate("manager")
+    cache.put("manager", version, make_user())
+
+    assert cache.get("manager") is None
+
+
+def test_profile_change_is_visible_through_cache(client, create_user, login):
+    create_user("manager")
+    headers = login("manager")
+    assert client.get("/api/auth/me", headers=headers).json()["company_name"] is None
+    assert principal_cache.get("manager") is not None
+
+    client.put("/api/auth/profile/company", json={"company_name": "Sweet"}, headers=headers)
+
+    assert client.get("/api/auth/me", headers=headers).json()["company_name"] == "Sweet"
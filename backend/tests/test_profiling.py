@@ -0,0 +1,55 @@
+"""Профилирование запросов по требованию администратора"""
+import asyncio
+
+from app.profiling import ProfileStore, StackSampler
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def test_admin_request_is_profiled_off_the_event_loop(client, admin_headers, monkeypatch):
+    calls = []
+    original_stop, original_save = StackSampler.stop, ProfileStore.save
+
+    def stop(self):
+        calls.append(("stop", on_event_loop()))
+        original_stop(self)
+
+    def save(self, *args):
+        calls.append(("save", on_event_loop()))
+        original_save(self, *args)
+
+    monkeypatch.setattr(StackSampler, "stop", stop)
+    monkeypatch.setattr(ProfileStore, "save", save)
+
+    response = client.get("/api/desserts/", headers={**admin_headers, "X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert calls == [("stop", False), ("save", False)]
+    profile_id = response.headers["X-Profile-Id"]
+    summary = client.get(f"/api/profiles/{profile_id}", headers=admin_headers).json()
+    assert summary["path"] == "/api/desserts/"
+    assert summary["status"] == 200
+    assert summary["scope"] == "process"
+    assert {"top_self", "top_total"} <= summary.keys()
+    collapsed = client.get(f"/api/profiles/{profile_id}/collapsed", headers=admin_headers)
+    assert collapsed.status_code == 200
+
+
+def test_profile_flag_from_regular_user_is_ignored(client, create_user, login):
+    create_user("viewer")
+
+    response = client.get("/api/desserts/", params={"profile": "1"}, headers=login("viewer"))
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_unknown_profile_is_not_found(client, admin_headers):
+    assert client.get("/api/profiles/../../etc/passwd", headers=admin_headers).status_code == 404
+    assert client.get("/api/profiles/20240101-000000-000000-get-missing", headers=admin_headers).status_code == 404
@@ -0,0 +1,63 @@
+"""Бюджеты SQL запросов основных endpoints (регрессии и N+1)"""
+import pytest
+
+from app.logger import log_activity
+
+
+def test_update_dessert_budget(client, admin_headers, create_dessert, query_budget):
+    dessert = create_dessert("Наполеон", price=100)
+
+    # Чтение десерта, UPDATE и выборка колонок ответа
+    with query_budget(3):
+        response = client.put(f"/api/desserts/{dessert['id']}", json={"price": 120}, headers=admin_headers)
+    assert response.status_code == 200
+
+    # Значения не изменились - UPDATE не выполняется
+    with query_budget(2):
+        response = client.put(f"/api/desserts/{dessert['id']}", json={"price": 120}, headers=admin_headers)
+    assert response.status_code == 200
+
+
+def test_dessert_list_budget_does_not_grow_with_rows(client, create_dessert, query_budget):
+    for number in range(20):
+        create_dessert(f"Десерт {number}")
+
+    with query_budget(1):
+        response = client.get("/api/desserts/", params={"limit": 100})
+    assert len(response.json()) == 20
+
+
+def test_log_list_budget_does_not_grow_with_rows(client, admin_headers, db, query_budget):
+    for number in range(20):
+        log_activity(db, "login", description=f"entry {number}", ip_address=f"10.0.0.{number}",
+                     user_agent=f"agent {number}", commit=False)
+    db.commit()
+    client.get("/api/logs/", headers=admin_headers)
+
+    # Пользователь берется из кеша: count и страница
+    with query_budget(2):
+        response = client.get("/api/logs/", headers=admin_headers)
+    assert len(response.json()["logs"]) == 21
+
+
+def test_login_budget(client, create_user, query_budget):
+    create_user("editor")
+
+    # Запись лога входа уходит в фоновую очередь
+    with query_budget(1):
+        response = client.post("/api/auth/login-json", json={"username": "editor", "password": "secret1"})
+    assert response.status_code == 200
+
+
+def test_query_count_header_matches_budget(client, query_budget):
+    with query_budget(1) as stats:
+        response = client.get("/api/desserts/")
+
+    assert response.headers["X-DB-Queries"] == str(stats.count) == "1"
+    assert float(response.headers["X-DB-Query-Time-Ms"]) >= 0
+
+
+def test_exceeded_budget_fails_with_statements(client, query_budget):
+    with pytest.raises(AssertionError, match="Expected at most 0 SQL queries, got 1"):
+        with query_budget(0):
+            client.get("/api/desserts/")
@@ -0,0 +1,43 @@
+"""Проверка готовности /ready"""
+import time
+
+from app import readiness
+
+
+def test_ready_when_all_checks_pass(client):
+    response = client.get("/ready")
+
+    assert response.status_code == 200, response.json()
+    body = response.json()
+    assert body["status"] == "ready"
+    assert set(body["checks"]) == {"database", "connection_pools", "upload_dir", "workers", "log_writer"}
+
+
+def test_not_ready_when_pdf_jobs_exceed_threshold(client, monkeypatch):
+    monkeypatch.setattr(readiness, "READY_MAX_PDF_JOBS", -1)
+
+    response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["workers"]["ok"] is False
+
+
+def test_hanging_upload_dir_times_out(client, monkeypatch):
+    monkeypatch.setattr(readiness, "READY_DB_TIMEOUT", 0.05)
+    monkeypatch.setattr(readiness, "touch_upload_dir", lambda: time.sleep(0.5))
+
+    started = time.perf_counter()
+    response = client.get("/ready")
+
+    assert time.perf_counter() - started < 0.4
+    assert response.status_code == 503
+    assert response.json()["checks"]["upload_dir"] == {"ok": False, "error": "timeout after 0.05s"}
+
+
+def test_unwritable_upload_dir_is_reported(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(readiness, "UPLOAD_DIR", tmp_path / "missing")
+
+    response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["upload_dir"]["ok"] is False
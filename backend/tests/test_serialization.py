@@ -0,0 +1,32 @@
+"""Сериализация списков из строк выборки (orjson) совпадает со схемами Pydantic"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.models import Dessert
+from app.schemas import DessertResponse
+from app.serialization import ORJSONResponse, model_columns, serialize_rows
+
+
+def test_rows_serialize_like_response_model(db, create_dessert):
+    create_dessert("Тирамису", price=250.5, calories=320, weight="120 г")
+    columns = model_columns(DessertResponse)
+    rows = db.execute(select(*[getattr(Dessert, column) for column in columns])).all()
+
+    fast = ORJSONResponse(serialize_rows(rows, columns, DessertResponse)).body
+    orm = db.scalars(select(Dessert)).all()
+    reference = "[" + ",".join(DessertResponse.model_validate(d).model_dump_json() for d in orm) + "]"
+
+    assert fast == reference.encode()
+
+
+def test_datetimes_use_utc_z_suffix():
+    body = ORJSONResponse([{"at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)}]).body
+
+    assert body == b'[{"at":"2024-05-01T12:30:00Z"}]'
+
+
+def test_list_endpoint_matches_detail_endpoint(client, create_dessert):
+    dessert = create_dessert("Наполеон", price=300)
+
+    assert client.get("/api/desserts/").json() == [client.get(f"/api/desserts/{dessert['id']}").json()]
@@ -0,0 +1,66 @@
+"""Журнал медленных SQL запросов: скрытие параметров и план запроса"""
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine, select, text, update
+
+from app.models import User
+from app.slow_queries import SlowQueryLog, format_params
+
+BCRYPT_HASH = "$2b$12$abcdefghijklmnopqrstuv"
+
+
+@pytest.fixture
+def slow_engine(tmp_path):
+    """Отдельная БД с пулом из одного соединения; медленным считается любой запрос"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}", pool_size=1, max_overflow=0, pool_timeout=1)
+    User.__table__.create(engine)
+    SlowQueryLog(threshold_ms=0.000001, params_mode="full").install(engine)
+    yield engine
+    engine.dispose()
+
+
+def slow_records(caplog) -> list:
+    return [json.loads(r.getMessage().split(" ", 1)[1]) for r in caplog.records if r.name == "app.slow_queries"]
+
+
+def test_sensitive_params_are_redacted_by_name():
+    assert format_params({"hashed_password": BCRYPT_HASH, "id": 1}, "full") == {"hashed_password": "<redacted>", "id": 1}
+    assert format_params((BCRYPT_HASH, 1), "full", names=["hashed_password", "id_1"]) == ["<redacted>", 1]
+    assert format_params(("plain", 1), "full", names=["title", "id_1"]) == ["plain", 1]
+
+
+def test_unnamed_positional_params_of_users_are_redacted_in_full_mode():
+    statement = "UPDATE users SET hashed_password=? WHERE users.id = ?"
+
+    assert format_params((BCRYPT_HASH, 1), "full", statement=statement) == [f"<redacted str[{len(BCRYPT_HASH)}]>", 1]
+    assert format_params(("Торт", 1), "full", statement="SELECT * FROM desserts WHERE title = ?") == ["Торт", 1]
+    assert format_params((BCRYPT_HASH,), "none", statement=statement) is None
+
+
+def test_positional_hash_is_not_logged(slow_engine, caplog):
+    caplog.set_level(logging.WARNING, logger="app.slow_queries")
+    with slow_engine.begin() as conn:
+        conn.execute(User.__table__.insert().values(username="admin", email="a@example.com", hashed_password="x"))
+        conn.execute(update(User).where(User.username == "admin").values(hashed_password=BCRYPT_HASH))
+
+    records = slow_records(caplog)
+    assert records
+    assert all(BCRYPT_HASH not in json.dumps(record) for record in records)
+    update_record = next(record for record in records if record["sql"].startswith("UPDATE"))
+    assert update_record["params"] == ["<redacted>", "admin"]
+
+
+def test_plan_uses_the_same_connection_when_pool_is_exhausted(slow_engine, caplog):
+    caplog.set_level(logging.WARNING, logger="app.slow_queries")
+
+    with slow_engine.connect() as conn:
+        rows = conn.execute(select(User.id).where(User.username == "admin")).all()
+        conn.execute(text("SELECT count(*) FROM users WHERE email = :email"), {"email": "a@example.com"})
+
+    assert rows == []
+    plans = [record["plan"] for record in slow_records(caplog) if record.get("plan")]
+    assert len(plans) == 2
+    assert all(not line.startswith("EXPLAIN failed") for plan in plans for line in plan)
+    assert any("users" in line for line in plans[0])
@@ -0,0 +1,55 @@
+"""Роли в токене и отзыв выданных токенов по token_version"""
+from app.models import User
+from app.principals import token_versions
+
+
+def test_role_claims_authorize_without_loading_user(client, create_user, login):
+    create_user("moderator", is_moderator=True)
+    headers = login("moderator")
+
+    response = client.post("/api/desserts/", json={"title": "Эклер", "category": "Пирожные"}, headers=headers)
+
+    assert response.status_code == 201
+    assert client.get("/api/users/", headers=headers).status_code == 403
+
+
+def test_role_change_revokes_issued_tokens(client, admin_headers, create_user, login):
+    user = create_user("moderator", is_moderator=True)
+    headers = login("moderator")
+
+    client.put(f"/api/users/{user.id}", json={"is_moderator": False}, headers=admin_headers)
+
+    response = client.post("/api/desserts/", json={"title": "Эклер", "category": "Пирожные"}, headers=headers)
+    assert response.status_code == 401
+
+
+def test_password_change_revokes_other_tokens_and_returns_a_new_one(client, create_user, login):
+    create_user("manager")
+    stolen = login("manager")
+    current = login("manager")
+
+    response = client.put(
+        "/api/auth/profile/password",
+        json={"current_password": "secret1", "new_password": "secret2"},
+        headers=current,
+    )
+
+    assert response.status_code == 200
+    assert client.get("/api/auth/me", headers=stolen).status_code == 401
+    assert client.get("/api/auth/me", headers=current).status_code == 401
+    fresh = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/api/auth/me", headers=fresh).status_code == 200
+
+
+def test_other_workers_see_revocation_after_table_refresh(client, create_user, login, db, monkeypatch):
+    user = create_user("manager")
+    headers = login("manager")
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    # Изменение, сделанное другим воркером: в этом процессе таблица версий еще старая
+    db.query(User).filter_by(id=user.id).update({"token_version": User.token_version + 1})
+    db.commit()
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    monkeypatch.setattr(token_versions, "refresh_interval", 0)  # прошло TOKEN_VERSION_REFRESH_SECONDS
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
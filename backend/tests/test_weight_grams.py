@@ -0,0 +1,36 @@
+"""Вес в граммах из текстового поля weight"""
+import pytest
+
+from app.models import parse_weight_grams
+
+
+@pytest.mark.parametrize("weight, grams", [
+    ("120 г", 120),
+    ("120г.", 120),
+    ("250 гр", 250),
+    ("250 грамм", 250),
+    ("250g", 250),
+    ("1 кг", 1000),
+    ("1,5 кг", 1500),
+    ("1.2 KG", 1200),
+    ("85,5 г", 85.5),
+    ("150", 150),
+    ("2 x 100 г", 100),
+])
+def test_mass_units(weight, grams):
+    assert parse_weight_grams(weight) == grams
+
+
+@pytest.mark.parametrize("weight", [None, "", "по запросу", "100 мл", "0,5 л", "2 шт", "Ø 18 см", "3 по 100 мл"])
+def test_unknown_weight_is_none(weight):
+    assert parse_weight_grams(weight) is None
+
+
+def test_weight_range_filter_skips_volumes(client, create_dessert):
+    create_dessert("Панна-котта", weight="100 мл")
+    create_dessert("Эклер", weight="100 г")
+    create_dessert("Торт", weight="1,2 кг")
+
+    heavy_first = client.get("/api/desserts/", params={"min_weight": 50, "sort": "-weight_grams"}).json()
+
+    assert [d["title"] for d in heavy_first] == ["Торт", "Эклер"]
@@ -44,6 +44,7 @@ export const dessertsApi = {
     category?: string;
     search?: string;
     is_active?: boolean;
+    fields?: string;
   }): Promise<Dessert[]> => {
     const response = await api.get<Dessert[]>('/desserts/', { params });
     return response.data;
@@ -147,12 +148,13 @@ export const authApi = {
     return response.data;
   },
 
-  updatePassword: async (currentPassword: string, newPassword: string): Promise<{ message: string; user: User }> => {
-    const response = await api.put<{ message: string; user: User }>('/auth/profile/password', {
+  updatePassword: async (currentPassword: string, newPassword: string): Promise<{ message: string; user: User; access_token: string }> => {
+    const response = await api.put<{ message: string; user: User; access_token: string }>('/auth/profile/password', {
       current_password: currentPassword,
       new_password: newPassword,
     });
-    // Обновляем сохраненного пользователя
+    // Прежние токены отозваны сменой пароля - сохраняем новый
+    localStorage.setItem('access_token', response.data.access_token);
     localStorage.setItem('user', JSON.stringify(response.data.user));
     return response.data;
   },
@@ -208,6 +210,10 @@ export const logsApi = {
     username?: string;
     search?: string;
     days?: number;
+    entity_id?: number;
+    changed_field?: string;
+    cursor?: string;
+    total?: 'exact' | 'capped' | 'estimate';
   }): Promise<ActivityLogListResponse> => {
     const response = await api.get<ActivityLogListResponse>('/logs/', { params });
     return response.data;
@@ -10,6 +10,7 @@ export interface Dessert {
   fats: number | null;
   carbs: number | null;
   weight: string | null;
+  weight_grams?: number | null;
   price: number | null;
   is_active: boolean;
 }
@@ -71,8 +72,8 @@ export interface ActivityLog {
   entity_type?: string | null;
   entity_id?: number | null;
   description?: string | null;
-  old_values?: string | null;
-  new_values?: string | null;
+  old_values?: Record<string, unknown> | null;
+  new_values?: Record<string, unknown> | null;
   ip_address?: string | null;
   user_agent?: string | null;
   created_at: string;
@@ -83,6 +84,8 @@ export interface ActivityLogListResponse {
   total: number;
   page: number;
   page_size: number;
+  next_cursor?: string | null;
+  total_is_estimate?: boolean;
 }
 
 export interface LogsSummary {